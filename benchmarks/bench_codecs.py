@@ -0,0 +1,115 @@
+"""
+PhantomPix - Compression codec benchmark.
+
+    python benchmarks/bench_codecs.py
+    python benchmarks/bench_codecs.py --size 4 --json results.json
+
+Compresses a few synthetic payload kinds with every installed codec and
+level, and prints the ratio and throughput of each, plus the codec that
+select_codec would pick for that payload. Use it to check the thresholds
+in phantompix/compressors.py after changing them.
+
+Developed by: Zork
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phantompix.compressors import CODEC_REGISTRY, SAMPLE_SIZE, get_codec, select_codec  # noqa: E402
+
+
+LEVELS = {
+    'none': [None],
+    'zlib': [1, 6, 9],
+    'lzma': [0, 6, 9],
+    'bz2': [1, 9],
+    'zstd': [3, 10, 19],
+    'lz4': [0, 9],
+}
+
+WORDS = (
+    "the quick brown fox jumps over a lazy dog while secret agents exchange "
+    "coded messages hidden in holiday photos of mountains beaches and cities"
+).split()
+
+
+def make_payloads(size):
+
+    rng = random.Random(1234)
+    text = ' '.join(rng.choice(WORDS) for _ in range(size // 5)).encode()[:size]
+    records = b''.join(
+        json.dumps({'id': i, 'name': rng.choice(WORDS), 'score': rng.random()}).encode() + b'\n'
+        for i in range(size // 50)
+    )[:size]
+    return {
+        'text': text,
+        'json': records,
+        'random': os.urandom(size),
+        'tiny': b'meet at noon',
+    }
+
+
+def run_codec(codec, data, chunk_size=64 * 1024):
+
+    start = time.perf_counter()
+    compressor = codec.compressor()
+    pieces = [compressor.compress(data[i:i + chunk_size]) for i in range(0, len(data), chunk_size)]
+    pieces.append(compressor.flush())
+    compressed = b''.join(pieces)
+    compress_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decompressor = codec.decompressor(chunk_size)
+    restored = b''.join(decompressor.feed(compressed)) + b''.join(decompressor.finish())
+    decompress_time = time.perf_counter() - start
+
+    if restored != data:
+        raise RuntimeError(f"{codec!r} did not round-trip")
+    return len(compressed), compress_time, decompress_time
+
+
+def _rate(size, seconds):
+
+    return size / seconds / 1e6 if seconds else float('inf')
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Compare compression codecs on synthetic payloads.")
+    parser.add_argument('--size', type=float, default=1.0, help="payload size in MB (default: 1)")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for kind, data in make_payloads(int(args.size * 1024 * 1024)).items():
+        chosen = select_codec(data[:SAMPLE_SIZE], len(data))
+        print(f"\n{kind}: {len(data)} bytes, auto -> {chosen!r}")
+        print(f"  {'codec':<10}{'ratio':>8}{'comp MB/s':>12}{'decomp MB/s':>14}")
+        for codec_class in CODEC_REGISTRY.values():
+            if not codec_class.available():
+                continue
+            for level in LEVELS.get(codec_class.name, [None]):
+                codec = get_codec(codec_class.name if level is None else f"{codec_class.name}:{level}")
+                size, compress_time, decompress_time = run_codec(codec, data)
+                ratio = size / len(data)
+                print(f"  {codec!r:<10}{ratio:>8.3f}"
+                      f"{_rate(len(data), compress_time):>12.1f}{_rate(len(data), decompress_time):>14.1f}")
+                results.append({
+                    'payload': kind, 'codec': repr(codec), 'auto': repr(chosen),
+                    'input_bytes': len(data), 'output_bytes': size, 'ratio': ratio,
+                    'compress_s': compress_time, 'decompress_s': decompress_time,
+                })
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
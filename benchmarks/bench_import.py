@@ -0,0 +1,101 @@
+"""
+PhantomPix - Import time benchmark and guard.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --max-ms 10 --repeats 20 --json imports.json
+
+Times a few import statements, each in a fresh interpreter, and checks
+which heavy packages each one loaded. The run fails (exit status 1)
+when ``import phantompix`` takes longer than --max-ms, when a statement
+loads a package it must not (PyQt6 anywhere outside the GUI; numpy,
+Pillow and cryptography for the bare package import), or when an import
+writes anything to stdout.
+
+Developed by: Zork
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('PyQt6', 'numpy', 'PIL', 'cryptography')
+
+# (statement, packages it must not load, whether --max-ms applies)
+CASES = [
+    ('import phantompix', HEAVY, True),
+    ('from phantompix import MessageEncryptor', ('PyQt6', 'numpy', 'PIL'), False),
+    ('from phantompix import ImageSteganography', ('PyQt6', 'cryptography'), False),
+    ('import phantompix.cli', ('PyQt6',), False),
+]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+import json
+loaded = sorted({{name.split('.')[0] for name in sys.modules}})
+sys.stdout.write('\\n' + json.dumps({{'seconds': elapsed, 'loaded': loaded}}))
+"""
+
+
+def measure(statement):
+    """Run ``statement`` in a fresh interpreter: (seconds, loaded top-level packages, stray stdout)."""
+
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    completed = subprocess.run(
+        [sys.executable, '-c', PROBE.format(statement=statement)],
+        capture_output=True, text=True, env=env, cwd=ROOT, check=True
+    )
+    output, _, report = completed.stdout.rpartition('\n')
+    report = json.loads(report)
+    return report['seconds'], set(report['loaded']), output
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Time and check the package's import paths.")
+    parser.add_argument('--repeats', type=int, default=10, help="fresh interpreters per statement; the median is reported")
+    parser.add_argument('--max-ms', type=float, default=25.0,
+                        help="budget for 'import phantompix' in milliseconds (default: 25)")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    failures = []
+    results = []
+    print(f"  {'statement':<45}{'median ms':>11}{'best ms':>9}  heavy packages loaded")
+    for statement, forbidden, budgeted in CASES:
+        runs = [measure(statement) for _ in range(args.repeats)]
+        seconds = [run[0] for run in runs]
+        loaded = set.union(*(run[1] for run in runs))
+        median_ms = statistics.median(seconds) * 1000
+        heavy = sorted(name for name in HEAVY if name in loaded)
+        print(f"  {statement:<45}{median_ms:>11.1f}{min(seconds) * 1000:>9.1f}  {', '.join(heavy) or '-'}")
+
+        if budgeted and median_ms > args.max_ms:
+            failures.append(f"{statement}: {median_ms:.1f}ms exceeds the {args.max_ms:g}ms budget")
+        for name in forbidden:
+            if name in loaded:
+                failures.append(f"{statement}: loaded {name}")
+        if any(run[2] for run in runs):
+            failures.append(f"{statement}: wrote to stdout on import")
+        results.append({
+            'statement': statement, 'median_s': median_ms / 1000, 'best_s': min(seconds),
+            'heavy_loaded': heavy,
+        })
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+PhantomPix - Pipeline benchmark: encrypt -> embed -> extract -> decrypt.
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --sizes 4000x3000 --modes RGB --output run.json
+    python benchmarks/bench_pipeline.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --baseline benchmarks/baseline.json --threshold 0.25
+
+Synthetic covers (every size x mode) and payloads (text, random,
+compressible) are generated in a temporary directory. Each case runs in
+a fresh process, so its peak RSS is its own. The JSON report holds the
+median and best latency of every stage, embed/extract throughput in
+MB/s of payload, scan rate in megapixels/s, and peak RSS.
+
+With --baseline the run fails (exit status 1) when any stage's median is
+slower than the baseline's by more than --threshold.
+
+The KDF defaults to PBKDF2 with 1,000 iterations (pbkdf2:iterations=1000,
+the cheapest setting allowed) so the numbers describe the pipeline; pass
+--kdf scrypt to include the real key derivation.
+
+Developed by: Zork
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from phantompix.encryptor import MessageEncryptor  # noqa: E402
+from phantompix.kdf import key_cache  # noqa: E402
+from phantompix.steganography import ImageSteganography  # noqa: E402
+
+
+STAGES = ('encrypt', 'embed', 'extract', 'decrypt')
+MODES = ('RGB', 'RGBA', 'L', 'P')
+PAYLOADS = ('text', 'random', 'compressible')
+PASSWORD = 'benchmark-password'
+
+# Differences below this are timer noise, whatever the relative change
+NOISE_FLOOR = 0.002
+
+
+def make_cover(width, height, mode, path):
+
+    rng = np.random.default_rng(width * height)
+    # Gradients plus noise: compresses like a photo, unlike pure noise
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // max(width - 1, 1), y * 255 // max(height - 1, 1),
+                     (x + y) * 255 // max(width + height - 2, 1)], axis=-1)
+    pixels = np.clip(base + rng.integers(-12, 13, base.shape), 0, 255).astype(np.uint8)
+    image = Image.fromarray(pixels)
+    if mode == 'RGBA':
+        image.putalpha(Image.fromarray(rng.integers(200, 256, (height, width), dtype=np.uint8)))
+    elif mode != 'RGB':
+        image = image.convert(mode)
+    image.save(path, 'PNG')
+
+
+def make_payload(kind, size):
+
+    rng = random.Random(size)
+    if kind == 'random':
+        # Messages are text, so random printable ASCII is as close to
+        # incompressible as the API allows.
+        return ''.join(rng.choices(string.printable, k=size))
+    if kind == 'compressible':
+        line = '{"sensor": "cam-01", "status": "ok", "value": 42}\n'
+        return (line * (size // len(line) + 1))[:size]
+    words = ("meet at the old bridge after dark bring the documents and "
+             "tell no one about the new route through the northern pass").split()
+    return ' '.join(rng.choice(words) for _ in range(size // 4))[:size]
+
+
+def _peak_rss_mb():
+
+    # ru_maxrss survives exec on Linux, so a spawned worker would report
+    # its parent's peak; VmHWM belongs to this process image only.
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+
+
+def _timed(func):
+
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def run_case(case):
+
+    message = make_payload(case['payload'], case['payload_bytes'])
+    output_path = case['cover'][:-4] + '_out.png'
+    timings = {stage: [] for stage in STAGES}
+
+    for _ in range(case['repeats']):
+        # Clear derived keys so every repetition pays for its KDF
+        key_cache.clear()
+        encrypted, elapsed = _timed(
+            lambda: MessageEncryptor.encrypt_message(message, PASSWORD, kdf=case['kdf'])
+        )
+        timings['encrypt'].append(elapsed)
+
+        _, elapsed = _timed(lambda: ImageSteganography.encode_message(
+            case['cover'], encrypted, output_path, strip_rows=case['strip_rows']
+        ))
+        timings['embed'].append(elapsed)
+
+        extracted, elapsed = _timed(
+            lambda: ImageSteganography.decode_message(output_path, strip_rows=case['strip_rows'])
+        )
+        timings['extract'].append(elapsed)
+
+        key_cache.clear()
+        decrypted, elapsed = _timed(lambda: MessageEncryptor.decrypt_message(extracted, PASSWORD))
+        timings['decrypt'].append(elapsed)
+
+        if decrypted != message:
+            raise RuntimeError(f"{case['id']}: round trip changed the message")
+
+    os.remove(output_path)
+    megabytes = len(encrypted) / 1e6
+    megapixels = case['width'] * case['height'] / 1e6
+    stages = {
+        stage: {'median_s': statistics.median(times), 'min_s': min(times)}
+        for stage, times in timings.items()
+    }
+    return {
+        'id': case['id'],
+        'width': case['width'],
+        'height': case['height'],
+        'mode': case['mode'],
+        'payload': case['payload'],
+        'message_bytes': len(message.encode('utf-8')),
+        'embedded_bytes': len(encrypted),
+        'stages': stages,
+        'throughput': {
+            'embed_mb_s': megabytes / stages['embed']['median_s'],
+            'extract_mb_s': megabytes / stages['extract']['median_s'],
+            'embed_mp_s': megapixels / stages['embed']['median_s'],
+            'extract_mp_s': megapixels / stages['extract']['median_s'],
+        },
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def build_cases(args, directory):
+
+    cases = []
+    for size in args.sizes.split(','):
+        width, height = (int(value) for value in size.lower().split('x'))
+        for mode in args.modes.split(','):
+            cover = os.path.join(directory, f"cover_{width}x{height}_{mode}.png")
+            make_cover(width, height, mode, cover)
+            capacity = ImageSteganography.capacity(cover)
+            for payload in args.payloads.split(','):
+                cases.append({
+                    'id': f"{width}x{height}-{mode}-{payload}",
+                    'cover': cover,
+                    'width': width,
+                    'height': height,
+                    'mode': mode,
+                    'payload': payload,
+                    # Random text barely compresses, so keep it well
+                    # inside the cover.
+                    'payload_bytes': min(int(args.payload_kb * 1024), capacity // 2),
+                    'repeats': args.repeats,
+                    'kdf': args.kdf,
+                    'strip_rows': args.strip_rows,
+                })
+    return cases
+
+
+def compare(results, baseline, threshold):
+
+    previous = {result['id']: result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        base = previous.get(result['id'])
+        if base is None:
+            continue
+        for stage, timing in result['stages'].items():
+            old = base['stages'].get(stage, {}).get('median_s')
+            new = timing['median_s']
+            if old and new > old * (1 + threshold) and new - old > NOISE_FLOOR:
+                regressions.append({
+                    'id': result['id'], 'stage': stage,
+                    'baseline_s': old, 'current_s': new, 'change': new / old - 1,
+                })
+    return regressions
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Benchmark the encrypt/embed/extract/decrypt pipeline.")
+    parser.add_argument('--sizes', default='640x480,1920x1080', help="comma separated WxH cover sizes")
+    parser.add_argument('--modes', default=','.join(MODES), help="comma separated cover modes")
+    parser.add_argument('--payloads', default=','.join(PAYLOADS), help="comma separated payload kinds")
+    parser.add_argument('--payload-kb', type=float, default=64, help="message size in KB (default: 64)")
+    parser.add_argument('--repeats', type=int, default=3, help="runs per case; the median is reported")
+    parser.add_argument('--kdf', default='pbkdf2:iterations=1000', help="KDF spec (default: cheapest PBKDF2)")
+    parser.add_argument('--strip-rows', type=int, default=None, help="benchmark the strip-streaming engine")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--baseline', help="compare against this earlier report")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown per stage before failing (default: 0.25 = 25%%)")
+    parser.add_argument('--save-baseline', help="also store this run as a baseline file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='phantompix-bench-') as directory:
+        cases = build_cases(args, directory)
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            results = []
+            for result in pool.imap(run_case, cases):
+                stages = '  '.join(f"{stage} {result['stages'][stage]['median_s'] * 1000:7.1f}ms"
+                                   for stage in STAGES)
+                print(f"{result['id']:<28}{stages}  rss {result['peak_rss_mb'] or 0:6.0f}MB", file=sys.stderr)
+                results.append(result)
+
+    report = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pillow': Image.__version__,
+            'kdf': args.kdf,
+            'repeats': args.repeats,
+            'strip_rows': args.strip_rows,
+        },
+        'results': results,
+    }
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        report['regressions'] = regressions
+        for regression in regressions:
+            print(f"REGRESSION {regression['id']} {regression['stage']}: "
+                  f"{regression['baseline_s'] * 1000:.1f}ms -> {regression['current_s'] * 1000:.1f}ms "
+                  f"(+{regression['change']:.0%})", file=sys.stderr)
+        status = 1 if regressions else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+PhantomPix - PNG output benchmark: writing time vs file size per preset.
+
+    python benchmarks/bench_png.py
+    python benchmarks/bench_png.py --sizes 4000x3000 --presets fast,small,default:filter=up
+    python benchmarks/bench_png.py --strip-rows 256 --json png.json
+
+Builds the same synthetic covers as bench_pipeline.py, fills part of
+their capacity with a random payload (LSB noise is what makes stego
+images hard to compress), then writes each one with every preset or
+spec and reports the median write time, MB/s of raw pixels, file size
+and the size relative to the default preset.
+
+Developed by: Zork
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import make_cover  # noqa: E402
+from phantompix.pngstream import PNG_PRESETS, PngStripWriter, get_png_options, write_png  # noqa: E402
+from phantompix.steganography import ImageSteganography  # noqa: E402
+
+
+def stego_pixels(width, height, mode, fill, directory):
+
+    cover = os.path.join(directory, f"cover_{width}x{height}_{mode}.png")
+    make_cover(width, height, mode, cover)
+    payload = os.urandom(int(ImageSteganography.capacity(cover) * fill))
+    pixels = ImageSteganography._load_pixels(cover)
+    ImageSteganography._embed_stream(pixels, [payload])
+    return pixels
+
+
+def write_once(pixels, options, strip_rows):
+
+    buffer = io.BytesIO()
+    start = time.perf_counter()
+    if strip_rows:
+        height, width = pixels.shape[:2]
+        writer = PngStripWriter(buffer, width, height, 'RGBA' if pixels.shape[2] == 4 else 'RGB', options)
+        for row in range(0, height, strip_rows):
+            writer.write(pixels[row:row + strip_rows])
+        writer.close()
+    else:
+        write_png(pixels, buffer, options)
+    return time.perf_counter() - start, buffer.tell()
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Compare PNG output presets on stego images.")
+    parser.add_argument('--sizes', default='640x480,1920x1080,4000x3000', help="comma separated WxH cover sizes")
+    parser.add_argument('--modes', default='RGB,RGBA', help="comma separated cover modes")
+    parser.add_argument('--presets', default=','.join(PNG_PRESETS),
+                        help="comma separated presets or specs; separate specs with ';' if they contain commas")
+    parser.add_argument('--fill', type=float, default=0.5, help="fraction of the capacity to fill (default: 0.5)")
+    parser.add_argument('--repeats', type=int, default=3, help="writes per case; the median is reported")
+    parser.add_argument('--strip-rows', type=int, default=None, help="benchmark the strip writer")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    separator = ';' if ';' in args.presets else ','
+    specs = [spec.strip() for spec in args.presets.split(separator) if spec.strip()]
+    options = {spec: get_png_options(spec) for spec in specs}
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='phantompix-bench-') as directory:
+        for size in args.sizes.split(','):
+            width, height = (int(value) for value in size.lower().split('x'))
+            for mode in args.modes.split(','):
+                pixels = stego_pixels(width, height, mode, args.fill, directory)
+                raw_mb = pixels.nbytes / 1e6
+                print(f"\n{width}x{height} {mode}: {raw_mb:.1f} MB raw")
+                print(f"  {'preset':<28}{'ms':>9}{'MB/s':>9}{'KB':>11}{'vs default':>12}")
+                reference = None
+                for spec in specs:
+                    runs = [write_once(pixels, options[spec], args.strip_rows) for _ in range(args.repeats)]
+                    seconds = statistics.median(run[0] for run in runs)
+                    output_bytes = runs[0][1]
+                    if reference is None or spec == 'default':
+                        reference = output_bytes
+                    print(f"  {spec:<28}{seconds * 1000:>9.1f}{raw_mb / seconds:>9.1f}"
+                          f"{output_bytes / 1024:>11,.0f}{output_bytes / reference:>11.1%}")
+                    results.append({
+                        'width': width, 'height': height, 'mode': mode, 'preset': spec,
+                        'options': options[spec]._asdict(), 'strip_rows': args.strip_rows,
+                        'median_s': seconds, 'raw_mb_s': raw_mb / seconds,
+                        'output_bytes': output_bytes, 'raw_bytes': pixels.nbytes,
+                    })
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
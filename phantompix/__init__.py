@@ -1,10 +1,44 @@
+"""
+PhantomPix - hide encrypted messages in images.
 
+Everything is imported on first use, so ``import phantompix`` does not
+load numpy, Pillow, cryptography or PyQt6. The GUI (PyQt6) in particular
+must stay out of the headless path used by the CLI and on servers.
+benchmarks/bench_import.py guards the import time.
 
+Developed by: Zork
+"""
 __version__ = "1.0.0"
 __author__ = "Zork"
 
-from .ui_main import PhantomPix
-from .encryptor import MessageEncryptor
-from .steganography import ImageSteganography
+import importlib
+
+# Type checkers treat this as typing.TYPE_CHECKING, without importing typing (~20ms)
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .encryptor import MessageEncryptor
+    from .steganography import ImageSteganography
+    from .ui_main import PhantomPix
 
 __all__ = ['PhantomPix', 'MessageEncryptor', 'ImageSteganography']
+
+# Public name -> module that defines it
+_LAZY_ATTRIBUTES = {
+    'MessageEncryptor': '.encryptor',
+    'ImageSteganography': '.steganography',
+    'PhantomPix': '.ui_main',
+}
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    # Later lookups find it directly and skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
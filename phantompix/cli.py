@@ -0,0 +1,534 @@
+"""
+PhantomPix - Headless command line interface.
+
+    python -m phantompix encode  -p PASSWORD -m "message" covers/*.png
+    python -m phantompix decode  -p PASSWORD encoded/*.png
+    python -m phantompix decode  -p PASSWORD -o revealed/ encoded/*.png
+    python -m phantompix encode  -p PASSWORD -m "hi" --profile-dir traces/ cover.png
+    python -m phantompix encode  -p PASSWORD -m "hi" --png fast covers/*.png
+    python -m phantompix encode  -p PASSWORD --message-file big.zip --bits 2 --alpha cover.png
+    python -m phantompix encode  -p PASSWORD --message-file big.zip --shards -o out/ covers/*.png
+    python -m phantompix decode  -p PASSWORD --shards -o revealed/ out/
+    python -m phantompix encode  -p PASSWORD -m "hi" --scatter covers/*.png
+    python -m phantompix encode  -p PASSWORD --message-file big.zip --threads 16 huge.png
+    python -m phantompix probe   "photos/**/*.png"
+    python -m phantompix scan    --index scan.db photos/ archive/
+    python -m phantompix serve   --port 8765 -j 4
+    python -m phantompix capacity --manifest images.txt
+    python -m phantompix capacity --bits 2 covers/*.png
+
+Inputs are file paths or glob patterns; manifest files list one path or
+pattern per line. Files are processed on a process pool and one JSON
+object per file is written to stdout as soon as it is done.
+
+``encode --message-file`` and ``decode --output-dir`` stream the message
+through the encryptor and the image in pieces, so files of any size that
+fit the cover never have to be held in memory.
+
+``--shards`` splits one message across all input covers (encode) and
+joins the split messages found among the inputs, which may include
+directories (decode); see shards.py.
+
+``--scatter`` spreads the payload over the whole image at positions
+keyed by the password (see scatter.py); decoding it needs ``--scatter``
+too. It cannot be combined with ``--shards`` or ``--strip-rows``.
+
+``--threads`` embeds each payload in bands on that many threads, which
+keeps many cores busy when a few large covers are encoded; the output
+is identical to single-threaded encoding.
+
+``scan`` walks whole directory trees and reports the images that carry a
+payload, keeping a SQLite index (``--index``) so that later scans only
+check new or changed files; see scan.py.
+
+``serve`` runs the local HTTP service (see service.py) until interrupted.
+
+``--profile`` adds a per-stage time and memory breakdown to every result;
+``--profile-dir`` also writes a Chrome trace (<name>.trace.json) and
+cProfile data (<name>.prof) for every input.
+
+This module must never import PyQt6.
+
+Developed by: Zork
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+
+from .compressors import available_codecs, get_codec
+from .encryptor import MessageEncryptor
+from .kdf import get_kdf
+from .pngstream import PNG_FILTERS, PNG_PRESETS, get_png_options
+from .scan import ScanIndex, scan
+from .scatter import scatter_key
+from .shards import encode_shards, find_shard_sets, join_shards
+from .steganography import ImageSteganography
+from .tracing import Tracer
+
+
+PASSWORD_ENV = 'PHANTOMPIX_PASSWORD'
+
+
+def _encode_file(image_path, message, password, output_path, strip_rows=None, kdf=None,
+                 message_file=None, compress=True, png=None, bits_per_channel=1, channels=None,
+                 scatter_key=None, threads=None):
+
+    if message_file and scatter_key is None:
+        with open(message_file, 'rb') as source:
+            chunks = MessageEncryptor.encrypt_stream(source, password, compress=compress, kdf=kdf)
+            length = ImageSteganography.encode_stream(image_path, chunks, output_path, strip_rows, png,
+                                                      bits_per_channel, channels, threads)
+        return {'output': output_path, 'bytes': length}
+
+    if message_file:
+        # Scattering places the header first, so the whole payload is collected
+        with open(message_file, 'rb') as source:
+            encrypted_data = b''.join(MessageEncryptor.encrypt_stream(source, password, compress=compress, kdf=kdf))
+    else:
+        encrypted_data = MessageEncryptor.encrypt_message(message, password, compress=compress, kdf=kdf)
+    ImageSteganography.encode_message(image_path, encrypted_data, output_path, strip_rows=strip_rows,
+                                      png=png, bits_per_channel=bits_per_channel, channels=channels,
+                                      scatter_key=scatter_key, workers=threads)
+    return {'output': output_path, 'bytes': len(encrypted_data)}
+
+
+def _write_chunks(output_path, chunks):
+
+    written = 0
+    try:
+        with open(output_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+    except BaseException:
+        os.remove(output_path)
+        raise
+    return written
+
+
+def _decode_file(image_path, password, strip_rows=None, output_path=None, scatter_key=None):
+
+    if output_path:
+        chunks = MessageEncryptor.decrypt_stream(
+            ImageSteganography.iter_payload(image_path, strip_rows, scatter_key=scatter_key), password
+        )
+        return {'output': output_path, 'bytes': _write_chunks(output_path, chunks)}
+
+    encrypted_data = ImageSteganography.decode_message(image_path, strip_rows=strip_rows, scatter_key=scatter_key)
+    message = MessageEncryptor.decrypt_message(encrypted_data, password, compressed=True)
+    return {'message': message, 'bytes': len(encrypted_data)}
+
+
+def _probe_file(image_path):
+
+    return ImageSteganography.probe(image_path)._asdict()
+
+
+def _capacity_file(image_path, bits_per_channel=1, channels=None):
+
+    with Image.open(image_path) as image:
+        width, height = image.size
+    capacity = ImageSteganography.capacity(image_path, bits_per_channel, channels)
+    return {'width': width, 'height': height, 'capacity': capacity}
+
+
+def _traced(func, name, profile_base, *args):
+
+    tracer = Tracer(name, memory=True, profile=bool(profile_base))
+    with tracer:
+        record = func(*args)
+    record['profile'] = tracer.to_dict()
+    if profile_base:
+        tracer.save_chrome_trace(profile_base + '.trace.json')
+        tracer.save_profile(profile_base + '.prof')
+    return record
+
+
+def _with_profile(args, func, jobs):
+    """Wrap ``(path, args)`` jobs in a Tracer when --profile is given."""
+
+    if not (args.profile or args.profile_dir):
+        return func, jobs
+    if args.profile_dir:
+        os.makedirs(args.profile_dir, exist_ok=True)
+    wrapped = []
+    for path, job_args in jobs:
+        base = output_path_for(path, args.profile_dir, '', '') if args.profile_dir else None
+        wrapped.append((path, (func, f"{args.command} {os.path.basename(path)}", base) + job_args))
+    return _traced, wrapped
+
+
+def expand_inputs(patterns, manifests=(), directories=False):
+    """Paths matching ``patterns`` and manifest entries, in order, once each.
+
+    Directories are skipped, or replaced by the files directly inside
+    them when ``directories`` is true.
+    """
+
+    entries = list(patterns)
+    for manifest in manifests:
+        with open(manifest, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    entries.append(line)
+
+    seen = set()
+    paths = []
+    for entry in entries:
+        matches = sorted(glob.glob(entry, recursive=True)) if glob.has_magic(entry) else [entry]
+        for path in matches:
+            if os.path.isdir(path):
+                if not directories:
+                    continue
+                path_list = sorted(entry.path for entry in os.scandir(path) if entry.is_file())
+            else:
+                path_list = [path]
+            for path in path_list:
+                if path not in seen:
+                    seen.add(path)
+                    paths.append(path)
+    return paths
+
+
+def output_path_for(image_path, output_dir=None, suffix='_encoded', extension='.png'):
+
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    directory = output_dir if output_dir else os.path.dirname(image_path)
+    return os.path.join(directory, f"{stem}{suffix}{extension}")
+
+
+def _emit(record):
+
+    sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+    sys.stdout.flush()
+
+
+def run_jobs(func, jobs, workers=None):
+    """Run ``func(*args)`` for every ``(path, args)`` job and stream results.
+
+    Returns the number of failed jobs.
+    """
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {executor.submit(func, *args): path for path, args in jobs}
+        try:
+            for future in as_completed(futures):
+                record = {'path': futures[future]}
+                try:
+                    record.update(future.result())
+                    record['ok'] = True
+                except Exception as e:
+                    record['ok'] = False
+                    record['error'] = str(e)
+                    failures += 1
+                _emit(record)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    return failures
+
+
+def _resolve_password(args):
+
+    if args.password_file:
+        with open(args.password_file, 'r', encoding='utf-8') as f:
+            return f.readline().rstrip('\r\n')
+    password = args.password or os.environ.get(PASSWORD_ENV)
+    if not password:
+        raise SystemExit(f"error: a password is required (--password, --password-file or ${PASSWORD_ENV})")
+    return password
+
+
+def _resolve_scatter_key(args, password):
+
+    if not args.scatter:
+        return None
+    for option, value in (('--shards', args.shards), ('--strip-rows', args.strip_rows)):
+        if value:
+            raise SystemExit(f"error: --scatter cannot be combined with {option}")
+    # Derived once here rather than in every worker process
+    return scatter_key(password)
+
+
+def _cmd_encode(args, paths):
+
+    message = args.message
+    if args.message_file:
+        if not os.path.isfile(args.message_file):
+            raise SystemExit(f"error: message file not found: {args.message_file}")
+    elif not message:
+        raise SystemExit("error: a message is required (--message or --message-file)")
+
+    password = _resolve_password(args)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    compress = True if args.compress == 'auto' else args.compress
+    try:
+        get_kdf(args.kdf)
+        if compress is not True:
+            get_codec(compress)
+        get_png_options(args.png)
+    except ValueError as e:
+        raise SystemExit(f"error: {e}")
+
+    key = _resolve_scatter_key(args, password)
+    if args.shards:
+        return _encode_shards(args, paths, message, password, compress)
+
+    jobs = [
+        (path, (path, message, password, output_path_for(path, args.output_dir, args.suffix),
+                args.strip_rows, args.kdf, args.message_file, compress, args.png,
+                args.bits, 4 if args.alpha else 3, key, args.threads))
+        for path in paths
+    ]
+    return run_jobs(*_with_profile(args, _encode_file, jobs), args.workers)
+
+
+def _encode_shards(args, paths, message, password, compress):
+
+    try:
+        if args.message_file:
+            # Shards are cut from the whole payload, so it is collected first
+            with open(args.message_file, 'rb') as source:
+                encrypted_data = b''.join(MessageEncryptor.encrypt_stream(
+                    source, password, compress=compress, kdf=args.kdf
+                ))
+        else:
+            encrypted_data = MessageEncryptor.encrypt_message(message, password, compress=compress, kdf=args.kdf)
+        outputs = [output_path_for(path, args.output_dir, args.suffix) for path in paths]
+        results = encode_shards(encrypted_data, paths, outputs, args.workers, args.strip_rows, args.png,
+                                args.bits, 4 if args.alpha else 3)
+    except Exception as e:
+        _emit({'paths': paths, 'ok': False, 'error': str(e)})
+        return 1
+    for path, result in zip(paths, results):
+        _emit(dict(path=path, **result, ok=True))
+    return 0
+
+
+def _decode_shards(args, paths):
+
+    password = _resolve_password(args)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    sets = find_shard_sets(paths, args.workers)
+    if not sets:
+        _emit({'paths': paths, 'ok': False, 'error': "No shards of a split message found"})
+        return 1
+
+    failures = 0
+    for data_id, shards in sets.items():
+        record = {'content_id': data_id, 'paths': [path for _, path in shards]}
+        try:
+            encrypted_data = join_shards(shards, args.workers, args.strip_rows)
+            if args.output_dir:
+                output_path = os.path.join(args.output_dir, data_id + '.txt')
+                chunks = MessageEncryptor.decrypt_stream([encrypted_data], password)
+                record.update(output=output_path, bytes=_write_chunks(output_path, chunks))
+            else:
+                record.update(message=MessageEncryptor.decrypt_message(encrypted_data, password),
+                              bytes=len(encrypted_data))
+            record['ok'] = True
+        except Exception as e:
+            record.update(ok=False, error=str(e))
+            failures += 1
+        _emit(record)
+    return failures
+
+
+def _cmd_decode(args, paths):
+
+    if args.shards:
+        if args.scatter:
+            raise SystemExit("error: --scatter cannot be combined with --shards")
+        return _decode_shards(args, paths)
+
+    password = _resolve_password(args)
+    key = _resolve_scatter_key(args, password)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    jobs = [
+        (path, (path, password, args.strip_rows,
+                output_path_for(path, args.output_dir, '', '.txt') if args.output_dir else None, key))
+        for path in paths
+    ]
+    return run_jobs(*_with_profile(args, _decode_file, jobs), args.workers)
+
+
+def _cmd_probe(args, paths):
+
+    return run_jobs(_probe_file, [(path, (path,)) for path in paths], args.workers)
+
+
+def _cmd_capacity(args, paths):
+
+    jobs = [(path, (path, args.bits, 4 if args.alpha else 3)) for path in paths]
+    return run_jobs(_capacity_file, jobs, args.workers)
+
+
+def _cmd_scan(args, roots):
+
+    counts = {'files': 0, 'cached': 0, 'payloads': 0, 'errors': 0, 'full_decodes': 0}
+    with ScanIndex(args.index or ':memory:') as index:
+        for record in scan(roots, index, args.workers, args.rescan):
+            counts['files'] += 1
+            counts['cached'] += record['cached']
+            counts['payloads'] += record['has_payload']
+            counts['errors'] += record['error'] is not None
+            counts['full_decodes'] += not record['cached'] and bool(record['full_decode'])
+            if args.all or record['has_payload'] or record['error'] is not None:
+                error = record.pop('error')
+                record['ok'] = error is None
+                if error is not None:
+                    record['error'] = error
+                _emit(record)
+
+    sys.stderr.write(
+        f"{counts['files']} images, {counts['files'] - counts['cached']} checked, "
+        f"{counts['cached']} unchanged, {counts['payloads']} with a payload, {counts['errors']} unreadable\n"
+    )
+    if counts['full_decodes']:
+        sys.stderr.write(
+            f"{counts['full_decodes']} checked images could not be read header-only and were fully decoded\n"
+        )
+    return counts['errors']
+
+
+def _cmd_serve(args, paths):
+
+    # asyncio and the HTTP layer are only needed by this command
+    from .service import serve
+
+    serve(args.host, args.port, workers=args.workers, queue_size=args.queue, timeout=args.timeout,
+          max_body=args.max_body * 1024 * 1024)
+    return 0
+
+
+def build_parser():
+
+    parser = argparse.ArgumentParser(
+        prog='phantompix',
+        description="Hide encrypted messages in images without the GUI."
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('inputs', nargs='*', help="image paths or glob patterns")
+    common.add_argument('--manifest', action='append', default=[],
+                        help="file listing one path or glob per line (repeatable)")
+    common.add_argument('-j', '--workers', type=int, default=None,
+                        help="worker processes (default: number of CPU cores)")
+
+    secret = argparse.ArgumentParser(add_help=False)
+    secret.add_argument('-p', '--password', help=f"password (or set ${PASSWORD_ENV})")
+    secret.add_argument('--password-file', help="read the password from the first line of a file")
+    secret.add_argument('--strip-rows', type=int, default=None,
+                        help="stream the image in strips of N rows to bound memory on huge covers")
+    secret.add_argument('--scatter', action='store_true',
+                        help="spread the payload over the whole image at password-keyed positions "
+                             "(decoding needs --scatter as well)")
+    secret.add_argument('--profile', action='store_true',
+                        help="add a per-stage time and memory breakdown to each result")
+    secret.add_argument('--profile-dir',
+                        help="also write a Chrome trace and cProfile data per input to this directory")
+
+    layout = argparse.ArgumentParser(add_help=False)
+    layout.add_argument('--bits', type=int, choices=range(1, ImageSteganography.MAX_BITS_PER_CHANNEL + 1),
+                        default=1, help="low bits used per channel: more capacity, less invisible (default: 1)")
+    layout.add_argument('--alpha', action='store_true',
+                        help="also use the alpha channel (RGBA covers only)")
+
+    encode = subparsers.add_parser('encode', parents=[common, secret, layout],
+                                   help="hide a message in each image")
+    encode.add_argument('-m', '--message', help="message text")
+    encode.add_argument('--message-file', help="stream the message from a file (any content, any size that fits)")
+    encode.add_argument('-o', '--output-dir', help="directory for encoded images (default: next to input)")
+    encode.add_argument('--suffix', default='_encoded', help="output name suffix (default: _encoded)")
+    encode.add_argument('--kdf', default=MessageEncryptor.DEFAULT_KDF,
+                        help="key derivation: scrypt, pbkdf2, argon2id or sha256, optionally with "
+                             "parameters, e.g. scrypt:log_n=18 (default: scrypt)")
+    encode.add_argument('--compress', default='auto',
+                        help=f"compression codec, optionally with a level, e.g. zlib:9; 'auto' picks "
+                             f"one from the message (available: {', '.join(available_codecs())})")
+    encode.add_argument('--png', default='default',
+                        help=f"PNG output preset ({', '.join(PNG_PRESETS)}), optionally with overrides, "
+                             f"e.g. fast:level=3 or default:filter=up,optimize=1 "
+                             f"(filters: {', '.join(PNG_FILTERS)})")
+    encode.add_argument('--threads', type=int, default=None,
+                        help="threads embedding each payload in parallel bands (default: 1); "
+                             "the output is the same")
+    encode.add_argument('--shards', action='store_true',
+                        help="split one message across all inputs instead of hiding it in each")
+    encode.set_defaults(handler=_cmd_encode)
+
+    decode = subparsers.add_parser('decode', parents=[common, secret], help="reveal the message in each image")
+    decode.add_argument('-o', '--output-dir',
+                        help="write each message to <name>.txt in this directory instead of stdout")
+    decode.add_argument('--shards', action='store_true',
+                        help="join messages split across the inputs (directories allowed); "
+                             "writes <content id>.txt with --output-dir")
+    decode.set_defaults(handler=_cmd_decode)
+
+    probe = subparsers.add_parser('probe', parents=[common], help="check which images carry a payload (header only)")
+    probe.set_defaults(handler=_cmd_probe)
+
+    capacity = subparsers.add_parser('capacity', parents=[common, layout],
+                                     help="report how many bytes each image can hold")
+    capacity.set_defaults(handler=_cmd_capacity)
+
+    scan_parser = subparsers.add_parser('scan', help="find the images carrying a payload in directory trees")
+    scan_parser.add_argument('roots', nargs='+', help="directories to walk (recursively)")
+    scan_parser.add_argument('--index', help="SQLite index file; unchanged files are not checked again")
+    scan_parser.add_argument('--rescan', action='store_true', help="check every file, even if unchanged")
+    scan_parser.add_argument('--all', action='store_true', help="report every image, not only those with a payload")
+    scan_parser.add_argument('-j', '--workers', type=int, default=None,
+                             help="worker processes (default: number of CPU cores)")
+    scan_parser.set_defaults(handler=_cmd_scan)
+
+    serve = subparsers.add_parser('serve', help="run the local HTTP embedding service")
+    serve.add_argument('--host', default='127.0.0.1', help="address to bind (default: 127.0.0.1)")
+    serve.add_argument('--port', type=int, default=8765, help="port to listen on (default: 8765)")
+    serve.add_argument('-j', '--workers', type=int, default=None,
+                       help="worker processes (default: number of CPU cores)")
+    serve.add_argument('--queue', type=int, default=None,
+                       help="requests admitted beyond the busy workers before answering 429 "
+                            "(default: twice the workers)")
+    serve.add_argument('--timeout', type=float, default=60.0, help="seconds a job may run (default: 60)")
+    serve.add_argument('--max-body', type=int, default=512, help="largest request body in MB (default: 512)")
+    serve.set_defaults(handler=_cmd_serve)
+
+    return parser
+
+
+def main(argv=None):
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        paths = None
+    elif args.command == 'scan':
+        paths = args.roots
+    else:
+        paths = expand_inputs(args.inputs, args.manifest, directories=getattr(args, 'shards', False))
+        if not paths:
+            parser.error("no input images matched")
+
+    try:
+        failures = args.handler(args, paths)
+    except BrokenPipeError:
+        # The consumer (e.g. `head`) closed stdout; stop quietly.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
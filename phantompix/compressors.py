@@ -0,0 +1,427 @@
+"""
+Compression codecs for MessageEncryptor.
+
+Every codec has a one-byte ID that is stored in the payload header, so
+the reader knows how to inflate the data without being told. Levels only
+matter when compressing and are not stored.
+
+    0  none
+    1  zlib      (levels 0-9, default 6)
+    2  lzma      (presets 0-9, default 6)
+    3  bz2       (levels 1-9, default 9)
+    4  zstd      (levels 1-22, default 10; needs the zstandard package)
+    5  lz4       (levels 0-16, default 0; needs the lz4 package)
+
+select_codec picks one from a sample of the data: high-entropy input
+(already compressed files, media, ciphertext) and tiny messages skip
+compression, large compressible input gets whichever of lzma and bz2
+packs a trial of the sample smaller, everything else zlib. Run
+benchmarks/bench_codecs.py to see the tradeoffs on your own machine.
+
+Developed by: Zork
+"""
+import bz2
+import lzma
+import zlib
+
+
+SAMPLE_SIZE = 64 * 1024
+
+# Above this many bits per byte a sample is treated as incompressible
+ENTROPY_LIMIT = 7.5
+# Below this size the codec framing costs more than it saves
+MIN_COMPRESS_SIZE = 96
+# From this size on, a better ratio is worth a slower codec
+STRONG_COMPRESS_SIZE = 256 * 1024
+# A trial compression of the sample must save at least this much
+MIN_SAVING = 0.05
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+# The zstd format's limit on what one block inflates to
+ZSTD_BLOCK_SIZE = 128 * 1024
+
+
+class Codec:
+
+    codec_id = None
+    name = None
+    levels = None
+    default_level = None
+
+    def __init__(self, level: int = None):
+        if level is None:
+            level = self.default_level
+        elif self.levels is None:
+            raise ValueError(f"{self.name} has no compression levels")
+        elif not self.levels[0] <= level <= self.levels[1]:
+            raise ValueError(f"{self.name} level must be between {self.levels[0]} and {self.levels[1]}")
+        self.level = level
+
+    @classmethod
+    def available(cls) -> bool:
+
+        return True
+
+    def compressor(self):
+        """Return an object with ``compress(data)`` and ``flush()``."""
+
+        raise NotImplementedError
+
+    def decompressor(self, max_length: int) -> 'Decompressor':
+
+        raise NotImplementedError
+
+    def __repr__(self):
+
+        return self.name if self.level is None else f"{self.name}:{self.level}"
+
+
+class Decompressor:
+    """Incremental decompression with bounded output pieces.
+
+    Wraps the ``decompress(data, max_length)`` / ``needs_input`` / ``eof``
+    interface shared by lzma, bz2 and lz4.frame.
+    """
+
+    def __init__(self, decompressor, max_length: int):
+        self._decompressor = decompressor
+        self._max_length = max_length
+
+    def feed(self, data: bytes):
+
+        yield self._decompressor.decompress(data, self._max_length)
+        while not self._decompressor.eof and not self._decompressor.needs_input:
+            yield self._decompressor.decompress(b'', self._max_length)
+
+    def finish(self):
+
+        if not self._decompressor.eof:
+            raise ValueError("Compressed payload is truncated")
+        return ()
+
+
+class _PassThrough:
+
+    def compress(self, data: bytes) -> bytes:
+
+        return data
+
+    def flush(self) -> bytes:
+
+        return b''
+
+
+class _PassThroughDecompressor(Decompressor):
+
+    def __init__(self):
+        pass
+
+    def feed(self, data: bytes):
+
+        yield data
+
+    def finish(self):
+
+        return ()
+
+
+class _ZlibDecompressor(Decompressor):
+
+    def feed(self, data: bytes):
+
+        while data:
+            yield self._decompressor.decompress(data, self._max_length)
+            data = self._decompressor.unconsumed_tail
+
+    def finish(self):
+
+        data = self._decompressor.flush()
+        if not self._decompressor.eof:
+            raise ValueError("Compressed payload is truncated")
+        return (data,)
+
+
+class NoCodec(Codec):
+
+    codec_id = 0
+    name = 'none'
+
+    def compressor(self):
+
+        return _PassThrough()
+
+    def decompressor(self, max_length: int) -> Decompressor:
+
+        return _PassThroughDecompressor()
+
+    def __repr__(self):
+
+        return self.name
+
+
+class ZlibCodec(Codec):
+
+    codec_id = 1
+    name = 'zlib'
+    levels = (0, 9)
+    default_level = 6
+
+    def compressor(self):
+
+        return zlib.compressobj(self.level)
+
+    def decompressor(self, max_length: int) -> Decompressor:
+
+        return _ZlibDecompressor(zlib.decompressobj(), max_length)
+
+
+class LzmaCodec(Codec):
+
+    codec_id = 2
+    name = 'lzma'
+    levels = (0, 9)
+    default_level = 6
+
+    def compressor(self):
+
+        return lzma.LZMACompressor(lzma.FORMAT_XZ, check=lzma.CHECK_NONE, preset=self.level)
+
+    def decompressor(self, max_length: int) -> Decompressor:
+
+        return Decompressor(lzma.LZMADecompressor(lzma.FORMAT_XZ), max_length)
+
+
+class Bz2Codec(Codec):
+
+    codec_id = 3
+    name = 'bz2'
+    levels = (1, 9)
+    default_level = 9
+
+    def compressor(self):
+
+        return bz2.BZ2Compressor(self.level)
+
+    def decompressor(self, max_length: int) -> Decompressor:
+
+        return Decompressor(bz2.BZ2Decompressor(), max_length)
+
+
+class ZstdCodec(Codec):
+
+    codec_id = 4
+    name = 'zstd'
+    levels = (1, 22)
+    default_level = 10
+
+    @classmethod
+    def available(cls) -> bool:
+
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def compressor(self):
+
+        import zstandard
+        return zstandard.ZstdCompressor(level=self.level).compressobj()
+
+    def decompressor(self, max_length: int) -> Decompressor:
+
+        import zstandard
+        return _ZstdDecompressor(zstandard.ZstdDecompressor().decompressobj(), max_length)
+
+
+class _ZstdDecompressor(Decompressor):
+    """Feeds zstandard's decompressobj one block at a time.
+
+    decompressobj has no output limit, but a zstd block inflates to at
+    most ZSTD_BLOCK_SIZE, so walking the block headers bounds every call;
+    the output is then split into pieces of at most ``max_length``.
+    """
+
+    def __init__(self, decompressor, max_length: int):
+        super().__init__(decompressor, max_length)
+        self._pending = bytearray()
+        self._state = 'header'
+        self._checksum = 0
+
+    def _next_unit(self):
+        """(size, next state) of the next whole header or block, or None."""
+
+        pending = self._pending
+        if self._state == 'header':
+            if len(pending) < 5:
+                return None
+            if pending[:4] != ZSTD_MAGIC:
+                # Not a frame we can walk; decompressobj reports the error
+                return len(pending), 'end'
+            descriptor = pending[4]
+            single_segment = descriptor >> 5 & 1
+            self._checksum = 4 if descriptor & 4 else 0
+            size = (5 + (not single_segment) + (0, 1, 2, 4)[descriptor & 3]
+                    + (single_segment, 2, 4, 8)[descriptor >> 6])
+            return size, 'block'
+        if self._state == 'block':
+            if len(pending) < 3:
+                return None
+            block = int.from_bytes(pending[:3], 'little')
+            block_size = block >> 3
+            if block_size > ZSTD_BLOCK_SIZE:
+                raise ValueError("Corrupt compressed payload")
+            # An RLE block stores its single repeated byte
+            size = 3 + (1 if block >> 1 & 3 == 1 else block_size)
+            if not block & 1:
+                return size, 'block'
+            return size, 'checksum' if self._checksum else 'end'
+        if self._state == 'checksum':
+            return 4, 'end'
+        return (len(pending), 'end') if pending else None
+
+    def feed(self, data: bytes):
+
+        self._pending += data
+        while True:
+            unit = self._next_unit()
+            if unit is None or unit[0] > len(self._pending):
+                return
+            size, self._state = unit
+            output = self._decompressor.decompress(bytes(self._pending[:size]))
+            del self._pending[:size]
+            for start in range(0, len(output), self._max_length):
+                yield output[start:start + self._max_length]
+
+
+class Lz4Codec(Codec):
+
+    codec_id = 5
+    name = 'lz4'
+    levels = (0, 16)
+    default_level = 0
+
+    @classmethod
+    def available(cls) -> bool:
+
+        try:
+            import lz4.frame  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def compressor(self):
+
+        import lz4.frame
+        return _Lz4Compressor(lz4.frame.LZ4FrameCompressor(compression_level=self.level))
+
+    def decompressor(self, max_length: int) -> Decompressor:
+
+        import lz4.frame
+        return Decompressor(lz4.frame.LZ4FrameDecompressor(), max_length)
+
+
+class _Lz4Compressor:
+
+    def __init__(self, compressor):
+        self._compressor = compressor
+        self._header = compressor.begin()
+
+    def compress(self, data: bytes) -> bytes:
+
+        header, self._header = self._header, b''
+        return header + self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+
+        header, self._header = self._header, b''
+        return header + self._compressor.flush()
+
+
+CODEC_REGISTRY = {}
+
+
+def register_codec(codec_class):
+
+    CODEC_REGISTRY[codec_class.codec_id] = codec_class
+    return codec_class
+
+
+for _codec_class in (NoCodec, ZlibCodec, LzmaCodec, Bz2Codec, ZstdCodec, Lz4Codec):
+    register_codec(_codec_class)
+
+
+def available_codecs():
+
+    return [codec_class.name for codec_class in CODEC_REGISTRY.values() if codec_class.available()]
+
+
+def get_codec(spec) -> Codec:
+    """Build a codec from an instance, a name, or 'name:level'."""
+
+    if isinstance(spec, Codec):
+        return spec
+
+    name, _, level = spec.partition(':')
+    for codec_class in CODEC_REGISTRY.values():
+        if codec_class.name == name.strip().lower():
+            break
+    else:
+        names = ', '.join(CODEC_REGISTRY[codec_id].name for codec_id in sorted(CODEC_REGISTRY))
+        raise ValueError(f"Unknown codec '{name}'. Available: {names}")
+
+    if not codec_class.available():
+        raise ValueError(f"The {codec_class.name} codec needs the {codec_class.name} package installed")
+    return codec_class(int(level) if level.strip() else None)
+
+
+def codec_for_id(codec_id: int) -> Codec:
+
+    codec_class = CODEC_REGISTRY.get(codec_id)
+    if codec_class is None:
+        raise ValueError("Unsupported compression codec")
+    if not codec_class.available():
+        raise ValueError(f"This payload needs the {codec_class.name} package installed")
+    return codec_class()
+
+
+def entropy(sample: bytes) -> float:
+    """Shannon entropy of ``sample`` in bits per byte (0.0 - 8.0)."""
+
+    if not sample:
+        return 0.0
+    # numpy is imported here so that importing the encryptor stays cheap
+    import numpy as np
+
+    counts = np.bincount(np.frombuffer(sample, dtype=np.uint8), minlength=256)
+    probabilities = counts[counts > 0] / len(sample)
+    return float(-(probabilities * np.log2(probabilities)).sum())
+
+
+def select_codec(sample: bytes, total_size: int = None) -> Codec:
+    """Pick a codec for data that starts with ``sample``.
+
+    ``total_size`` is the full data size when known; ``None`` means a
+    stream of unknown length and is treated as large.
+    """
+    size = len(sample) if total_size is None and len(sample) < SAMPLE_SIZE else total_size
+    if size is not None and size < MIN_COMPRESS_SIZE:
+        return NoCodec()
+
+    sample = sample[:SAMPLE_SIZE]
+    if entropy(sample) > ENTROPY_LIMIT:
+        return NoCodec()
+
+    # Byte entropy ignores ordering, so confirm with a cheap trial run.
+    if len(zlib.compress(sample, 1)) > len(sample) * (1 - MIN_SAVING):
+        return NoCodec()
+
+    if size is None or size >= STRONG_COMPRESS_SIZE:
+        return min((LzmaCodec(), Bz2Codec()), key=lambda codec: _trial_size(codec, sample))
+    return ZlibCodec()
+
+
+def _trial_size(codec: Codec, sample: bytes) -> int:
+
+    compressor = codec.compressor()
+    return len(compressor.compress(sample)) + len(compressor.flush())
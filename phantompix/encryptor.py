@@ -1,31 +1,343 @@
+"""
+Encryption and decryption module using AES encryption with password-based key derivation.
 
+Every payload written by this module starts with a header recording how
+the key was derived:
 
-import sys
+    PAYLOAD_MAGIC   3 bytes   b'PPE'
+    version         1 byte    2 (Fernet) or 3 (chunked AEAD)
+    kdf_id          1 byte    see kdf.py
+    params_length   1 byte    + KDF parameter block
+    salt_length     1 byte    + salt
+
+Version 3, written by default, continues with
+
+    cipher_id       1 byte    1 = AES-256-GCM, 2 = ChaCha20-Poly1305
+    codec_id        1 byte    see compressors.py (0 = none, 1 = zlib, ...)
+    chunk_size      4 bytes   '>I', plaintext bytes per segment
+    nonce_prefix    7 bytes
+
+followed by raw binary segments of chunk_size + 16 bytes, the last one
+shorter. Segment ``i`` is sealed with nonce ``prefix | i | last_flag``
+and the header as associated data, so segments cannot be reordered,
+dropped or truncated. Compression and encryption run incrementally, so
+encrypt_stream/decrypt_stream hold one segment at a time. By default the
+codec is chosen from a sample of the message (see select_codec).
+
+Version 2 continues with a Fernet token. Data without any header is a
+bare Fernet token from the original format (single SHA-256 of the
+password). Both still decrypt.
+
+Developed by: Zork
+"""
+import base64
+import io
 import os
-from pathlib import Path
-
-# Add current directory to path
-current_dir = Path(__file__).parent
-sys.path.insert(0, str(current_dir))
-
-try:
-    # Import the compiled module
-    import encryptor
-    
-    # If original had main execution, run it
-    # No main function detected
-    
-    
-    
-    
-    
-    print(f"Module 'encryptor' loaded successfully!")
-    print(f"Available attributes: {[attr for attr in dir(encryptor) if not attr.startswith('_')]}")
-    
-except ImportError as e:
-    print(f"Error importing compiled module: {e}")
-    print("Make sure the .pyd file is in the same directory as this launcher.")
-    sys.exit(1)
-except Exception as e:
-    print(f"Error running module: {e}")
-    sys.exit(1)
+import struct
+import zlib
+
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+
+from .compressors import SAMPLE_SIZE, NoCodec, codec_for_id, get_codec, select_codec
+from .kdf import KDF_REGISTRY, SALT_SIZE, Sha256KDF, get_kdf, key_cache
+from .tracing import span, traced_iter
+
+
+class _SourceError(Exception):
+    """Raised from the error of the iterable a _ByteStream reads, which is its cause."""
+
+
+class _ByteStream:
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+        self.consumed = bytearray()
+
+    def _next(self):
+
+        try:
+            return next(self._chunks, None)
+        except Exception as e:
+            raise _SourceError() from e
+
+    def read(self, size: int, record: bool = False) -> bytes:
+
+        while len(self._buffer) < size:
+            chunk = self._next()
+            if chunk is None:
+                break
+            self._buffer += chunk
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        if record:
+            self.consumed += data
+        return data
+
+    def read_all(self) -> bytes:
+
+        for chunk in iter(self._next, None):
+            self._buffer += chunk
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class MessageEncryptor:
+
+    PAYLOAD_MAGIC = b'PPE'
+    FERNET_VERSION = 2
+    STREAM_VERSION = 3
+    PAYLOAD_VERSION = STREAM_VERSION
+    DEFAULT_KDF = 'scrypt'
+    DEFAULT_CIPHER = 'aes-256-gcm'
+    CIPHERS = {
+        1: ('aes-256-gcm', AESGCM),
+        2: ('chacha20-poly1305', ChaCha20Poly1305),
+    }
+    CHUNK_SIZE = 64 * 1024
+    MAX_CHUNK_SIZE = 16 * 1024 * 1024
+    NONCE_PREFIX_SIZE = 7
+    TAG_SIZE = 16
+
+    @staticmethod
+    def _pack_header(kdf, salt: bytes, version: int) -> bytes:
+
+        params = kdf.pack_params()
+        return (
+            MessageEncryptor.PAYLOAD_MAGIC
+            + struct.pack('>BBB', version, kdf.kdf_id, len(params))
+            + params + struct.pack('>B', len(salt)) + salt
+        )
+
+    @staticmethod
+    def _read_header(stream: _ByteStream):
+
+        magic = stream.read(len(MessageEncryptor.PAYLOAD_MAGIC), record=True)
+        if magic != MessageEncryptor.PAYLOAD_MAGIC:
+            # Bare Fernet token from the original format
+            return 1, Sha256KDF(), b''
+
+        version, kdf_id, params_length = struct.unpack('>BBB', stream.read(3, record=True))
+        if version not in (MessageEncryptor.FERNET_VERSION, MessageEncryptor.STREAM_VERSION):
+            raise ValueError("Unsupported payload format")
+        if kdf_id not in KDF_REGISTRY:
+            raise ValueError("Unsupported key derivation")
+        kdf = KDF_REGISTRY[kdf_id].unpack_params(stream.read(params_length, record=True))
+        salt_length = stream.read(1, record=True)[0]
+        salt = stream.read(salt_length, record=True)
+        return version, kdf, salt
+
+    @staticmethod
+    def _key(kdf, password: str, salt: bytes) -> bytes:
+
+        with span('key derivation', kdf=repr(kdf)):
+            return key_cache.derive(kdf, password.encode('utf-8'), salt)
+
+    @staticmethod
+    def _cipher_id(name: str) -> int:
+
+        for cipher_id, (cipher_name, _) in MessageEncryptor.CIPHERS.items():
+            if cipher_name == name.lower():
+                return cipher_id
+        names = ', '.join(cipher_name for cipher_name, _ in MessageEncryptor.CIPHERS.values())
+        raise ValueError(f"Unknown cipher '{name}'. Available: {names}")
+
+    @staticmethod
+    def _nonce(prefix: bytes, index: int, last: bool) -> bytes:
+
+        return prefix + struct.pack('>IB', index, 1 if last else 0)
+
+    @staticmethod
+    def _remaining_size(source):
+
+        try:
+            if not source.seekable():
+                return None
+            position = source.tell()
+            end = source.seek(0, io.SEEK_END)
+            source.seek(position)
+        except (AttributeError, OSError):
+            return None
+        return end - position
+
+    @staticmethod
+    def _choose_codec(source, compress):
+        """Return (codec, first block already read from ``source``)."""
+
+        if compress is True:
+            size = MessageEncryptor._remaining_size(source)
+            sample = source.read(SAMPLE_SIZE)
+            return select_codec(sample, size), sample
+        if not compress:
+            return NoCodec(), b''
+        return get_codec(compress), b''
+
+    @staticmethod
+    def encrypt_stream(source, password: str, compress=True, kdf=None,
+                       cipher: str = None, chunk_size: int = None):
+        """Yield a version 3 payload piece by piece.
+
+        ``source`` is a binary file-like object or a bytes-like value.
+        ``compress`` is True to pick a codec from the data, False for none,
+        or a codec name such as 'zlib:9' or 'lzma'.
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        chunk_size = chunk_size or MessageEncryptor.CHUNK_SIZE
+        if not 0 < chunk_size <= MessageEncryptor.MAX_CHUNK_SIZE:
+            raise ValueError("Invalid chunk size")
+        codec, block = MessageEncryptor._choose_codec(source, compress)
+
+        kdf = get_kdf(kdf or MessageEncryptor.DEFAULT_KDF)
+        salt = key_cache.salt_for(kdf, password.encode('utf-8'))
+        cipher_id = MessageEncryptor._cipher_id(cipher or MessageEncryptor.DEFAULT_CIPHER)
+        aead = MessageEncryptor.CIPHERS[cipher_id][1](MessageEncryptor._key(kdf, password, salt))
+        nonce_prefix = os.urandom(MessageEncryptor.NONCE_PREFIX_SIZE)
+
+        header = (
+            MessageEncryptor._pack_header(kdf, salt, MessageEncryptor.STREAM_VERSION)
+            + struct.pack('>BBI', cipher_id, codec.codec_id, chunk_size) + nonce_prefix
+        )
+        yield header
+
+        compressor = codec.compressor()
+        buffer = bytearray()
+        index = 0
+        finished = False
+        while not finished:
+            block = block or source.read(chunk_size)
+            with span('compress', codec=repr(codec)):
+                if block:
+                    buffer += compressor.compress(block)
+                    block = b''
+                else:
+                    finished = True
+                    buffer += compressor.flush()
+
+            # A segment is only sealed as non-final once more data is known
+            # to follow it; the remainder always becomes the final segment.
+            while len(buffer) > chunk_size:
+                nonce = MessageEncryptor._nonce(nonce_prefix, index, False)
+                with span('encrypt'):
+                    segment = aead.encrypt(nonce, bytes(buffer[:chunk_size]), header)
+                yield segment
+                del buffer[:chunk_size]
+                index += 1
+
+        nonce = MessageEncryptor._nonce(nonce_prefix, index, True)
+        with span('encrypt'):
+            segment = aead.encrypt(nonce, bytes(buffer), header)
+        yield segment
+
+    @staticmethod
+    def estimate_size(message, compress=True, kdf=None, chunk_size: int = None) -> int:
+        """Predict the size of the payload encrypt_message would produce.
+
+        Exact for messages up to 64 KB (the codec runs on the whole text);
+        longer ones extrapolate from the ratio on their first 64 KB, which
+        errs high for repetitive text. No key is derived, so this is cheap
+        enough to call while the user types.
+        """
+        data = message.encode('utf-8') if isinstance(message, str) else bytes(message)
+        chunk_size = chunk_size or MessageEncryptor.CHUNK_SIZE
+        kdf = get_kdf(kdf or MessageEncryptor.DEFAULT_KDF)
+
+        sample = data[:SAMPLE_SIZE]
+        if compress is True:
+            codec = select_codec(sample, len(data))
+        else:
+            codec = get_codec(compress) if compress else NoCodec()
+        compressor = codec.compressor()
+        sample_size = len(compressor.compress(sample)) + len(compressor.flush())
+        body = sample_size if len(sample) == len(data) else -(-sample_size * len(data) // len(sample))
+
+        header = (
+            len(MessageEncryptor.PAYLOAD_MAGIC) + 4 + len(kdf.pack_params())
+            + (SALT_SIZE if kdf.salted else 0)
+            + 6 + MessageEncryptor.NONCE_PREFIX_SIZE
+        )
+        segments = max(1, -(-body // chunk_size))
+        return header + body + segments * MessageEncryptor.TAG_SIZE
+
+    @staticmethod
+    def _decrypt_segments(stream: _ByteStream, kdf, salt: bytes, password: str):
+
+        cipher_id, codec_id, chunk_size = struct.unpack('>BBI', stream.read(6, record=True))
+        if cipher_id not in MessageEncryptor.CIPHERS:
+            raise ValueError("Unsupported cipher")
+        codec = codec_for_id(codec_id)
+        if not 0 < chunk_size <= MessageEncryptor.MAX_CHUNK_SIZE:
+            raise ValueError("Invalid chunk size")
+        nonce_prefix = stream.read(MessageEncryptor.NONCE_PREFIX_SIZE, record=True)
+        header = bytes(stream.consumed)
+
+        aead = MessageEncryptor.CIPHERS[cipher_id][1](MessageEncryptor._key(kdf, password, salt))
+        decompressor = codec.decompressor(chunk_size)
+        segment_size = chunk_size + MessageEncryptor.TAG_SIZE
+
+        index = 0
+        segment = stream.read(segment_size)
+        while True:
+            following = stream.read(segment_size)
+            last = not following
+            nonce = MessageEncryptor._nonce(nonce_prefix, index, last)
+            with span('decrypt'):
+                plaintext = aead.decrypt(nonce, segment, header)
+            yield from traced_iter(decompressor.feed(plaintext), 'decompress')
+
+            if last:
+                break
+            segment = following
+            index += 1
+
+        yield from traced_iter(decompressor.finish(), 'decompress')
+
+    @staticmethod
+    def decrypt_stream(chunks, password: str, compressed: bool = True):
+        """Yield plaintext pieces from an iterable of payload pieces.
+
+        ``compressed`` only applies to Fernet payloads; version 3 records
+        compression in its header.
+        """
+        try:
+            stream = _ByteStream(chunks)
+            version, kdf, salt = MessageEncryptor._read_header(stream)
+            if version == MessageEncryptor.STREAM_VERSION:
+                yield from MessageEncryptor._decrypt_segments(stream, kdf, salt, password)
+                return
+
+            token = (stream.consumed if version == 1 else b'') + stream.read_all()
+            fernet = Fernet(base64.urlsafe_b64encode(MessageEncryptor._key(kdf, password, salt)))
+            with span('decrypt'):
+                decrypted = fernet.decrypt(bytes(token))
+            if compressed:
+                with span('decompress'):
+                    decrypted = zlib.decompress(decrypted)
+            yield decrypted
+        except _SourceError as e:
+            # Errors reading the payload (e.g. no message, bad checksum) are
+            # not decryption failures and pass through unchanged
+            raise e.__cause__
+        except Exception:
+            raise ValueError("Decryption failed: Invalid password or corrupted data")
+
+    @staticmethod
+    def encrypt_message(message: str, password: str, compress=True, kdf=None) -> bytes:
+
+        return b''.join(MessageEncryptor.encrypt_stream(message.encode('utf-8'), password, compress, kdf))
+
+    @staticmethod
+    def decrypt_message(encrypted_data: bytes, password: str, compressed: bool = True) -> str:
+
+        try:
+            chunks = MessageEncryptor.decrypt_stream([encrypted_data], password, compressed)
+            return b''.join(chunks).decode('utf-8')
+        except Exception:
+            raise ValueError("Decryption failed: Invalid password or corrupted data")
+
+    @staticmethod
+    def clear_key_cache():
+
+        key_cache.clear()
@@ -0,0 +1,422 @@
+"""
+Batch encode queue for the PhantomPix window.
+
+Images, or whole folders, dropped on the panel become jobs. START runs
+every waiting job with the window's message, password and layout on the
+panel's own thread pool, several at a time, and writes each result to a
+name built from a template such as "{stem}_encoded.png", next to the
+image or in a chosen folder. No dialog is shown per file, so existing
+files are never replaced: a name that already exists, or that another
+job in the queue writes, gets the job's index appended. Every job row
+has its own progress bar; failed or stopped jobs can be retried.
+
+Developed by: Zork
+"""
+import os
+
+from PyQt6.QtCore import Qt, QThreadPool, pyqtSignal
+from PyQt6.QtWidgets import (QAbstractItemView, QFileDialog, QGroupBox, QHBoxLayout, QHeaderView,
+                             QLabel, QLineEdit, QProgressBar, QPushButton, QTableWidget,
+                             QTableWidgetItem, QVBoxLayout)
+
+from .encryptor import MessageEncryptor
+from .scatter import scatter_key
+from .scan import IMAGE_EXTENSIONS, walk_images
+from .steganography import ImageSteganography
+from .workers import PipelineWorker
+
+
+DEFAULT_TEMPLATE = "{stem}_encoded.png"
+# Jobs mostly run in NumPy, zlib and Pillow, which release the GIL
+MAX_THREADS = 4
+
+WAITING = 'waiting'
+QUEUED = 'queued'
+DONE = 'done'
+FAILED = 'failed'
+STOPPED = 'stopped'
+
+BUTTON_STYLE = """
+    QPushButton {
+        background: rgba(102, 126, 234, 0.25);
+        color: #c0c8ff;
+        border: 1px solid rgba(102, 126, 234, 0.5);
+        border-radius: 6px;
+        padding: 0px 10px;
+        font-size: 10px;
+        font-weight: bold;
+    }
+    QPushButton:hover {
+        background: rgba(102, 126, 234, 0.45);
+        color: white;
+    }
+    QPushButton:disabled {
+        color: #666;
+    }
+"""
+
+BAR_STYLE = """
+    QProgressBar {
+        background: rgba(0, 0, 0, 0.3);
+        border: 1px solid rgba(102, 126, 234, 0.3);
+        border-radius: 4px;
+        color: #ffffff;
+        font-size: 10px;
+    }
+    QProgressBar::chunk {
+        background: %s;
+        border-radius: 4px;
+    }
+"""
+
+STATE_COLORS = {
+    WAITING: "rgba(102, 126, 234, 0.5)",
+    QUEUED: "#667eea",
+    DONE: "#11998e",
+    FAILED: "#fc466b",
+    STOPPED: "#888888",
+}
+
+
+def output_name(template: str, image_path: str, index: int) -> str:
+    """File name for the ``index``-th job (from 1) from a template.
+
+    Placeholders: {stem} (name without extension), {name}, {ext} and
+    {index}. '.png' is appended unless the result already ends with it.
+    """
+    name = os.path.basename(image_path)
+    stem, ext = os.path.splitext(name)
+    try:
+        result = template.format(stem=stem, name=name, ext=ext.lstrip('.'), index=index)
+    except (KeyError, IndexError, ValueError):
+        raise ValueError("Output names may only use {stem}, {name}, {ext} and {index}")
+    if not result or os.path.basename(result) != result:
+        raise ValueError("The output name template must give a plain file name")
+    if not result.lower().endswith('.png'):
+        result += '.png'
+    return result
+
+
+def unique_path(path: str, index: int, taken: set) -> str:
+    """``path``, or with '_<index>' (then '_<index>_2', ...) before the extension
+    if it is in ``taken`` (normalised paths) or already exists."""
+
+    base, ext = os.path.splitext(path)
+    candidate = path
+    attempt = 1
+    while os.path.normcase(candidate) in taken or os.path.exists(candidate):
+        candidate = f"{base}_{index}{ext}" if attempt == 1 else f"{base}_{index}_{attempt}{ext}"
+        attempt += 1
+    return candidate
+
+
+class BatchJob:
+
+    def __init__(self, image_path: str):
+        self.image_path = image_path
+        self.output_path = None
+        self.state = WAITING
+        self.error = None
+        self.worker = None
+
+
+class JobQueuePanel(QGroupBox):
+
+    # (done, failed) once no job is left running
+    queue_finished = pyqtSignal(int, int)
+
+    def __init__(self, settings, parent=None):
+        """``settings()`` returns (message, password, bits_per_channel, channels, scatter), or None to abort."""
+
+        super().__init__("📚 Batch Queue • drop images or folders here", parent)
+        self.settings = settings
+        self.jobs = []
+        self.output_dir = None
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(max(1, min(MAX_THREADS, os.cpu_count() or 1)))
+        self.setAcceptDrops(True)
+        self.init_ui()
+
+    def init_ui(self):
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(8, 20, 8, 8)
+        layout.setSpacing(6)
+
+        self.table = QTableWidget(0, 2)
+        self.table.setHorizontalHeaderLabels(["Image", "Status"])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setFixedHeight(140)
+        self.table.setToolTip("Double-click a failed job to retry it")
+        self.table.cellDoubleClicked.connect(self.retry_job)
+        self.table.setStyleSheet("""
+            QTableWidget {
+                background: rgba(0, 0, 0, 0.4);
+                border: 1px solid rgba(102, 126, 234, 0.3);
+                border-radius: 8px;
+                color: #ffffff;
+                font-size: 10px;
+            }
+            QHeaderView::section {
+                background: rgba(102, 126, 234, 0.25);
+                color: #c0c8ff;
+                border: none;
+                font-size: 10px;
+                font-weight: bold;
+            }
+        """)
+        layout.addWidget(self.table)
+
+        output_layout = QHBoxLayout()
+        output_layout.setSpacing(6)
+        output_label = QLabel("💾 Save as")
+        output_label.setStyleSheet("color: #a0a0a0; font-size: 10px;")
+        output_layout.addWidget(output_label)
+
+        self.template_input = QLineEdit(DEFAULT_TEMPLATE)
+        self.template_input.setToolTip("Placeholders: {stem}, {name}, {ext}, {index}")
+        self.template_input.setFixedHeight(24)
+        self.template_input.setStyleSheet("""
+            QLineEdit {
+                background: rgba(0, 0, 0, 0.4);
+                border: 1px solid rgba(102, 126, 234, 0.3);
+                border-radius: 6px;
+                padding: 2px 8px;
+                color: #ffffff;
+                font-size: 10px;
+            }
+        """)
+        output_layout.addWidget(self.template_input, 1)
+
+        self.folder_btn = QPushButton("📂 NEXT TO IMAGE")
+        self.folder_btn.setToolTip("Folder for the encoded images; click again to reset")
+        self.folder_btn.clicked.connect(self.choose_output_dir)
+        output_layout.addWidget(self.folder_btn)
+        layout.addLayout(output_layout)
+
+        buttons = QHBoxLayout()
+        buttons.setSpacing(6)
+        self.summary_label = QLabel("")
+        self.summary_label.setStyleSheet("color: #888; font-size: 10px; font-weight: bold;")
+        buttons.addWidget(self.summary_label, 1)
+
+        self.start_btn = QPushButton("▶ START")
+        self.start_btn.clicked.connect(self.start)
+        self.retry_btn = QPushButton("↻ RETRY FAILED")
+        self.retry_btn.clicked.connect(self.retry_failed)
+        self.stop_btn = QPushButton("■ STOP")
+        self.stop_btn.clicked.connect(self.stop)
+        self.clear_btn = QPushButton("🧹 CLEAR")
+        self.clear_btn.setToolTip("Remove finished and waiting jobs")
+        self.clear_btn.clicked.connect(self.clear)
+        for button in (self.start_btn, self.retry_btn, self.stop_btn, self.clear_btn, self.folder_btn):
+            button.setFixedHeight(24)
+            button.setCursor(Qt.CursorShape.PointingHandCursor)
+            button.setStyleSheet(BUTTON_STYLE)
+        for button in (self.start_btn, self.retry_btn, self.stop_btn, self.clear_btn):
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+
+        self.setLayout(layout)
+        self.update_summary()
+
+    def dragEnterEvent(self, event):
+
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        self.add_paths(paths)
+        event.acceptProposedAction()
+
+    def add_paths(self, paths) -> int:
+        """Queue the images among ``paths``; folders are searched recursively."""
+
+        queued = {job.image_path for job in self.jobs}
+        added = 0
+        for path in paths:
+            if os.path.isdir(path):
+                candidates = sorted(entry.path for entry in walk_images(path))
+            elif path.lower().endswith(IMAGE_EXTENSIONS):
+                candidates = [path]
+            else:
+                candidates = []
+            for candidate in candidates:
+                candidate = os.path.abspath(candidate)
+                if candidate in queued:
+                    continue
+                queued.add(candidate)
+                self.add_job(BatchJob(candidate))
+                added += 1
+        self.update_summary()
+        return added
+
+    def add_job(self, job: BatchJob):
+
+        row = self.table.rowCount()
+        self.jobs.append(job)
+        self.table.insertRow(row)
+        item = QTableWidgetItem(os.path.basename(job.image_path))
+        item.setToolTip(job.image_path)
+        self.table.setItem(row, 0, item)
+        bar = QProgressBar()
+        bar.setRange(0, 100)
+        bar.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.table.setCellWidget(row, 1, bar)
+        self.show_state(job, 0, "⏳ Waiting")
+
+    def show_state(self, job: BatchJob, value: int, text: str, tooltip: str = ""):
+
+        if job not in self.jobs:
+            return
+        bar = self.table.cellWidget(self.jobs.index(job), 1)
+        bar.setValue(value)
+        bar.setFormat(text)
+        bar.setToolTip(tooltip)
+        bar.setStyleSheet(BAR_STYLE % STATE_COLORS[job.state])
+
+    def choose_output_dir(self):
+
+        if self.output_dir:
+            self.output_dir = None
+        else:
+            self.output_dir = QFileDialog.getExistingDirectory(self, "Folder for Encoded Images") or None
+        if self.output_dir:
+            self.folder_btn.setText(f"📂 {os.path.basename(self.output_dir) or self.output_dir}")
+            self.folder_btn.setToolTip(f"{self.output_dir}\nClick to save next to each image again")
+        else:
+            self.folder_btn.setText("📂 NEXT TO IMAGE")
+            self.folder_btn.setToolTip("Folder for the encoded images; click again to reset")
+
+    def start(self):
+
+        waiting = [job for job in self.jobs if job.state == WAITING]
+        if not waiting:
+            return
+        settings = self.settings()
+        if settings is None:
+            return
+        template = self.template_input.text().strip() or DEFAULT_TEMPLATE
+        # Running jobs have not written their files yet, but will
+        taken = {os.path.normcase(job.output_path) for job in self.jobs if job.state == QUEUED}
+        for job in waiting:
+            index = self.jobs.index(job) + 1
+            try:
+                name = output_name(template, job.image_path, index)
+            except ValueError as e:
+                self.fail(job, str(e))
+                continue
+            output_path = os.path.abspath(os.path.join(self.output_dir or os.path.dirname(job.image_path), name))
+            job.output_path = unique_path(output_path, index, taken)
+            taken.add(os.path.normcase(job.output_path))
+            self.run_job(job, *settings)
+        self.update_summary()
+
+    def run_job(self, job: BatchJob, message: str, password: str, bits_per_channel: int, channels: int,
+                scatter: bool = False):
+
+        def embed(encrypted_data):
+            ImageSteganography.encode_message(job.image_path, encrypted_data, job.output_path,
+                                              bits_per_channel=bits_per_channel, channels=channels,
+                                              scatter_key=scatter_key(password) if scatter else None)
+            return job.output_path
+
+        worker = PipelineWorker([
+            ("🔐 Encrypting", lambda _: MessageEncryptor.encrypt_message(message, password, compress=True)),
+            ("🖼️ Embedding", embed),
+        ])
+        worker.signals.progress.connect(
+            lambda value, label: label and self.show_state(job, value, f"{label}... {value}%")
+        )
+        worker.signals.finished.connect(lambda output_path: self.finish(job, output_path))
+        worker.signals.failed.connect(lambda error: self.fail(job, error))
+        worker.signals.cancelled.connect(lambda: self.mark_stopped(job))
+        job.worker = worker
+        job.state = QUEUED
+        job.error = None
+        self.show_state(job, 0, "⏳ Queued")
+        self.thread_pool.start(worker)
+
+    def finish(self, job: BatchJob, output_path: str):
+
+        job.state = DONE
+        job.worker = None
+        self.show_state(job, 100, f"✅ {os.path.basename(output_path)}", output_path)
+        self.job_ended()
+
+    def fail(self, job: BatchJob, error: str):
+
+        job.state = FAILED
+        job.error = error
+        job.worker = None
+        self.show_state(job, 100, f"❌ {error}", f"{error}\nDouble-click to retry")
+        self.job_ended()
+
+    def mark_stopped(self, job: BatchJob):
+
+        job.state = STOPPED
+        job.worker = None
+        self.show_state(job, 0, "⛔ Stopped", "Double-click to retry")
+        self.job_ended()
+
+    def job_ended(self):
+
+        self.update_summary()
+        if not any(job.state == QUEUED for job in self.jobs):
+            self.queue_finished.emit(
+                sum(job.state == DONE for job in self.jobs), sum(job.state == FAILED for job in self.jobs)
+            )
+
+    def retry_job(self, row: int, column: int = 0):
+
+        job = self.jobs[row]
+        if job.state in (FAILED, STOPPED):
+            job.state = WAITING
+            self.show_state(job, 0, "⏳ Waiting")
+            self.start()
+
+    def retry_failed(self):
+
+        for job in self.jobs:
+            if job.state in (FAILED, STOPPED):
+                job.state = WAITING
+                self.show_state(job, 0, "⏳ Waiting")
+        self.start()
+
+    def stop(self):
+        """Stop the queued jobs; running ones stop at their next stage."""
+
+        for job in self.jobs:
+            if job.state == QUEUED and job.worker is not None:
+                job.worker.cancel()
+
+    def clear(self):
+
+        for row in reversed(range(len(self.jobs))):
+            if self.jobs[row].state != QUEUED:
+                del self.jobs[row]
+                self.table.removeRow(row)
+        self.update_summary()
+
+    def update_summary(self):
+
+        counts = {}
+        for job in self.jobs:
+            counts[job.state] = counts.get(job.state, 0) + 1
+        parts = [f"{counts[state]} {state}" for state in (QUEUED, WAITING, DONE, FAILED, STOPPED) if counts.get(state)]
+        self.summary_label.setText(" • ".join(parts) if parts else "No jobs yet")
+        self.start_btn.setEnabled(bool(counts.get(WAITING)))
+        self.retry_btn.setEnabled(bool(counts.get(FAILED) or counts.get(STOPPED)))
+        self.stop_btn.setEnabled(bool(counts.get(QUEUED)))
+        self.clear_btn.setEnabled(len(self.jobs) > counts.get(QUEUED, 0))
+
+    def shutdown(self):
+
+        self.stop()
+        self.thread_pool.waitForDone()
@@ -0,0 +1,279 @@
+"""
+Password-based key derivation for MessageEncryptor.
+
+Every KDF has a one-byte ID and a fixed binary parameter block, which are
+stored in the payload header next to the salt, so any payload can be
+decrypted with the exact cost settings it was created with.
+
+Costs are bounded (MAX_MEMORY, and each parameter's limits), since the
+parameters also come from the headers of images being decoded.
+
+Derived keys are kept in a small in-process LRU cache that expires
+entries after a few minutes. A batch that encrypts or decrypts many
+images with one password then runs the expensive KDF once per process.
+Passwords are never stored in the cache; entries are keyed by an HMAC
+of the password under a random per-process secret.
+
+Developed by: Zork
+"""
+import hashlib
+import hmac
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+
+SALT_SIZE = 16
+KEY_SIZE = 32
+# Parameters are read from untrusted payload headers too, so the cost
+# any one derivation may take is capped
+MAX_MEMORY = 1024 * 1024 * 1024
+
+
+class KeyDerivation:
+
+    kdf_id = None
+    name = None
+    salted = True
+    param_names = ()
+    param_format = ''
+    defaults = {}
+    limits = {}
+
+    def __init__(self, **params):
+        unknown = set(params) - set(self.param_names)
+        if unknown:
+            raise ValueError(f"Unknown {self.name} parameter(s): {', '.join(sorted(unknown))}")
+        self.params = {**self.defaults, **params}
+        for name, (low, high) in self.limits.items():
+            if not low <= self.params[name] <= high:
+                raise ValueError(f"{self.name} parameter {name} must be between {low} and {high}")
+
+    def derive(self, password: bytes, salt: bytes) -> bytes:
+
+        raise NotImplementedError
+
+    def pack_params(self) -> bytes:
+
+        return struct.pack('>' + self.param_format, *(self.params[name] for name in self.param_names))
+
+    @classmethod
+    def unpack_params(cls, data: bytes) -> 'KeyDerivation':
+
+        values = struct.unpack('>' + cls.param_format, data)
+        return cls(**dict(zip(cls.param_names, values)))
+
+    @property
+    def cache_key(self):
+
+        return (self.kdf_id, tuple(self.params[name] for name in self.param_names))
+
+    def __repr__(self):
+
+        params = ', '.join(f"{name}={self.params[name]}" for name in self.param_names)
+        return f"{self.name}({params})"
+
+
+class Sha256KDF(KeyDerivation):
+    """Single unsalted SHA-256, as used by the original token format."""
+
+    kdf_id = 0
+    name = 'sha256'
+    salted = False
+
+    def derive(self, password: bytes, salt: bytes) -> bytes:
+
+        return hashlib.sha256(password).digest()
+
+
+class Pbkdf2KDF(KeyDerivation):
+
+    kdf_id = 1
+    name = 'pbkdf2'
+    param_names = ('iterations',)
+    param_format = 'I'
+    defaults = {'iterations': 600_000}
+    limits = {'iterations': (1_000, 5_000_000)}
+
+    def derive(self, password: bytes, salt: bytes) -> bytes:
+
+        return hashlib.pbkdf2_hmac('sha256', password, salt, self.params['iterations'], KEY_SIZE)
+
+
+class ScryptKDF(KeyDerivation):
+
+    kdf_id = 2
+    name = 'scrypt'
+    param_names = ('log_n', 'r', 'p')
+    param_format = 'BBB'
+    defaults = {'log_n': 17, 'r': 8, 'p': 1}
+    limits = {'log_n': (10, 22), 'r': (1, 32), 'p': (1, 16)}
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        log_n, r = self.params['log_n'], self.params['r']
+        # OpenSSL requires N < 2^(16 * r)
+        if log_n >= 16 * r:
+            raise ValueError(f"scrypt parameter log_n must be below {16 * r} when r is {r}")
+        if self.memory > MAX_MEMORY:
+            raise ValueError(
+                f"scrypt with log_n={log_n} and r={r} needs {-(-self.memory >> 20)} MiB; "
+                f"the limit is {MAX_MEMORY >> 20} MiB"
+            )
+
+    @property
+    def memory(self) -> int:
+        """Bytes OpenSSL allocates for one derivation."""
+
+        r = self.params['r']
+        return 128 * r * ((1 << self.params['log_n']) + self.params['p'] + 2)
+
+    def derive(self, password: bytes, salt: bytes) -> bytes:
+
+        n = 1 << self.params['log_n']
+        r = self.params['r']
+        p = self.params['p']
+        return hashlib.scrypt(
+            password, salt=salt, n=n, r=r, p=p,
+            maxmem=min(256 * r * (n + p), MAX_MEMORY), dklen=KEY_SIZE
+        )
+
+
+class Argon2idKDF(KeyDerivation):
+
+    kdf_id = 3
+    name = 'argon2id'
+    param_names = ('iterations', 'memory_cost', 'lanes')
+    param_format = 'IIB'
+    defaults = {'iterations': 3, 'memory_cost': 65536, 'lanes': 4}
+    # memory_cost is in KiB
+    limits = {'iterations': (1, 10), 'memory_cost': (8192, MAX_MEMORY // 1024), 'lanes': (1, 64)}
+
+    def derive(self, password: bytes, salt: bytes) -> bytes:
+
+        try:
+            from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+        except ImportError:
+            Argon2id = None
+
+        if Argon2id is not None:
+            return Argon2id(
+                salt=salt, length=KEY_SIZE, iterations=self.params['iterations'],
+                lanes=self.params['lanes'], memory_cost=self.params['memory_cost']
+            ).derive(password)
+
+        try:
+            from argon2.low_level import Type, hash_secret_raw
+        except ImportError:
+            raise ValueError("Argon2id needs cryptography>=44 or the argon2-cffi package")
+        return hash_secret_raw(
+            password, salt, time_cost=self.params['iterations'],
+            memory_cost=self.params['memory_cost'], parallelism=self.params['lanes'],
+            hash_len=KEY_SIZE, type=Type.ID
+        )
+
+
+KDF_REGISTRY = {}
+
+
+def register_kdf(kdf_class):
+
+    KDF_REGISTRY[kdf_class.kdf_id] = kdf_class
+    return kdf_class
+
+
+for _kdf_class in (Sha256KDF, Pbkdf2KDF, ScryptKDF, Argon2idKDF):
+    register_kdf(_kdf_class)
+
+
+def get_kdf(spec) -> KeyDerivation:
+    """Build a KDF from an instance, a name, or 'name:param=value,...'."""
+
+    if isinstance(spec, KeyDerivation):
+        return spec
+
+    name, _, param_text = spec.partition(':')
+    for kdf_class in KDF_REGISTRY.values():
+        if kdf_class.name == name.strip().lower():
+            break
+    else:
+        names = ', '.join(kdf_class.name for kdf_class in KDF_REGISTRY.values())
+        raise ValueError(f"Unknown KDF '{name}'. Available: {names}")
+
+    params = {}
+    for item in filter(None, (part.strip() for part in param_text.split(','))):
+        key, _, value = item.partition('=')
+        params[key.strip()] = int(value)
+    return kdf_class(**params)
+
+
+class DerivedKeyCache:
+
+    def __init__(self, maxsize: int = 32, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._secret = os.urandom(32)
+
+    def _password_id(self, password: bytes) -> bytes:
+
+        return hmac.new(self._secret, password, hashlib.sha256).digest()
+
+    def _get(self, key):
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _put(self, key, value):
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def derive(self, kdf: KeyDerivation, password: bytes, salt: bytes) -> bytes:
+
+        key = ('key', self._password_id(password), salt, kdf.cache_key)
+        derived = self._get(key)
+        if derived is None:
+            derived = kdf.derive(password, salt)
+            self._put(key, derived)
+        return derived
+
+    def salt_for(self, kdf: KeyDerivation, password: bytes) -> bytes:
+        """Salt for a new payload, reused while the cached key is alive.
+
+        Reusing the salt within the TTL is what lets a batch encrypt many
+        images with one derivation, so those payloads share one key. That
+        is only safe because every payload draws a fresh random 7-byte
+        AEAD nonce prefix (see encryptor.py); it must never be derived
+        from anything a repeated encryption would repeat.
+        """
+        if not kdf.salted:
+            return b''
+        key = ('salt', self._password_id(password), kdf.cache_key)
+        salt = self._get(key)
+        if salt is None:
+            salt = os.urandom(SALT_SIZE)
+            self._put(key, salt)
+        return salt
+
+    def clear(self):
+
+        with self._lock:
+            self._entries.clear()
+
+
+key_cache = DerivedKeyCache()
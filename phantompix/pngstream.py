@@ -0,0 +1,438 @@
+"""
+Strip-by-strip PNG reading and writing with bounded memory.
+
+PngStripReader inflates the IDAT stream incrementally and hands each
+strip of filtered scanlines to Pillow's own decoder, wrapped in a tiny
+in-memory PNG whose first row is the previous strip's last raw row, so
+the C code does the unfiltering. PngStripWriter filters strips with
+NumPy and deflates them into IDAT chunks as they arrive.
+
+Peak memory is proportional to the strip, never to the whole image.
+Both accept a path or an already open binary file object; files passed
+in are left open for the caller. An output path is written as a
+temporary file next to it, which replaces the path only once the PNG is
+complete: a failed write leaves whatever was there untouched, even when
+it is the file being read.
+
+PngOptions selects the zlib level, the scanline filter and whether to
+spend extra effort on size; write_png applies them to a whole image.
+PNG_PRESETS holds 'default', 'fast' (batch throughput) and 'small'
+(distribution). benchmarks/bench_png.py shows the time/size tradeoff.
+
+Developed by: Zork
+"""
+import io
+import os
+import secrets
+import struct
+import zlib
+from contextlib import contextmanager
+from typing import NamedTuple
+
+import numpy as np
+from PIL import Image
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# PNG colour type -> samples per pixel (8 bit depth only)
+COLOR_TYPE_SAMPLES = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+MODE_COLOR_TYPE = {'RGB': 2, 'RGBA': 6}
+
+IDAT_CHUNK_SIZE = 1 << 20
+FILTER_ROWS = 32
+
+# PNG filter type per scanline; 'adaptive' picks one per row
+PNG_FILTERS = {'none': 0, 'sub': 1, 'up': 2, 'average': 3, 'paeth': 4, 'adaptive': None}
+
+
+class UnsupportedPngError(ValueError):
+    pass
+
+
+class PngOptions(NamedTuple):
+    compress_level: int = 6
+    filter: str = 'adaptive'
+    optimize: bool = False
+
+
+PNG_PRESETS = {
+    'default': PngOptions(),
+    # Sub is the cheapest filter that still helps deflate on photos
+    'fast': PngOptions(compress_level=1, filter='sub'),
+    'small': PngOptions(compress_level=9, filter='adaptive', optimize=True),
+}
+
+
+def get_png_options(spec=None) -> PngOptions:
+    """Build options from an instance, a preset name, or 'preset:key=value,...'.
+
+    Keys are ``level`` (0-9), ``filter`` (one of PNG_FILTERS) and
+    ``optimize`` (0 or 1), e.g. ``fast:level=3`` or ``default:filter=up``.
+    """
+    if spec is None:
+        return PNG_PRESETS['default']
+    if isinstance(spec, PngOptions):
+        options = spec
+    else:
+        name, _, param_text = spec.partition(':')
+        options = PNG_PRESETS.get(name.strip().lower() or 'default')
+        if options is None:
+            raise ValueError(f"Unknown PNG preset '{name}'. Available: {', '.join(PNG_PRESETS)}")
+        for item in filter(None, (part.strip() for part in param_text.split(','))):
+            key, _, value = item.partition('=')
+            key = key.strip().lower()
+            if key == 'level':
+                options = options._replace(compress_level=int(value))
+            elif key == 'filter':
+                options = options._replace(filter=value.strip().lower())
+            elif key == 'optimize':
+                options = options._replace(optimize=bool(int(value)))
+            else:
+                raise ValueError(f"Unknown PNG option '{key}'. Use level, filter or optimize")
+
+    if not 0 <= options.compress_level <= 9:
+        raise ValueError("PNG compression level must be between 0 and 9")
+    if options.filter not in PNG_FILTERS:
+        raise ValueError(f"Unknown PNG filter '{options.filter}'. Available: {', '.join(PNG_FILTERS)}")
+    return options
+
+
+def write_png(pixels, output, options: PngOptions = None):
+    """Write an RGB or RGBA array or PIL Image as a PNG to a path or binary file."""
+
+    options = get_png_options(options)
+    if options.filter == 'adaptive':
+        # Pillow's encoder filters adaptively in C, faster than NumPy can
+        image = pixels if isinstance(pixels, Image.Image) else Image.fromarray(pixels)
+        if hasattr(output, 'write'):
+            image.save(output, 'PNG', compress_level=options.compress_level, optimize=options.optimize)
+        else:
+            with _replacing(output) as file:
+                image.save(file, 'PNG', compress_level=options.compress_level, optimize=options.optimize)
+        return
+    if isinstance(pixels, Image.Image):
+        pixels = np.asarray(pixels)
+    write_png_rows([pixels], output, options)
+
+
+def write_png_rows(blocks, output, options: PngOptions = None):
+    """Write consecutive row blocks of one image as a single PNG.
+
+    The blocks are not joined first, except for the adaptive filter,
+    whose Pillow encoder needs the whole image in one array.
+    """
+    options = get_png_options(options)
+    if options.filter == 'adaptive':
+        write_png(blocks[0] if len(blocks) == 1 else np.concatenate(blocks), output, options)
+        return
+    height = sum(block.shape[0] for block in blocks)
+    width = blocks[0].shape[1]
+    mode = 'RGBA' if blocks[0].shape[2] == 4 else 'RGB'
+    writer = PngStripWriter(output, width, height, mode, options=options)
+    try:
+        for block in blocks:
+            writer.write(block)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+
+
+def _open_temp(path):
+    """A new, empty file in the directory of ``path``, to be moved over it."""
+
+    directory, name = os.path.split(os.path.abspath(path))
+    return open(os.path.join(directory, f'.{name}.{secrets.token_hex(4)}.tmp'), 'xb')
+
+
+@contextmanager
+def _replacing(path):
+    """Yield a temporary file that replaces ``path`` if the block succeeds."""
+
+    file = _open_temp(path)
+    try:
+        with file:
+            yield file
+    except BaseException:
+        os.remove(file.name)
+        raise
+    os.replace(file.name, path)
+
+
+def _chunk(chunk_type: bytes, data: bytes) -> bytes:
+
+    return (
+        struct.pack('>I', len(data)) + chunk_type + data
+        + struct.pack('>I', zlib.crc32(chunk_type + data) & 0xFFFFFFFF)
+    )
+
+
+class PngStripReader:
+
+    def __init__(self, path, strip_rows: int = 256):
+        self.strip_rows = max(1, int(strip_rows))
+        self._owns_file = not hasattr(path, 'read')
+        self._file = open(path, 'rb') if self._owns_file else path
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_chunk(self):
+
+        head = self._file.read(8)
+        if len(head) < 8:
+            raise UnsupportedPngError("Truncated PNG file")
+        length, chunk_type = struct.unpack('>I4s', head)
+        data = self._file.read(length)
+        self._file.read(4)  # CRC, verified by Pillow on the strip PNGs
+        return chunk_type, data
+
+    def _read_header(self):
+
+        if self._file.read(8) != PNG_SIGNATURE:
+            raise UnsupportedPngError("Not a PNG file")
+
+        chunk_type, ihdr = self._read_chunk()
+        if chunk_type != b'IHDR':
+            raise UnsupportedPngError("PNG is missing its IHDR chunk")
+        (self.width, self.height, bit_depth, self.color_type,
+         _, _, interlace) = struct.unpack('>IIBBBBB', ihdr)
+
+        if bit_depth != 8 or interlace != 0 or self.color_type not in COLOR_TYPE_SAMPLES:
+            raise UnsupportedPngError("Only non-interlaced 8-bit PNGs can be streamed")
+
+        self.row_bytes = self.width * COLOR_TYPE_SAMPLES[self.color_type]
+        self._extra_chunks = b''
+        while True:
+            chunk_type, data = self._read_chunk()
+            if chunk_type == b'IDAT':
+                self._pending = data
+                break
+            if chunk_type in (b'PLTE', b'tRNS'):
+                self._extra_chunks += _chunk(chunk_type, data)
+            elif chunk_type == b'IEND':
+                raise UnsupportedPngError("PNG has no image data")
+
+        self._inflater = zlib.decompressobj()
+        self._buffer = bytearray()
+        self._seed_row = None
+
+    def _next_idat(self):
+
+        if self._pending is not None:
+            data, self._pending = self._pending, None
+            return data
+        while True:
+            chunk_type, data = self._read_chunk()
+            if chunk_type == b'IDAT':
+                return data
+            if chunk_type == b'IEND':
+                return None
+
+    def _read_filtered(self, size: int) -> bytes:
+
+        while len(self._buffer) < size:
+            compressed = self._inflater.unconsumed_tail
+            if not compressed:
+                compressed = self._next_idat()
+                if compressed is None:
+                    raise UnsupportedPngError("PNG image data is truncated")
+            self._buffer += self._inflater.decompress(compressed, size - len(self._buffer))
+
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def _decode_strip(self, filtered: bytes, rows: int) -> Image.Image:
+
+        seeded = self._seed_row is not None
+        if seeded:
+            filtered = b'\x00' + self._seed_row + filtered
+            rows += 1
+
+        ihdr = struct.pack('>IIBBBBB', self.width, rows, 8, self.color_type, 0, 0, 0)
+        png = (
+            PNG_SIGNATURE + _chunk(b'IHDR', ihdr) + self._extra_chunks
+            + _chunk(b'IDAT', zlib.compress(filtered, 0)) + _chunk(b'IEND', b'')
+        )
+        image = Image.open(io.BytesIO(png))
+        image.load()
+
+        self._seed_row = np.asarray(image)[-1].tobytes()
+        return image.crop((0, 1, self.width, rows)) if seeded else image
+
+    def __iter__(self):
+
+        row = 0
+        while row < self.height:
+            rows = min(self.strip_rows, self.height - row)
+            filtered = self._read_filtered(rows * (self.row_bytes + 1))
+            yield row, self._decode_strip(filtered, rows)
+            row += rows
+
+    def close(self):
+
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PngStripWriter:
+
+    def __init__(self, path, width: int, height: int, mode: str, options: PngOptions = None):
+        if mode not in MODE_COLOR_TYPE:
+            raise ValueError(f"Unsupported output mode: {mode}")
+        options = get_png_options(options)
+        self.width = width
+        self.height = height
+        self.channels = len(mode)
+        self.filter_type = PNG_FILTERS[options.filter]
+        self._rows_written = 0
+        self._previous_row = np.zeros(width * self.channels, dtype=np.int16)
+        # optimize: the most thorough match search zlib has
+        self._compressor = zlib.compressobj(
+            9 if options.optimize else options.compress_level, zlib.DEFLATED, zlib.MAX_WBITS,
+            9 if options.optimize else 8
+        )
+        self._pending = bytearray()
+
+        self._owns_file = not hasattr(path, 'write')
+        self._path = path
+        self._file = _open_temp(path) if self._owns_file else path
+        self._closed = False
+        ihdr = struct.pack('>IIBBBBB', width, height, 8, MODE_COLOR_TYPE[mode], 0, 0, 0)
+        try:
+            self._file.write(PNG_SIGNATURE + _chunk(b'IHDR', ihdr))
+        except BaseException:
+            self.abort()
+            raise
+
+    @staticmethod
+    def _paeth_predictor(left: np.ndarray, up: np.ndarray, up_left: np.ndarray) -> np.ndarray:
+
+        estimate = left + up - up_left
+        dist_left = np.abs(estimate - left)
+        dist_up = np.abs(estimate - up)
+        dist_up_left = np.abs(estimate - up_left)
+        return np.where(
+            (dist_left <= dist_up) & (dist_left <= dist_up_left),
+            left,
+            np.where(dist_up <= dist_up_left, up, up_left),
+        )
+
+    def _filter(self, pixels: np.ndarray) -> np.ndarray:
+
+        rows = pixels.shape[0]
+        bpp = self.channels
+        x = pixels.reshape(rows, -1).astype(np.int16)
+
+        up = np.empty_like(x)
+        up[0] = self._previous_row
+        up[1:] = x[:-1]
+        left = np.zeros_like(x)
+        left[:, bpp:] = x[:, :-bpp]
+        self._previous_row = x[-1].copy()
+
+        def residual(filter_type):
+            if filter_type == 0:
+                return x
+            if filter_type == 1:
+                return x - left
+            if filter_type == 2:
+                return x - up
+            if filter_type == 3:
+                return x - (left + up) // 2
+            up_left = np.zeros_like(x)
+            up_left[:, bpp:] = up[:, :-bpp]
+            return x - self._paeth_predictor(left, up, up_left)
+
+        filtered = np.empty((rows, x.shape[1] + 1), dtype=np.uint8)
+        if self.filter_type is not None:
+            filtered[:, 0] = self.filter_type
+            filtered[:, 1:] = residual(self.filter_type) & 0xFF
+            return filtered
+
+        # The usual heuristic: per row, the filter whose output has the
+        # smallest sum of absolute values as signed bytes.
+        best = None
+        for filter_type in range(5):
+            candidate = (residual(filter_type) & 0xFF).astype(np.uint8)
+            cost = np.abs(candidate.view(np.int8).astype(np.int32)).sum(axis=1)
+            if best is None:
+                best, best_cost = np.zeros(rows, dtype=np.uint8), cost
+                filtered[:, 1:] = candidate
+                continue
+            better = cost < best_cost
+            best[better] = filter_type
+            best_cost = np.where(better, cost, best_cost)
+            filtered[better, 1:] = candidate[better]
+        filtered[:, 0] = best
+        return filtered
+
+    def _flush_idat(self, final: bool = False):
+
+        while len(self._pending) >= IDAT_CHUNK_SIZE or (final and self._pending):
+            data = bytes(self._pending[:IDAT_CHUNK_SIZE])
+            del self._pending[:IDAT_CHUNK_SIZE]
+            self._file.write(_chunk(b'IDAT', data))
+
+    def write(self, pixels: np.ndarray):
+
+        rows = pixels.shape[0]
+        if self._rows_written + rows > self.height:
+            raise ValueError("More rows written than the declared image height")
+        # Filter a few rows at a time; the int16 temporaries are several
+        # times larger than the strip itself.
+        for start in range(0, rows, FILTER_ROWS):
+            filtered = self._filter(pixels[start:start + FILTER_ROWS])
+            self._pending += self._compressor.compress(filtered.tobytes())
+        self._rows_written += rows
+        self._flush_idat()
+
+    def abort(self):
+
+        if self._closed:
+            return
+        self._closed = True
+        # A partial PNG in a caller's file object is theirs to discard;
+        # our own never replaced the output path, so only it goes
+        if self._owns_file:
+            self._file.close()
+            os.remove(self._file.name)
+
+    def close(self):
+
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self._rows_written != self.height:
+                raise ValueError(
+                    f"PNG expects {self.height} rows, only {self._rows_written} were written"
+                )
+            self._pending += self._compressor.flush()
+            self._flush_idat(final=True)
+            self._file.write(_chunk(b'IEND', b''))
+            if self._owns_file:
+                self._file.close()
+        except BaseException:
+            if self._owns_file:
+                self._file.close()
+                os.remove(self._file.name)
+            raise
+        if self._owns_file:
+            os.replace(self._file.name, self._path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,210 @@
+"""
+Corpus scanner: find which images in a directory tree carry a payload.
+
+    with ScanIndex('scan.db') as index:
+        for record in scan(['photos/'], index):
+            if record['has_payload']:
+                print(record['path'], record['data_length'])
+
+Directories are walked with os.scandir, reusing the size and mtime the
+directory listing already returned. Each image is checked on a process
+pool with ImageSteganography.probe. For 8-bit non-interlaced PNGs it
+decodes only the rows holding the header. Every other format (BMP, TIFF,
+WebP, interlaced or 16-bit PNG) is decoded whole, so it costs as much as
+a decode; such records have ``full_decode`` set. JPEG files are never
+decoded: lossy compression destroys LSB payloads, so they cannot carry
+one.
+
+ScanIndex keeps one row per file in SQLite (path, size, mtime, has
+payload, declared length, format version, whether it was fully decoded). Files whose size and mtime
+are unchanged are answered from the index. Results are committed every
+batch, so an interrupted scan resumes where it stopped.
+
+Developed by: Zork
+"""
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from .steganography import ImageSteganography
+
+
+IMAGE_EXTENSIONS = ('.png', '.bmp', '.tif', '.tiff', '.webp', '.jpg', '.jpeg')
+# Formats whose compression cannot preserve LSB payloads
+LOSSY_FORMATS = ('JPEG', 'MPO')
+BATCH_SIZE = 512
+
+COLUMNS = ('path', 'size', 'mtime_ns', 'has_payload', 'data_length', 'version', 'error', 'full_decode')
+
+
+class ScanIndex:
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                has_payload INTEGER NOT NULL,
+                data_length INTEGER,
+                version INTEGER,
+                error TEXT,
+                scanned_at REAL NOT NULL,
+                full_decode INTEGER
+            )
+        """)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(files)")}
+        if 'full_decode' not in columns:
+            # Indexes written before the column existed; their rows read as unknown
+            self._db.execute("ALTER TABLE files ADD COLUMN full_decode INTEGER")
+        self._db.commit()
+
+    def known(self) -> dict:
+        """Every indexed file: path -> record."""
+
+        cursor = self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM files")
+        return {row[0]: _record(row) for row in cursor}
+
+    def store(self, records):
+
+        now = time.time()
+        self._db.executemany(
+            f"INSERT OR REPLACE INTO files ({', '.join(COLUMNS)}, scanned_at) "
+            f"VALUES ({', '.join('?' * len(COLUMNS))}, ?)",
+            [tuple(record[column] for column in COLUMNS) + (now,) for record in records]
+        )
+        self._db.commit()
+
+    def forget(self, paths):
+
+        self._db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths])
+        self._db.commit()
+
+    def payloads(self) -> list:
+
+        cursor = self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM files WHERE has_payload ORDER BY path")
+        return [_record(row) for row in cursor]
+
+    def close(self):
+
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _record(row) -> dict:
+
+    record = dict(zip(COLUMNS, row))
+    record['has_payload'] = bool(record['has_payload'])
+    if record['full_decode'] is not None:
+        record['full_decode'] = bool(record['full_decode'])
+    return record
+
+
+def walk_images(root: str, extensions=IMAGE_EXTENSIONS):
+    """Yield an os.DirEntry for every image file under ``root``."""
+
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and entry.name.lower().endswith(extensions):
+                        yield entry
+                except OSError:
+                    continue
+
+
+def check_file(path: str, size: int, mtime_ns: int) -> dict:
+
+    record = {
+        'path': path, 'size': size, 'mtime_ns': mtime_ns, 'has_payload': False,
+        'data_length': None, 'version': None, 'error': None, 'full_decode': False,
+    }
+    try:
+        with Image.open(path) as image:
+            lossy = image.format in LOSSY_FORMATS
+        if not lossy:
+            result = ImageSteganography.probe(path)
+            record.update(has_payload=result.has_payload, data_length=result.data_length,
+                          version=result.version, full_decode=result.full_decode)
+    except Exception as e:
+        record['error'] = str(e) or type(e).__name__
+    return record
+
+
+def _check_entry(job) -> dict:
+
+    return check_file(*job)
+
+
+def _batches(items, size: int):
+
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def scan(roots, index: ScanIndex = None, workers: int = None, rescan: bool = False,
+         extensions=IMAGE_EXTENSIONS, batch_size: int = BATCH_SIZE):
+    """Yield a record for every image under ``roots``.
+
+    Records hold the index columns plus ``cached``, true when the answer
+    came from ``index`` because the file is unchanged. With ``rescan``
+    every file is checked again. Indexed files that have disappeared
+    from the scanned trees are dropped from the index at the end.
+    """
+    if isinstance(roots, (str, os.PathLike)):
+        roots = [roots]
+    roots = [os.path.abspath(root) for root in roots]
+    index = index or ScanIndex()
+    known = index.known()
+    seen = set()
+
+    def pending():
+        for root in roots:
+            for entry in walk_images(root, extensions):
+                if entry.path in seen:
+                    continue
+                seen.add(entry.path)
+                stat = entry.stat()
+                record = known.get(entry.path)
+                if (not rescan and record is not None and record['size'] == stat.st_size
+                        and record['mtime_ns'] == stat.st_mtime_ns):
+                    yield dict(record, cached=True)
+                else:
+                    yield (entry.path, stat.st_size, stat.st_mtime_ns)
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for batch in _batches(pending(), batch_size):
+            cached = [item for item in batch if isinstance(item, dict)]
+            jobs = [item for item in batch if not isinstance(item, dict)]
+            yield from cached
+            if jobs:
+                records = list(executor.map(_check_entry, jobs, chunksize=max(1, len(jobs) // 32)))
+                index.store(records)
+                for record in records:
+                    yield dict(record, cached=False)
+
+    prefixes = tuple(os.path.join(root, '') for root in roots)
+    index.forget([path for path in known if path.startswith(prefixes) and path not in seen])
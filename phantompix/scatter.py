@@ -0,0 +1,98 @@
+"""
+Keyed pixel scattering.
+
+By default the header and payload fill the cover from the top left,
+so every changed pixel sits in the first rows. With a scatter key the
+same frame is written to pixels chosen by a keyed permutation of all
+pixel indices instead: the frame's n-th pixel goes to pixel
+``permutation(n)``. Without the key the frame cannot be located, and
+the changes are spread evenly over the whole image.
+
+The permutation is a Feistel network over the smallest even power of
+two that covers the pixel count, with cycle walking to stay inside it.
+Any index is mapped on its own, so the positions of the first n frame
+pixels are computed in NumPy batches with O(n) memory; no list of all
+pixel indices is ever built or shuffled.
+
+The key is derived from the password with scrypt and a fixed salt (the
+payload's own salt is inside the scattered frame, so it cannot be used).
+Guessing passwords against the scattered header therefore costs as much
+as guessing them against the encrypted payload.
+
+Developed by: Zork
+"""
+import hashlib
+
+import numpy as np
+
+from .kdf import ScryptKDF, key_cache
+
+
+SCATTER_SALT = b'PhantomPix scatter v1'
+ROUNDS = 6
+BATCH_SIZE = 1 << 20
+
+
+def scatter_key(password: str) -> bytes:
+    """The scatter key for ``password``, cached like any derived key."""
+
+    return key_cache.derive(ScryptKDF(), password.encode('utf-8'), SCATTER_SALT)
+
+
+def _mix(values: np.ndarray, round_key: np.uint64) -> np.ndarray:
+    """SplitMix64 finaliser of ``values ^ round_key`` (uint64, wrapping)."""
+
+    # In place on one temporary; these arrays are up to BATCH_SIZE long
+    z = values ^ round_key
+    z ^= z >> np.uint64(30)
+    z *= np.uint64(0xBF58476D1CE4E5B9)
+    z ^= z >> np.uint64(27)
+    z *= np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return z
+
+
+class KeyedPermutation:
+
+    def __init__(self, key: bytes, size: int):
+        if size < 1:
+            raise ValueError("Cannot scatter into an empty image")
+        self.size = size
+        half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self._half_bits = np.uint64(half_bits)
+        self._half_mask = np.uint64((1 << half_bits) - 1)
+        digest = hashlib.blake2b(key, digest_size=8 * ROUNDS, person=b'PPX scatter').digest()
+        self._round_keys = np.frombuffer(digest, dtype='>u8').astype(np.uint64)
+
+    def _feistel(self, values: np.ndarray) -> np.ndarray:
+
+        left = values >> self._half_bits
+        right = values & self._half_mask
+        for round_key in self._round_keys:
+            mixed = _mix(right, round_key)
+            mixed &= self._half_mask
+            mixed ^= left
+            left, right = right, mixed
+        return (left << self._half_bits) | right
+
+    def __call__(self, indices: np.ndarray) -> np.ndarray:
+        """Map indices below ``size`` to distinct indices below ``size``."""
+
+        result = self._feistel(np.asarray(indices, dtype=np.uint64))
+        # The Feistel domain is at most 4x the size, so few values walk twice
+        outside = np.flatnonzero(result >= self.size)
+        while outside.size:
+            result[outside] = self._feistel(result[outside])
+            outside = outside[result[outside] >= self.size]
+        return result.astype(np.int64)
+
+    def positions(self, count: int, start: int = 0) -> np.ndarray:
+        """Pixel indices of frame pixels ``start`` to ``start + count``."""
+
+        if start + count > self.size:
+            raise ValueError("Image too small for the scattered payload")
+        result = np.empty(count, dtype=np.int64)
+        for offset in range(0, count, BATCH_SIZE):
+            end = min(offset + BATCH_SIZE, count)
+            result[offset:end] = self(np.arange(start + offset, start + end, dtype=np.uint64))
+        return result
@@ -0,0 +1,498 @@
+"""
+PhantomPix - Local HTTP embedding service (asyncio, standard library only).
+
+    python -m phantompix serve --port 8765 -j 4
+    curl -H "X-PhantomPix-Password: pw" -F cover=@cover.png -F message=@note.txt \\
+         "http://127.0.0.1:8765/encode?png=fast" -o encoded.png
+    curl -H "X-PhantomPix-Password: pw" --data-binary @encoded.png http://127.0.0.1:8765/decode
+    curl --data-binary @photo.png http://127.0.0.1:8765/probe
+    curl --data-binary @photo.png "http://127.0.0.1:8765/capacity?bits=2&alpha=1"
+
+Endpoints (POST, except GET /health):
+
+    /encode    multipart/form-data with a ``cover`` image and a ``message``
+               (text or file); returns the encoded PNG. Query: bits, alpha,
+               png, kdf, compress (as in the CLI).
+    /decode    the encoded image as the body; returns the message bytes.
+    /probe     the image as the body; returns the probe result as JSON.
+    /capacity  the image as the body; returns {"capacity": n}. Query: bits, alpha.
+    /health    worker count and admitted requests as JSON.
+
+The password travels in the X-PhantomPix-Password header. Errors are
+JSON objects with an "error" key: 400 for a malformed request, 408 for a
+client that stalls, 413 for a body over ``max_body``, 422 when the image
+or password is rejected, 429 when busy and 504 when a job runs longer
+than ``timeout``.
+
+Request bodies (Content-Length or chunked) are streamed to temporary
+files and responses are streamed back from files, so the server process
+never holds a whole image. Encryption, embedding and PNG work runs on a
+process pool whose workers keep an encoder session cache (sessions.py),
+so a cover uploaded again is not decoded again. At most ``workers +
+queue_size`` requests are admitted at once; the others get 429 with
+Retry-After before their body is read. A job that times out keeps its
+slot until its worker is done with it, so timeouts cannot oversubscribe
+the pool.
+
+The service binds to 127.0.0.1 and speaks HTTP/1.1 without keep-alive:
+it sits behind the caller's own upload pipeline, not on the network.
+
+Developed by: Zork
+"""
+import asyncio
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import UnidentifiedImageError
+
+from .compressors import get_codec
+from .encryptor import MessageEncryptor
+from .kdf import get_kdf
+from .pngstream import get_png_options
+from .sessions import SessionCache
+from .steganography import ImageSteganography
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+PASSWORD_HEADER = 'x-phantompix-password'
+READ_SIZE = 256 * 1024
+MAX_HEADER_SIZE = 64 * 1024
+MAX_BODY = 512 * 1024 * 1024
+# Per worker process
+SESSION_CACHE_BYTES = 128 * 1024 * 1024
+
+_sessions = None
+
+
+def _init_worker(session_bytes: int):
+
+    global _sessions
+    _sessions = SessionCache(session_bytes)
+
+
+def _encode_job(cover_path, message_path, password, output_path, bits_per_channel, channels,
+                png, kdf, compress):
+
+    with open(message_path, 'rb') as source:
+        encrypted_data = b''.join(MessageEncryptor.encrypt_stream(source, password, compress=compress, kdf=kdf))
+    with open(cover_path, 'rb') as f:
+        cover = f.read()
+    _sessions.get(cover).embed(encrypted_data, output_path, png, bits_per_channel, channels)
+    return {'bytes': len(encrypted_data)}
+
+
+def _decode_job(image_path, password, output_path):
+
+    chunks = MessageEncryptor.decrypt_stream(ImageSteganography.iter_payload(image_path), password)
+    written = 0
+    with open(output_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+            written += len(chunk)
+    return {'bytes': written}
+
+
+def _probe_job(image_path):
+
+    return ImageSteganography.probe(image_path)._asdict()
+
+
+def _capacity_job(image_path, bits_per_channel, channels):
+
+    return {'capacity': ImageSteganography.capacity(image_path, bits_per_channel, channels)}
+
+
+class HttpError(Exception):
+
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def _write_head(writer, status: int, headers: dict):
+
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    lines += ['Connection: close', '', '']
+    writer.write('\r\n'.join(lines).encode('latin-1'))
+
+
+async def _send_json(writer, status: int, payload, headers: dict = None):
+
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    _write_head(writer, status, {'Content-Type': 'application/json', 'Content-Length': len(body),
+                                 **(headers or {})})
+    writer.write(body)
+    await writer.drain()
+
+
+async def _send_file(writer, path: str, content_type: str, headers: dict = None):
+
+    _write_head(writer, 200, {'Content-Type': content_type, 'Content-Length': os.path.getsize(path),
+                              **(headers or {})})
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+            # Waits while the client is slower than the disk
+            await writer.drain()
+
+
+async def _save_body(body, path: str) -> str:
+
+    with open(path, 'wb') as f:
+        async for chunk in body:
+            f.write(chunk)
+    return path
+
+
+def _boundary(headers: dict) -> bytes:
+
+    content_type = headers.get('content-type', '')
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not content_type.startswith('multipart/form-data') or match is None:
+        raise HttpError(400, "Expected a multipart/form-data body")
+    return match.group(1).encode('latin-1')
+
+
+async def _save_multipart(body, boundary: bytes, directory: str) -> dict:
+    """Stream every part of a multipart/form-data body to its own file: name -> path."""
+
+    delimiter = b'\r\n--' + boundary
+    # The leading CRLF lets the first boundary match the same delimiter
+    buffer = bytearray(b'\r\n')
+    body = aiter(body)
+
+    async def fill():
+        chunk = await anext(body, None)
+        if chunk is None:
+            raise HttpError(400, "Malformed multipart body")
+        buffer.extend(chunk)
+
+    async def copy_until(marker: bytes, target=None, limit: int = None):
+        written = 0
+        while True:
+            index = buffer.find(marker)
+            end = index if index >= 0 else max(len(buffer) - len(marker) + 1, 0)
+            written += end
+            if limit is not None and written > limit:
+                raise HttpError(400, "Multipart headers too large")
+            if target is not None:
+                target.write(buffer[:end])
+            del buffer[:end]
+            if index >= 0:
+                del buffer[:len(marker)]
+                return
+            await fill()
+
+    parts = {}
+    await copy_until(delimiter)
+    while True:
+        while len(buffer) < 2:
+            await fill()
+        if buffer[:2] == b'--':
+            break
+        head = io.BytesIO()
+        await copy_until(b'\r\n\r\n', head, limit=16 * 1024)
+        # Anchored, so the name="..." inside filename="..." is not taken for it
+        match = re.search(rb'(?:^|;)\s*name="([^"]*)"', head.getvalue())
+        if match is None:
+            raise HttpError(400, "Multipart part without a name")
+        path = os.path.join(directory, f"part{len(parts)}")
+        with open(path, 'wb') as f:
+            await copy_until(delimiter, f)
+        parts[match.group(1).decode('utf-8', 'replace')] = path
+
+    async for _ in body:
+        pass
+    return parts
+
+
+def _layout_params(query: dict):
+
+    try:
+        bits_per_channel = int(query.get('bits', '1'))
+    except ValueError:
+        raise HttpError(400, "bits must be a number")
+    channels = 4 if query.get('alpha', '').lower() in ('1', 'true', 'yes') else 3
+    try:
+        ImageSteganography._layout(bits_per_channel, channels)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    return bits_per_channel, channels
+
+
+def _password(headers: dict) -> str:
+
+    password = headers.get(PASSWORD_HEADER)
+    if not password:
+        raise HttpError(400, "A password is required (X-PhantomPix-Password header)")
+    return password
+
+
+class EmbeddingService:
+
+    ROUTES = {
+        '/encode': '_encode',
+        '/decode': '_decode',
+        '/probe': '_probe',
+        '/capacity': '_capacity',
+    }
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = None,
+                 queue_size: int = None, timeout: float = 60.0, io_timeout: float = 30.0,
+                 max_body: int = MAX_BODY, session_bytes: int = SESSION_CACHE_BYTES):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = self.workers * 2 if queue_size is None else queue_size
+        self.timeout = timeout
+        self.io_timeout = io_timeout
+        self.max_body = max_body
+        self.session_bytes = session_bytes
+        self._active = 0
+        self._executor = None
+        self._server = None
+
+    @property
+    def max_active(self) -> int:
+        return self.workers + self.queue_size
+
+    async def start(self):
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(self.session_bytes,)
+        )
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_HEADER_SIZE)
+        # Port 0 asks the OS for a free port
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+
+        await self._server.serve_forever()
+
+    async def close(self):
+
+        self._server.close()
+        await self._server.wait_closed()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle(self, reader, writer):
+
+        try:
+            try:
+                request = await self._read_head(reader)
+                if request is not None:
+                    await self._dispatch(*request, reader, writer)
+            except HttpError as e:
+                await _send_json(writer, e.status, {'error': str(e)}, e.headers)
+            except BrokenProcessPool:
+                await _send_json(writer, 500, {'error': "A worker process died"})
+            except Exception as e:
+                await _send_json(writer, 500, {'error': str(e) or type(e).__name__})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read(self, awaitable):
+
+        try:
+            return await asyncio.wait_for(awaitable, self.io_timeout)
+        except asyncio.TimeoutError:
+            raise HttpError(408, "Timed out reading the request")
+        except asyncio.IncompleteReadError:
+            raise HttpError(400, "Request ended early")
+        except asyncio.LimitOverrunError:
+            raise HttpError(400, "Request line or headers too large")
+
+    async def _read_head(self, reader):
+
+        try:
+            head = await self._read(reader.readuntil(b'\r\n\r\n'))
+        except HttpError as e:
+            if e.status == 400 and reader.at_eof():
+                # The client connected and left without a request
+                return None
+            raise
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+        return method, target, headers
+
+    async def _body(self, reader, headers: dict):
+        """Yield the request body in pieces, from Content-Length or chunked encoding."""
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            total = 0
+            while True:
+                line = await self._read(reader.readuntil(b'\r\n'))
+                try:
+                    size = int(line.split(b';')[0], 16)
+                except ValueError:
+                    raise HttpError(400, "Malformed chunked body")
+                if size == 0:
+                    while await self._read(reader.readuntil(b'\r\n')) != b'\r\n':
+                        pass
+                    return
+                total += size
+                if total > self.max_body:
+                    raise HttpError(413, f"Body larger than {self.max_body} bytes")
+                while size:
+                    data = await self._read(reader.read(min(size, READ_SIZE)))
+                    if not data:
+                        raise HttpError(400, "Request ended early")
+                    size -= len(data)
+                    yield data
+                await self._read(reader.readexactly(2))
+            return
+
+        try:
+            remaining = int(headers.get('content-length', '0'))
+        except ValueError:
+            raise HttpError(400, "Malformed Content-Length")
+        if remaining > self.max_body:
+            raise HttpError(413, f"Body larger than {self.max_body} bytes")
+        while remaining > 0:
+            data = await self._read(reader.read(min(remaining, READ_SIZE)))
+            if not data:
+                raise HttpError(400, "Request ended early")
+            remaining -= len(data)
+            yield data
+
+    async def _dispatch(self, method: str, target: str, headers: dict, reader, writer):
+
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if url.path == '/health':
+            await _send_json(writer, 200, {
+                'workers': self.workers, 'active': self._active, 'max_active': self.max_active
+            })
+            return
+
+        handler = self.ROUTES.get(url.path)
+        if handler is None:
+            raise HttpError(404, f"Unknown endpoint {url.path}")
+        if method != 'POST':
+            raise HttpError(405, f"{url.path} takes POST", {'Allow': 'POST'})
+        if self._active >= self.max_active:
+            raise HttpError(429, "Server busy, retry later", {'Retry-After': '1'})
+
+        self._active += 1
+        try:
+            with tempfile.TemporaryDirectory(prefix='phantompix-') as directory:
+                await getattr(self, handler)(query, headers, self._body(reader, headers), directory, writer)
+        finally:
+            self._active -= 1
+
+    async def _run(self, func, *args):
+        """Run ``func`` on the pool, within the job timeout."""
+
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(func, *args)
+        waiter = asyncio.wrap_future(future)
+        done, _ = await asyncio.wait([waiter], timeout=self.timeout)
+        if not done:
+            if not future.cancel():
+                # Still running: hold a slot until the worker is free again
+                self._active += 1
+                future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+            waiter.cancel()
+            raise HttpError(504, f"Job took longer than {self.timeout:g}s")
+        try:
+            return waiter.result()
+        except UnidentifiedImageError:
+            raise HttpError(422, "The body is not a supported image")
+        except ValueError as e:
+            raise HttpError(422, str(e))
+
+    def _release(self):
+
+        self._active -= 1
+
+    async def _encode(self, query, headers, body, directory, writer):
+
+        password = _password(headers)
+        bits_per_channel, channels = _layout_params(query)
+        compress = query.get('compress', 'auto')
+        compress = True if compress == 'auto' else compress
+        try:
+            png = get_png_options(query.get('png'))
+            kdf = query.get('kdf') or MessageEncryptor.DEFAULT_KDF
+            get_kdf(kdf)
+            if compress is not True:
+                get_codec(compress)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+
+        parts = await _save_multipart(body, _boundary(headers), directory)
+        for name in ('cover', 'message'):
+            if name not in parts:
+                raise HttpError(400, f"Missing '{name}' part")
+        output_path = os.path.join(directory, 'encoded.png')
+        result = await self._run(_encode_job, parts['cover'], parts['message'], password, output_path,
+                                 bits_per_channel, channels, png, kdf, compress)
+        await _send_file(writer, output_path, 'image/png', {'X-PhantomPix-Bytes': result['bytes']})
+
+    async def _decode(self, query, headers, body, directory, writer):
+
+        password = _password(headers)
+        image_path = await _save_body(body, os.path.join(directory, 'image'))
+        output_path = os.path.join(directory, 'message')
+        await self._run(_decode_job, image_path, password, output_path)
+        await _send_file(writer, output_path, 'application/octet-stream')
+
+    async def _probe(self, query, headers, body, directory, writer):
+
+        image_path = await _save_body(body, os.path.join(directory, 'image'))
+        await _send_json(writer, 200, await self._run(_probe_job, image_path))
+
+    async def _capacity(self, query, headers, body, directory, writer):
+
+        bits_per_channel, channels = _layout_params(query)
+        image_path = await _save_body(body, os.path.join(directory, 'image'))
+        await _send_json(writer, 200, await self._run(_capacity_job, image_path, bits_per_channel, channels))
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, **options):
+    """Run the service until interrupted; ``options`` go to EmbeddingService."""
+
+    async def main():
+        service = await EmbeddingService(host, port, **options).start()
+        sys.stderr.write(
+            f"PhantomPix service on http://{service.host}:{service.port} "
+            f"({service.workers} workers, {service.queue_size} queued)\n"
+        )
+        try:
+            await service.serve_forever()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
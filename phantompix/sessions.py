@@ -0,0 +1,162 @@
+"""
+Encode sessions: embed many payloads into one cover, decoding it once.
+
+    session = EncoderSession('template.png')
+    for encrypted in payloads:
+        png_bytes = session.embed(encrypted)
+
+EncoderSession decodes the cover once and keeps its pixels in a
+read-only array. Each embed() copies only the leading rows the header
+and payload occupy, embeds into that copy and writes the PNG from the
+copy followed by the untouched cover rows. Sessions never change, so
+one session may serve several threads at once.
+
+SessionCache keeps recently used sessions, keyed by path, size and
+mtime (or by content for in-memory covers), and evicts the least
+recently used ones once their pixels exceed a byte budget.
+
+Developed by: Zork
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from .pngstream import get_png_options
+from .steganography import ImageSteganography, ShardInfo
+from .tracing import span
+
+
+SESSION_CACHE_BYTES = 256 * 1024 * 1024
+
+
+class EncoderSession:
+
+    def __init__(self, cover):
+        self._pixels = ImageSteganography._load_pixels(cover)
+        self._pixels.flags.writeable = False
+
+    @property
+    def width(self) -> int:
+        return self._pixels.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self._pixels.shape[0]
+
+    @property
+    def mode(self) -> str:
+        return 'RGBA' if self._pixels.shape[2] == 4 else 'RGB'
+
+    @property
+    def nbytes(self) -> int:
+        return self._pixels.nbytes
+
+    @property
+    def pixels(self) -> np.ndarray:
+        """The cover's pixels (read-only)."""
+        return self._pixels
+
+    def capacity(self, bits_per_channel: int = 1, channels: int = None, sharded: bool = False) -> int:
+
+        layout = ImageSteganography._layout(bits_per_channel, channels)
+        if layout.channels > self._pixels.shape[2]:
+            raise ValueError("Image has no alpha channel")
+        header_size = ImageSteganography.HEADER_SIZE_V3 if sharded else None
+        return max(ImageSteganography._max_bytes(self.width, self.height, layout, header_size), 0)
+
+    def embed(self, encrypted_data: bytes, output=None, png=None, bits_per_channel: int = 1,
+              channels: int = None, shard: ShardInfo = None, scatter_key: bytes = None,
+              workers: int = None) -> Optional[bytes]:
+        """Embed ``encrypted_data`` into a copy of the cover and write a PNG.
+
+        Takes the same arguments as ImageSteganography.encode_message and
+        produces the same file; returns the PNG as bytes when ``output``
+        is omitted.
+        """
+        png = get_png_options(png)
+        layout = ImageSteganography._layout(bits_per_channel, channels)
+        ImageSteganography._check_shard(shard)
+        ImageSteganography._check_layout(self._pixels, layout)
+        if scatter_key is not None:
+            # Scattered pixels may lie in any row, so the whole cover is copied
+            with span('copy rows'):
+                pixels = self._pixels.copy()
+            ImageSteganography._embed_scattered(pixels, encrypted_data, scatter_key, layout, shard, workers)
+            return ImageSteganography._save_png(pixels, output, png)
+
+        header_size = ImageSteganography._header_size(layout, shard)
+        max_bytes = ImageSteganography._max_bytes(self.width, self.height, layout, header_size)
+        ImageSteganography._check_capacity(max_bytes, len(encrypted_data))
+
+        rows = ImageSteganography._rows_needed(self.width, header_size + len(encrypted_data), layout)
+        with span('copy rows'):
+            touched = self._pixels[:rows].copy()
+        ImageSteganography._embed_stream(touched, [encrypted_data], layout, shard, workers)
+        return ImageSteganography._save_png(touched, output, png, self._pixels[rows:])
+
+
+def session_key(cover):
+    """Cache key for ``cover``, or None if it cannot be identified cheaply.
+
+    Paths are keyed by absolute path, size and mtime, so an edited file is
+    decoded again; encoded bytes by their SHA-256.
+    """
+    if isinstance(cover, (str, os.PathLike)):
+        stat = os.stat(cover)
+        return ('path', os.path.abspath(cover), stat.st_size, stat.st_mtime_ns)
+    if isinstance(cover, (bytes, bytearray, memoryview)):
+        return ('data', hashlib.sha256(cover).digest())
+    return None
+
+
+class SessionCache:
+
+    def __init__(self, max_bytes: int = SESSION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, cover) -> EncoderSession:
+        """A session for ``cover``, reused if it was opened recently."""
+
+        key = session_key(cover)
+        if key is None:
+            return EncoderSession(cover)
+        with self._lock:
+            session = self._entries.get(key)
+            if session is not None:
+                self._entries.move_to_end(key)
+                return session
+
+        # Decode outside the lock; two threads may race to open the same
+        # cover, and the second simply replaces the first
+        session = EncoderSession(cover)
+        if session.nbytes <= self.max_bytes:
+            with self._lock:
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self._size -= previous.nbytes
+                self._entries[key] = session
+                self._size += session.nbytes
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= evicted.nbytes
+        return session
+
+    @property
+    def nbytes(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
@@ -0,0 +1,240 @@
+"""
+Multi-carrier payloads: one encrypted payload split across several covers.
+
+    encode_shards(encrypted, ['a.png', 'b.jpg', 'c.png'],
+                  ['out/a.png', 'out/b.png', 'out/c.png'])
+    encrypted = decode_shards('out/')        # a directory or a list of paths
+
+encode_shards cuts the payload into one shard per cover, sized in
+proportion to each cover's capacity, and embeds the shards in parallel on
+a process pool. Every shard's header (format version 3) records its
+index, the shard count and a content ID: the first 8 bytes of the whole
+payload's SHA-256, in hex.
+
+find_shard_sets probes candidate images (header only) in parallel and
+groups the shards it finds by content ID. join_shards extracts one set in
+parallel, each shard checking its own checksum, joins them in index
+order and checks the result against the content ID.
+
+Developed by: Zork
+"""
+import hashlib
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from .steganography import ImageSteganography, ShardInfo
+
+
+MAX_SHARDS = 0xFFFF
+
+
+def content_id(data: bytes) -> str:
+
+    return hashlib.sha256(data).digest()[:8].hex()
+
+
+def plan_shards(data_length: int, capacities) -> list:
+    """Shard sizes in proportion to ``capacities``, adding up to ``data_length``."""
+
+    total = sum(capacities)
+    if data_length > total:
+        raise ValueError(f"Covers too small. Can store {total} bytes together, need {data_length} bytes")
+    sizes = [data_length * capacity // total if total else 0 for capacity in capacities]
+
+    # Hand out the bytes lost to rounding to covers with room left
+    left = data_length - sum(sizes)
+    for index, capacity in enumerate(capacities):
+        extra = min(left, capacity - sizes[index])
+        sizes[index] += extra
+        left -= extra
+    return sizes
+
+
+def _temp_path(output):
+    """A fresh name next to ``output`` for a shard that is not yet complete."""
+
+    if not isinstance(output, (str, os.PathLike)):
+        return output
+    directory, name = os.path.split(os.path.abspath(output))
+    return os.path.join(directory, f'.{name}.{secrets.token_hex(4)}.tmp')
+
+
+def _executor(workers, jobs: int) -> ProcessPoolExecutor:
+
+    return ProcessPoolExecutor(max_workers=max(1, min(workers or os.cpu_count() or 1, jobs)))
+
+
+def encode_shards(encrypted_data: bytes, covers, outputs, workers: int = None, strip_rows: int = None,
+                  png=None, bits_per_channel: int = 1, channels: int = None) -> list:
+    """Split ``encrypted_data`` across ``covers`` and write one PNG per cover.
+
+    ``outputs`` lists the output path for each cover. Returns one record
+    per shard, in cover order. Shards are written to temporary files and
+    moved to their outputs only once every shard has succeeded, since an
+    incomplete set cannot be decoded; if any fails, no output is touched.
+    """
+    covers = list(covers)
+    outputs = list(outputs)
+    if not covers:
+        raise ValueError("At least one cover image is needed")
+    if len(outputs) != len(covers):
+        raise ValueError("Every cover needs an output path")
+    if len(covers) > MAX_SHARDS:
+        raise ValueError(f"A message can be split across at most {MAX_SHARDS} covers")
+
+    capacities = [
+        ImageSteganography.capacity(cover, bits_per_channel, channels, sharded=True) for cover in covers
+    ]
+    sizes = plan_shards(len(encrypted_data), capacities)
+    data_id = content_id(encrypted_data)
+    view = memoryview(encrypted_data)
+
+    temps = [_temp_path(output) for output in outputs]
+    jobs = []
+    start = 0
+    for index, (cover, temp, size) in enumerate(zip(covers, temps, sizes)):
+        shard = ShardInfo(index, len(covers), data_id)
+        jobs.append((cover, bytes(view[start:start + size]), temp, strip_rows, png,
+                     bits_per_channel, channels, shard))
+        start += size
+
+    with _executor(workers, len(jobs)) as executor:
+        futures = [executor.submit(ImageSteganography.encode_message, *job) for job in jobs]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            # Only this call's own temporary files; outputs were never written
+            for temp, output in zip(temps, outputs):
+                if temp is not output and os.path.exists(temp):
+                    os.remove(temp)
+            raise
+
+    for temp, output in zip(temps, outputs):
+        if temp is not output:
+            os.replace(temp, output)
+
+    return [
+        {'output': output, 'shard': index, 'shards': len(covers), 'bytes': size, 'content_id': data_id}
+        for index, (output, size) in enumerate(zip(outputs, sizes))
+    ]
+
+
+def _expand_sources(sources) -> list:
+
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(
+                entry.path for entry in sorted(os.scandir(source), key=lambda entry: entry.name)
+                if entry.is_file()
+            )
+        else:
+            paths.append(source)
+    return paths
+
+
+def _probe_shard(path):
+
+    try:
+        result = ImageSteganography.probe(path)
+    except Exception:
+        # Directories may hold files that are not images at all
+        return None
+    if result.content_id is None:
+        return None
+    return ShardInfo(result.shard_index, result.shard_total, result.content_id)
+
+
+def _find_shard_sets(paths, executor) -> dict:
+
+    sets = {}
+    for path, shard in zip(paths, executor.map(_probe_shard, paths)):
+        if shard is not None:
+            sets.setdefault(shard.content_id, []).append((shard, path))
+    for shards in sets.values():
+        shards.sort(key=lambda item: item[0].index)
+    return sets
+
+
+def find_shard_sets(sources, workers: int = None) -> dict:
+    """Map each content ID found in ``sources`` to its ``(ShardInfo, path)`` pairs.
+
+    ``sources`` is a directory, a path, or a list of either.
+    """
+    paths = _expand_sources(sources)
+    if not paths:
+        return {}
+    with _executor(workers, len(paths)) as executor:
+        return _find_shard_sets(paths, executor)
+
+
+def _shard_paths(shards) -> list:
+
+    data_id = shards[0][0].content_id
+    total = shards[0][0].total
+    if any(shard.total != total for shard, _ in shards):
+        raise ValueError(f"Shards of message {data_id} disagree on the shard count")
+
+    paths = {}
+    for shard, path in shards:
+        # The same shard may be present twice (e.g. copied); either will do
+        paths.setdefault(shard.index, path)
+    missing = [index + 1 for index in range(total) if index not in paths]
+    if missing:
+        raise ValueError(
+            f"Missing shard(s) {', '.join(map(str, missing))} of {total} for message {data_id}"
+        )
+    return [paths[index] for index in range(total)]
+
+
+def _read_shard(path, strip_rows=None) -> bytes:
+
+    return ImageSteganography.decode_message(path, strip_rows, shard=True)
+
+
+def _join_shards(shards, executor, strip_rows=None) -> bytes:
+
+    paths = _shard_paths(shards)
+    data = b''.join(executor.map(_read_shard, paths, repeat(strip_rows)))
+    if content_id(data) != shards[0][0].content_id:
+        raise ValueError("Data integrity check failed. The shards do not belong together")
+    return data
+
+
+def join_shards(shards, workers: int = None, strip_rows: int = None) -> bytes:
+    """Extract and join one set of ``(ShardInfo, path)`` pairs from find_shard_sets."""
+
+    with _executor(workers, len(shards)) as executor:
+        return _join_shards(shards, executor, strip_rows)
+
+
+def decode_shards(sources, workers: int = None, strip_rows: int = None, data_id: str = None) -> bytes:
+    """Find, extract and join the shards of one split payload in ``sources``.
+
+    ``data_id`` picks a content ID when the sources hold several.
+    """
+    paths = _expand_sources(sources)
+    if not paths:
+        raise ValueError("No shards of a split message found")
+
+    with _executor(workers, len(paths)) as executor:
+        sets = _find_shard_sets(paths, executor)
+        if data_id is not None:
+            if data_id not in sets:
+                raise ValueError(f"No shards of message {data_id} found")
+            shards = sets[data_id]
+        elif not sets:
+            raise ValueError("No shards of a split message found")
+        elif len(sets) > 1:
+            raise ValueError(
+                f"Shards of {len(sets)} different messages found ({', '.join(sorted(sets))}); pick one"
+            )
+        else:
+            shards = next(iter(sets.values()))
+        return _join_shards(shards, executor, strip_rows)
@@ -1,31 +1,948 @@
+"""
+LSB image steganography engine.
 
+The payload is framed with a header and written into the low bits of
+the R, G and B channels (and optionally alpha), pixel by pixel in
+row-major order, most significant bit of every byte first. By default one
+bit per RGB channel is used and alpha is never touched.
 
-import sys
+Header layout (big endian), version 1 (1 bit per channel, RGB):
+
+    MAGIC_MARKER   4 bytes   b'PPX1'
+    data_length    4 bytes   '>I'
+    checksum       8 bytes   sha256(data)[:8]
+
+Version 2 is written for any other Layout (1-4 bits per channel, 3 or 4
+channels) and records it:
+
+    MAGIC_MARKER   4 bytes   b'PPX2'
+    bits           1 byte    bits per channel
+    channels       1 byte    3 (RGB) or 4 (RGBA)
+    data_length    4 bytes   '>I'
+    checksum       8 bytes   sha256(data)[:8]
+
+Version 3 marks one shard of a payload split across several covers
+(see shards.py), under any layout:
+
+    MAGIC_MARKER   4 bytes   b'PPX3'
+    bits           1 byte    bits per channel
+    channels       1 byte    3 (RGB) or 4 (RGBA)
+    shard_index    2 bytes   '>H', from 0
+    shard_total    2 bytes   '>H'
+    content_id     8 bytes   sha256(whole payload)[:8]
+    data_length    4 bytes   '>I', of this shard
+    checksum       8 bytes   sha256(shard data)[:8]
+
+Header and payload share the layout. Each channel carries ``bits`` low
+bits, filled from its most significant one. Readers find the layout by
+looking for a magic marker under each candidate layout, which costs a
+few dozen pixels at most.
+
+capacity() reports how many payload bytes a cover can hold from the image
+header alone, without decoding any pixels:
+
+    capacity = width * height * channels * bits_per_channel / 8 - header
+
+Passing ``strip_rows`` to encode_message/decode_message processes the
+cover in horizontal strips of that many rows, so memory is bounded by the
+strip instead of the image (see pngstream.py). Output paths are only
+replaced once the new PNG is complete, so a cover may be encoded onto
+its own path.
+
+encode_stream and iter_payload move the payload in pieces, so it is never
+held in memory as a whole (pairs with MessageEncryptor.encrypt_stream and
+decrypt_stream). Since the header sits in front of the data, encode_stream
+writes the payload first and the header last.
+
+Every ``image`` argument may be a path, the encoded file as bytes,
+bytearray or memoryview, a binary file object, or a PIL Image; nothing is
+written to disk unless an output path is given. Buffers are read in
+place rather than copied, and the decoded pixel array is handed to the
+encoder without another copy (see encode_image). encode_message copies
+out only the leading rows the header and payload occupy and pastes them
+back into the decoded cover, which goes to the PNG encoder as it is.
+
+``workers`` splits embedding across a thread pool: the payload is cut
+into bands that start on pixel boundaries, so every band writes its own
+pixels, and each band's bits are unpacked and written by NumPy
+operations that release the GIL. The output is bit-identical to the
+single-threaded result. Payloads under two bands (BAND_BYTES each) are
+written inline.
+
+With a ``scatter_key`` (see scatter.py) the same frame goes to pixels
+picked by a keyed permutation of the whole image instead of the leading
+pixels; the frame's n-th pixel is pixel ``permutation(n)``. Readers look
+for a header at the top first and then, given the key, at the keyed
+positions. Only the frame's pixels are gathered, so reading costs in
+proportion to the payload.
+
+The encoders take ``png``, a preset name ('default', 'fast', 'small'), a
+spec such as 'fast:level=3' or a PngOptions, to trade output size for
+writing time (see pngstream.get_png_options).
+
+Developed by: Zork
+"""
+import hashlib
+import io
+import itertools
+import math
 import os
-from pathlib import Path
-
-# Add current directory to path
-current_dir = Path(__file__).parent
-sys.path.insert(0, str(current_dir))
-
-try:
-    # Import the compiled module
-    import steganography
-    
-    # If original had main execution, run it
-    # No main function detected
-    
-    
-    
-    
-    
-    print(f"Module 'steganography' loaded successfully!")
-    print(f"Available attributes: {[attr for attr in dir(steganography) if not attr.startswith('_')]}")
-    
-except ImportError as e:
-    print(f"Error importing compiled module: {e}")
-    print("Make sure the .pyd file is in the same directory as this launcher.")
-    sys.exit(1)
-except Exception as e:
-    print(f"Error running module: {e}")
-    sys.exit(1)
+import struct
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import NamedTuple, Optional
+
+import numpy as np
+from PIL import Image
+
+from .pngstream import (PngStripReader, PngStripWriter, UnsupportedPngError, get_png_options, write_png,
+                        write_png_rows)
+from .scatter import KeyedPermutation
+from .tracing import span, traced_iter
+
+
+class ProbeResult(NamedTuple):
+
+    has_payload: bool
+    data_length: Optional[int] = None
+    version: Optional[int] = None
+    bits_per_channel: Optional[int] = None
+    channels: Optional[int] = None
+    shard_index: Optional[int] = None
+    shard_total: Optional[int] = None
+    content_id: Optional[str] = None
+    # True when the format could not be streamed and the whole image was decoded
+    full_decode: bool = False
+
+
+class ShardInfo(NamedTuple):
+
+    index: int
+    total: int
+    content_id: str
+
+
+class Layout(NamedTuple):
+
+    bits_per_channel: int = 1
+    channels: int = 3
+
+
+DEFAULT_LAYOUT = Layout()
+
+
+class ImageSteganography:
+
+    MAGIC_MARKER = b'PPX1'
+    MAGIC_MARKER_V2 = b'PPX2'
+    MAGIC_MARKER_V3 = b'PPX3'
+    FORMAT_VERSION = 3
+    HEADER_SIZE = 16
+    HEADER_SIZE_V2 = 18
+    HEADER_SIZE_V3 = 30
+    # The largest header fits in this many pixels under any layout
+    HEADER_PIXELS = 80
+    CHANNELS = 3
+    MAX_BITS_PER_CHANNEL = 4
+    STRIP_ROWS = 256
+    CHUNK_SIZE = 1024 * 1024
+    SPOOL_SIZE = 16 * 1024 * 1024
+    BAND_BYTES = 256 * 1024
+
+    @staticmethod
+    def _calculate_checksum(data: bytes) -> bytes:
+
+        return hashlib.sha256(data).digest()[:8]
+
+    @staticmethod
+    def _normalize(image: Image.Image) -> Image.Image:
+
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        return image
+
+    @staticmethod
+    @contextmanager
+    def _open_image(image):
+
+        if isinstance(image, Image.Image):
+            yield image
+            return
+        with Image.open(_as_file(image)) as opened:
+            yield opened
+
+    @staticmethod
+    def _load_pixels(image) -> np.ndarray:
+
+        with span('decode image'), ImageSteganography._open_image(image) as opened:
+            # np.array copies, so a caller's PIL Image is never modified
+            return np.array(ImageSteganography._normalize(opened))
+
+    @staticmethod
+    def _save_png(pixels, output, png=None, rest: np.ndarray = None) -> Optional[bytes]:
+        """Write ``pixels`` (followed by the rows in ``rest``, if given) as a PNG.
+
+        ``pixels`` may also be a PIL Image.
+        """
+
+        with span('write png'):
+            target = io.BytesIO() if output is None else output
+            if rest is None or not len(rest):
+                write_png(pixels, target, png)
+            else:
+                write_png_rows([pixels, rest], target, png)
+            return target.getvalue() if output is None else None
+
+    @staticmethod
+    def _layout(bits_per_channel: int = 1, channels: int = None) -> Layout:
+
+        channels = channels or ImageSteganography.CHANNELS
+        if not 1 <= bits_per_channel <= ImageSteganography.MAX_BITS_PER_CHANNEL:
+            raise ValueError(
+                f"bits_per_channel must be between 1 and {ImageSteganography.MAX_BITS_PER_CHANNEL}"
+            )
+        if channels not in (3, 4):
+            raise ValueError("channels must be 3 (RGB) or 4 (RGBA)")
+        return Layout(bits_per_channel, channels)
+
+    @staticmethod
+    def _header_size(layout: Layout = DEFAULT_LAYOUT, shard: ShardInfo = None) -> int:
+
+        if shard is not None:
+            return ImageSteganography.HEADER_SIZE_V3
+        if layout == DEFAULT_LAYOUT:
+            return ImageSteganography.HEADER_SIZE
+        return ImageSteganography.HEADER_SIZE_V2
+
+    @staticmethod
+    def _max_bytes(width: int, height: int, layout: Layout = DEFAULT_LAYOUT, header_size: int = None) -> int:
+
+        if header_size is None:
+            header_size = ImageSteganography._header_size(layout)
+        total_bits = width * height * layout.channels * layout.bits_per_channel
+        return total_bits // 8 - header_size
+
+    @staticmethod
+    def _pixels_needed(num_bytes: int, layout: Layout = DEFAULT_LAYOUT) -> int:
+        """Pixels that ``num_bytes`` of header and payload occupy."""
+
+        slots = -(-num_bytes * 8 // layout.bits_per_channel)
+        return -(-slots // layout.channels)
+
+    @staticmethod
+    def _rows_needed(width: int, num_bytes: int, layout: Layout = DEFAULT_LAYOUT) -> int:
+        """Rows from the top that ``num_bytes`` of header and payload occupy."""
+
+        return -(-ImageSteganography._pixels_needed(num_bytes, layout) // width)
+
+    @staticmethod
+    def _check_scatter(strip_rows: Optional[int], scatter_key: Optional[bytes]) -> None:
+
+        if strip_rows and scatter_key is not None:
+            raise ValueError("Scattered payloads use the whole image and cannot be processed in strips")
+
+    @staticmethod
+    def _check_layout(pixels: np.ndarray, layout: Layout) -> None:
+
+        if layout.channels > pixels.shape[-1]:
+            raise ValueError("Image has no alpha channel")
+
+    @staticmethod
+    def _build_header(data_length: int, checksum: bytes, layout: Layout = DEFAULT_LAYOUT,
+                      shard: ShardInfo = None) -> bytes:
+
+        if shard is not None:
+            return (
+                ImageSteganography.MAGIC_MARKER_V3 + bytes(layout)
+                + struct.pack('>HH', shard.index, shard.total) + bytes.fromhex(shard.content_id)
+                + struct.pack('>I', data_length) + checksum
+            )
+        if layout == DEFAULT_LAYOUT:
+            return ImageSteganography.MAGIC_MARKER + struct.pack('>I', data_length) + checksum
+        return (
+            ImageSteganography.MAGIC_MARKER_V2 + bytes(layout)
+            + struct.pack('>I', data_length) + checksum
+        )
+
+    @staticmethod
+    def _build_payload(encrypted_data: bytes, layout: Layout = DEFAULT_LAYOUT,
+                       shard: ShardInfo = None) -> bytes:
+
+        return ImageSteganography._build_header(
+            len(encrypted_data), ImageSteganography._calculate_checksum(encrypted_data), layout, shard
+        ) + encrypted_data
+
+    @staticmethod
+    def _check_shard(shard: Optional[ShardInfo]) -> None:
+
+        if shard is None:
+            return
+        if not 0 <= shard.index < shard.total <= 0xFFFF:
+            raise ValueError("Shard index must be below the shard count (at most 65535)")
+        if len(bytes.fromhex(shard.content_id)) != 8:
+            raise ValueError("Shard content ID must be 8 bytes (16 hex digits)")
+
+    @staticmethod
+    def _check_capacity(max_bytes: int, data_length: int) -> None:
+
+        if data_length > max_bytes:
+            raise ValueError(
+                f"Image too small. Can store {max_bytes} bytes, need {data_length} bytes"
+            )
+
+    @staticmethod
+    def _find_layout(pixels: np.ndarray):
+        """``(layout, header_size)`` of the header starting ``pixels``, or None."""
+
+        if ImageSteganography._extract_bits(pixels, 4) == ImageSteganography.MAGIC_MARKER:
+            return DEFAULT_LAYOUT, ImageSteganography.HEADER_SIZE
+        sizes = {
+            ImageSteganography.MAGIC_MARKER_V2: ImageSteganography.HEADER_SIZE_V2,
+            ImageSteganography.MAGIC_MARKER_V3: ImageSteganography.HEADER_SIZE_V3,
+        }
+        for channels in (3, 4):
+            if channels > pixels.shape[-1]:
+                break
+            for bits_per_channel in range(1, ImageSteganography.MAX_BITS_PER_CHANNEL + 1):
+                layout = Layout(bits_per_channel, channels)
+                header = ImageSteganography._extract_bits(pixels, 6, layout=layout)
+                # The recorded layout must match the one it was read with
+                if header[:4] in sizes and header[4:] == bytes(layout):
+                    return layout, sizes[header[:4]]
+        return None
+
+    @staticmethod
+    def _parse_header(header: bytes, max_bytes: int):
+
+        if header[:4] not in (ImageSteganography.MAGIC_MARKER, ImageSteganography.MAGIC_MARKER_V2,
+                              ImageSteganography.MAGIC_MARKER_V3):
+            raise ValueError("No encoded message found in this image")
+
+        # Every version ends with the data length and the checksum
+        data_length = struct.unpack('>I', header[-12:-8])[0]
+        if data_length > max_bytes:
+            raise ValueError("Data integrity check failed. Image may be corrupted")
+        return data_length, header[-8:]
+
+    @staticmethod
+    def _parse_shard(header: bytes) -> Optional[ShardInfo]:
+
+        if header[:4] != ImageSteganography.MAGIC_MARKER_V3:
+            return None
+        index, total = struct.unpack('>HH', header[6:10])
+        return ShardInfo(index, total, header[10:18].hex())
+
+    @staticmethod
+    def _check_kind(header: bytes, shard: bool) -> None:
+
+        info = ImageSteganography._parse_shard(header)
+        if info is not None and not shard:
+            raise ValueError(
+                f"This image holds shard {info.index + 1} of {info.total} of a split message; "
+                f"decode it together with the other shards"
+            )
+        if info is None and shard:
+            raise ValueError("This image does not hold a shard of a split message")
+
+    @staticmethod
+    def _verify_digest(digest, stored_checksum: bytes) -> None:
+
+        if digest.digest()[:8] != stored_checksum:
+            raise ValueError("Data integrity check failed. Image may be corrupted")
+
+    @staticmethod
+    def _slot_bits(values: np.ndarray, bits_per_channel: int) -> np.ndarray:
+        """The low bits of each channel value, most significant first."""
+
+        if bits_per_channel == 1:
+            return values & 1
+        shifts = np.arange(bits_per_channel - 1, -1, -1, dtype=np.uint8)
+        return ((values[:, None] >> shifts) & 1).reshape(-1)
+
+    @staticmethod
+    def _write_bits(pixels: np.ndarray, bits: np.ndarray, offset: int = 0,
+                    layout: Layout = DEFAULT_LAYOUT) -> None:
+
+        bits_per_channel, channels = layout
+        flat_pixels = pixels.reshape(-1, pixels.shape[-1])
+        end = offset + bits.size
+        first_slot = offset // bits_per_channel
+        last_slot = -(-end // bits_per_channel)
+        first = first_slot // channels
+        last = -(-last_slot // channels)
+        skip = first_slot % channels
+
+        # Only the pixels that carry these bits are copied out of the
+        # channel planes; for RGBA with 3 channels this skips alpha.
+        values = flat_pixels[first:last, :channels].reshape(-1)
+        slots = values[skip:skip + last_slot - first_slot]
+        if bits_per_channel == 1:
+            slots[:] = (slots & 0xFE) | bits
+        else:
+            # Channels only partly covered keep their other bits
+            lead = offset - first_slot * bits_per_channel
+            tail = last_slot * bits_per_channel - end
+            if lead or tail:
+                bits = np.concatenate((
+                    ImageSteganography._slot_bits(slots[:1], bits_per_channel)[:lead], bits,
+                    ImageSteganography._slot_bits(slots[-1:], bits_per_channel)[bits_per_channel - tail:],
+                ))
+            weights = (1 << np.arange(bits_per_channel - 1, -1, -1)).astype(np.uint8)
+            packed = (bits.reshape(-1, bits_per_channel) * weights).sum(axis=1, dtype=np.uint8)
+            mask = 0xFF ^ ((1 << bits_per_channel) - 1)
+            slots[:] = (slots & mask) | packed
+        flat_pixels[first:last, :channels] = values.reshape(last - first, channels)
+
+    @staticmethod
+    def _band_cuts(length: int, offset: int, layout: Layout, bands: int) -> list:
+        """Byte positions cutting ``length`` bytes written from bit ``offset`` into pixel-aligned bands."""
+
+        pixel_bits = layout.channels * layout.bits_per_channel
+        # Bytes in the smallest run that fills whole pixels
+        step = pixel_bits // math.gcd(8, pixel_bits)
+        first = -(offset // 8) % step
+        band_bytes = max(-(-length // bands), ImageSteganography.BAND_BYTES)
+        band_bytes += -band_bytes % step
+        return [0] + [cut for cut in range(first, length, band_bytes) if cut] + [length]
+
+    @staticmethod
+    def _write_bytes(pixels: np.ndarray, data: bytes, offset: int = 0, layout: Layout = DEFAULT_LAYOUT,
+                     pool: ThreadPoolExecutor = None, bands: int = 1) -> None:
+        """Write ``data`` from bit ``offset`` on, in up to ``bands`` bands on ``pool``."""
+
+        def write(start, end):
+            bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8, count=end - start, offset=start))
+            ImageSteganography._write_bits(pixels, bits, offset + start * 8, layout)
+
+        cuts = [0, len(data)]
+        if pool is not None:
+            cuts = ImageSteganography._band_cuts(len(data), offset, layout, bands)
+        if len(cuts) == 2:
+            write(0, len(data))
+            return
+        # Bands cover disjoint pixels, so they never write the same bytes
+        for future in [pool.submit(write, start, end) for start, end in zip(cuts, cuts[1:])]:
+            future.result()
+
+    @staticmethod
+    def _embed_bits(pixels: np.ndarray, data: bytes, layout: Layout = DEFAULT_LAYOUT) -> None:
+
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+        ImageSteganography._write_bits(pixels, bits, 0, layout)
+
+    @staticmethod
+    def _read_bits(pixels: np.ndarray, count: int, offset: int = 0,
+                   layout: Layout = DEFAULT_LAYOUT) -> np.ndarray:
+        """Up to ``count`` bits from bit ``offset`` on; fewer if ``pixels`` runs out."""
+
+        bits_per_channel, channels = layout
+        flat_pixels = pixels.reshape(-1, pixels.shape[-1])
+        first_slot = offset // bits_per_channel
+        last_slot = -(-(offset + count) // bits_per_channel)
+        first = first_slot // channels
+        skip = first_slot % channels
+        values = flat_pixels[first:-(-last_slot // channels), :channels].reshape(-1)
+        bits = ImageSteganography._slot_bits(values[skip:skip + last_slot - first_slot], bits_per_channel)
+        lead = offset - first_slot * bits_per_channel
+        return bits[lead:lead + count]
+
+    @staticmethod
+    def _extract_bits(pixels: np.ndarray, num_bytes: int, offset: int = 0,
+                      layout: Layout = DEFAULT_LAYOUT) -> bytes:
+
+        bits = ImageSteganography._read_bits(pixels, num_bytes * 8, offset * 8, layout)
+        return np.packbits(bits).tobytes()
+
+    @staticmethod
+    @contextmanager
+    def _open_strips(image, strip_rows: int):
+        """Yield (width, height, strips, streamed); ``streamed`` is false when the image was decoded whole."""
+
+        reader = None
+        if not isinstance(image, Image.Image):
+            image = _as_file(image)
+            start = None if isinstance(image, (str, os.PathLike)) else image.tell()
+            try:
+                reader = PngStripReader(image, strip_rows)
+            except UnsupportedPngError:
+                if start is not None:
+                    image.seek(start)
+
+        if reader is None:
+            # Formats we cannot stream are decoded in one go, then sliced.
+            pixels = ImageSteganography._load_pixels(image)
+            height, width = pixels.shape[:2]
+            yield width, height, (
+                (row, pixels[row:row + strip_rows]) for row in range(0, height, strip_rows)
+            ), False
+            return
+
+        with reader:
+            yield reader.width, reader.height, traced_iter((
+                (row, np.array(ImageSteganography._normalize(strip))) for row, strip in reader
+            ), 'decode image'), True
+
+    @staticmethod
+    def _split_head(strips) -> Optional[np.ndarray]:
+        """Join leading strips into a pixel list long enough to hold any header."""
+
+        collected = []
+        count = 0
+        for _, pixels in strips:
+            collected.append(pixels.reshape(-1, pixels.shape[-1]))
+            count += collected[-1].shape[0]
+            if count >= ImageSteganography.HEADER_PIXELS:
+                break
+        return np.concatenate(collected) if collected else None
+
+    @staticmethod
+    def _encode_strips(image, sources, payload_length: int, output, strip_rows: int,
+                       png=None, layout: Layout = DEFAULT_LAYOUT, shard: ShardInfo = None) -> None:
+
+        bit_reader = _BitReader(sources)
+        total_bits = payload_length * 8
+        pixel_bits = layout.channels * layout.bits_per_channel
+        header_size = ImageSteganography._header_size(layout, shard)
+
+        writer = None
+        try:
+            with ImageSteganography._open_strips(image, strip_rows) as (width, height, strips, _):
+                max_bytes = ImageSteganography._max_bytes(width, height, layout, header_size)
+                ImageSteganography._check_capacity(max_bytes, payload_length - header_size)
+
+                for row, pixels in strips:
+                    ImageSteganography._check_layout(pixels, layout)
+                    start = row * width * pixel_bits
+                    if start < total_bits:
+                        count = min(pixels.shape[0] * width * pixel_bits, total_bits - start)
+                        with span('embed bits'):
+                            ImageSteganography._write_bits(pixels, bit_reader.read(count), 0, layout)
+                    with span('write png'):
+                        if writer is None:
+                            mode = 'RGBA' if pixels.shape[-1] == 4 else 'RGB'
+                            writer = PngStripWriter(output, width, height, mode, png)
+                        writer.write(pixels)
+            # The cover is closed first: the output may be the cover's own path
+            with span('write png'):
+                writer.close()
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+
+    @staticmethod
+    def _iter_strip_payload(image, strip_rows: int, shard: bool = False):
+
+        pending = np.empty(0, dtype=np.uint8)
+        remaining = None
+        digest = hashlib.sha256()
+
+        with ImageSteganography._open_strips(image, strip_rows) as (width, height, strips, _):
+            head = ImageSteganography._split_head(strips)
+            found = None if head is None else ImageSteganography._find_layout(head)
+            if found is None:
+                raise ValueError("No encoded message found in this image")
+            layout, header_size = found
+            max_bytes = ImageSteganography._max_bytes(width, height, layout, header_size)
+            header_bits = header_size * 8
+            pixel_bits = layout.channels * layout.bits_per_channel
+
+            # Stop pulling strips (and inflating the file) as soon as the
+            # header-declared payload has been read.
+            for pixels in itertools.chain([head], (pixels for _, pixels in strips)):
+                # Until the header is known the whole strip is read, so
+                # no bits are skipped once the real length is learnt.
+                limit = remaining if remaining is not None else pixels.size // pixels.shape[-1] * pixel_bits
+                with span('extract bits'):
+                    bits = ImageSteganography._read_bits(pixels, limit, 0, layout)
+                    pending = np.concatenate((pending, bits))
+
+                if remaining is None:
+                    if pending.size < header_bits:
+                        continue
+                    header = np.packbits(pending[:header_bits]).tobytes()
+                    data_length, stored_checksum = ImageSteganography._parse_header(header, max_bytes)
+                    ImageSteganography._check_kind(header, shard)
+                    pending = pending[header_bits:header_bits + data_length * 8]
+                    remaining = data_length * 8 - pending.size
+                else:
+                    remaining -= bits.size
+
+                whole = pending.size - pending.size % 8
+                if whole:
+                    with span('extract bits'):
+                        chunk = np.packbits(pending[:whole]).tobytes()
+                        pending = pending[whole:]
+                        digest.update(chunk)
+                    yield chunk
+
+                if remaining == 0:
+                    break
+
+        if remaining != 0:
+            raise ValueError("Data integrity check failed. Image may be corrupted")
+        ImageSteganography._verify_digest(digest, stored_checksum)
+
+    @staticmethod
+    def probe(image) -> ProbeResult:
+        """Check for a payload by decoding only the rows holding the header.
+
+        Only 8-bit non-interlaced PNGs can be read a few rows at a time;
+        any other image is decoded whole, which the result reports as
+        ``full_decode``.
+        """
+        with ImageSteganography._open_strips(image, 1) as (width, height, strips, streamed):
+            head = ImageSteganography._split_head(strips)
+        found = None if head is None else ImageSteganography._find_layout(head)
+        if found is None:
+            return ProbeResult(False, full_decode=not streamed)
+
+        layout, header_size = found
+        header = ImageSteganography._extract_bits(head, header_size, 0, layout)
+        try:
+            data_length, _ = ImageSteganography._parse_header(
+                header, ImageSteganography._max_bytes(width, height, layout, header_size)
+            )
+        except ValueError:
+            return ProbeResult(False, full_decode=not streamed)
+        version = int(chr(header[3]))
+        shard = ImageSteganography._parse_shard(header) or (None, None, None)
+        return ProbeResult(True, data_length, version, *layout, *shard, not streamed)
+
+    @staticmethod
+    def capacity(image, bits_per_channel: int = 1, channels: int = None, sharded: bool = False) -> int:
+        """Payload bytes the image can hold, read from its header only.
+
+        ``channels`` is 3 (RGB) by default, or 4 to count alpha as well,
+        which needs an image that keeps its alpha channel (RGBA).
+        ``sharded`` accounts for the larger header of a shard.
+        """
+        layout = ImageSteganography._layout(bits_per_channel, channels)
+
+        # Image.open only parses the header; pixels are decoded lazily.
+        with ImageSteganography._open_image(image) as opened:
+            width, height = opened.size
+            mode = opened.mode
+        if layout.channels == 4 and mode != 'RGBA':
+            raise ValueError("Image has no alpha channel")
+
+        header_size = ImageSteganography.HEADER_SIZE_V3 if sharded else None
+        return max(ImageSteganography._max_bytes(width, height, layout, header_size), 0)
+
+    @staticmethod
+    def _embed_stream(pixels: np.ndarray, chunks, layout: Layout = DEFAULT_LAYOUT,
+                      shard: ShardInfo = None, workers: int = None) -> int:
+
+        ImageSteganography._check_layout(pixels, layout)
+        header_size = ImageSteganography._header_size(layout, shard)
+        height, width = pixels.shape[:2]
+        max_bytes = ImageSteganography._max_bytes(width, height, layout, header_size)
+        digest = hashlib.sha256()
+        data_length = 0
+        offset = header_size * 8
+        bands = workers or 1
+        with ThreadPoolExecutor(bands) if bands > 1 else nullcontext() as pool:
+            for chunk in chunks:
+                data_length += len(chunk)
+                ImageSteganography._check_capacity(max_bytes, data_length)
+                with span('embed bits'):
+                    if pool is None:
+                        digest.update(chunk)
+                    else:
+                        # hashlib releases the GIL too, so the checksum runs beside the bands
+                        hashing = pool.submit(digest.update, chunk)
+                    ImageSteganography._write_bytes(pixels, chunk, offset, layout, pool, bands)
+                    if pool is not None:
+                        hashing.result()
+                offset += len(chunk) * 8
+
+        with span('embed bits'):
+            header = ImageSteganography._build_header(data_length, digest.digest()[:8], layout, shard)
+            ImageSteganography._embed_bits(pixels, header, layout)
+        return data_length
+
+    @staticmethod
+    def _embed_rows(cover: Image.Image, encrypted_data: bytes, layout: Layout = DEFAULT_LAYOUT,
+                    shard: ShardInfo = None, workers: int = None) -> None:
+        """Embed into ``cover`` in place, copying out only the rows the payload occupies.
+
+        A small message in a large cover then costs in proportion to the
+        message: the rows are copied to an array, embedded and pasted back.
+        """
+        width, height = cover.size
+        if layout.channels == 4 and cover.mode != 'RGBA':
+            raise ValueError("Image has no alpha channel")
+        header_size = ImageSteganography._header_size(layout, shard)
+        max_bytes = ImageSteganography._max_bytes(width, height, layout, header_size)
+        ImageSteganography._check_capacity(max_bytes, len(encrypted_data))
+
+        rows = ImageSteganography._rows_needed(width, header_size + len(encrypted_data), layout)
+        with span('copy rows'):
+            touched = np.array(cover.crop((0, 0, width, rows)))
+        ImageSteganography._embed_stream(touched, [encrypted_data], layout, shard, workers)
+        with span('copy rows'):
+            cover.paste(Image.fromarray(touched), (0, 0))
+
+    @staticmethod
+    def _embed_scattered(pixels: np.ndarray, encrypted_data: bytes, scatter_key: bytes,
+                         layout: Layout = DEFAULT_LAYOUT, shard: ShardInfo = None, workers: int = None) -> None:
+        """Embed into ``pixels`` in place, at the positions ``scatter_key`` picks."""
+
+        ImageSteganography._check_layout(pixels, layout)
+        height, width = pixels.shape[:2]
+        header_size = ImageSteganography._header_size(layout, shard)
+        max_bytes = ImageSteganography._max_bytes(width, height, layout, header_size)
+        ImageSteganography._check_capacity(max_bytes, len(encrypted_data))
+
+        flat_pixels = pixels.reshape(-1, pixels.shape[-1])
+        found = ImageSteganography._find_layout(pixels)
+        if found is not None:
+            # A payload embedded at the top earlier would be found before
+            # the scattered one, so its header is overwritten with noise
+            old_layout, old_size = found
+            noise = np.frombuffer(os.urandom(old_size), dtype=np.uint8)
+            ImageSteganography._write_bits(pixels, np.unpackbits(noise), 0, old_layout)
+
+        count = ImageSteganography._pixels_needed(header_size + len(encrypted_data), layout)
+        with span('scatter'):
+            positions = KeyedPermutation(scatter_key, width * height).positions(count)
+            frame = flat_pixels[positions]
+        ImageSteganography._embed_stream(frame[:, None], [encrypted_data], layout, shard, workers)
+        with span('scatter'):
+            flat_pixels[positions] = frame
+
+    @staticmethod
+    def _gather_frame(pixels: np.ndarray, scatter_key: bytes):
+        """``(frame pixels, (layout, header_size))`` of a scattered frame, or ``(pixels, None)``."""
+
+        height, width = pixels.shape[:2]
+        flat_pixels = pixels.reshape(-1, pixels.shape[-1])
+        permutation = KeyedPermutation(scatter_key, width * height)
+        with span('scatter'):
+            head_count = min(ImageSteganography.HEADER_PIXELS, width * height)
+            frame = flat_pixels[permutation.positions(head_count)]
+        found = ImageSteganography._find_layout(frame)
+        if found is None:
+            return pixels, None
+
+        layout, header_size = found
+        header = ImageSteganography._extract_bits(frame, header_size, 0, layout)
+        data_length, _ = ImageSteganography._parse_header(
+            header, ImageSteganography._max_bytes(width, height, layout, header_size)
+        )
+        count = ImageSteganography._pixels_needed(header_size + data_length, layout)
+        if count > head_count:
+            with span('scatter'):
+                rest = flat_pixels[permutation.positions(count - head_count, head_count)]
+            frame = np.concatenate((frame, rest))
+        return frame, found
+
+    @staticmethod
+    def encode_image(image, encrypted_data: bytes, bits_per_channel: int = 1,
+                     channels: int = None, workers: int = None) -> Image.Image:
+        """Embed into ``image`` and return the result as a PIL Image.
+
+        The returned image shares the engine's pixel buffer, so no PNG is
+        encoded and nothing is copied. Save it losslessly (PNG) to keep
+        the payload.
+        """
+        layout = ImageSteganography._layout(bits_per_channel, channels)
+        pixels = ImageSteganography._load_pixels(image)
+        ImageSteganography._embed_stream(pixels, [encrypted_data], layout, workers=workers)
+        return Image.fromarray(pixels)
+
+    @staticmethod
+    def encode_stream(image, chunks, output, strip_rows: int = None, png=None,
+                      bits_per_channel: int = 1, channels: int = None, workers: int = None) -> int:
+        """Embed a payload given as an iterable of bytes pieces.
+
+        ``output`` is a path or a writable binary file object. Returns the
+        payload length. With ``strip_rows`` the pieces are spooled to a
+        temporary file first, because the streamed cover's first strip
+        (which holds the header) must be written before the payload
+        length is known.
+
+        ``bits_per_channel`` (1-4) and ``channels`` (3, or 4 to use alpha
+        too) trade invisibility for capacity; readers detect them.
+        ``workers`` threads embed each piece in bands; strips are always
+        embedded on the calling thread.
+        """
+        png = get_png_options(png)
+        layout = ImageSteganography._layout(bits_per_channel, channels)
+        if strip_rows:
+            digest = hashlib.sha256()
+            data_length = 0
+            with tempfile.SpooledTemporaryFile(max_size=ImageSteganography.SPOOL_SIZE) as spool:
+                for chunk in chunks:
+                    spool.write(chunk)
+                    digest.update(chunk)
+                    data_length += len(chunk)
+                spool.seek(0)
+                header = ImageSteganography._build_header(data_length, digest.digest()[:8], layout)
+                ImageSteganography._encode_strips(
+                    image, [io.BytesIO(header), spool],
+                    len(header) + data_length, output, strip_rows, png, layout
+                )
+            return data_length
+
+        pixels = ImageSteganography._load_pixels(image)
+        data_length = ImageSteganography._embed_stream(pixels, chunks, layout, workers=workers)
+        ImageSteganography._save_png(pixels, output, png)
+        return data_length
+
+    @staticmethod
+    def encode_message(image, encrypted_data: bytes, output=None, strip_rows: int = None,
+                       png=None, bits_per_channel: int = 1, channels: int = None,
+                       shard: ShardInfo = None, scatter_key: bytes = None, workers: int = None) -> Optional[bytes]:
+        """Embed ``encrypted_data`` and write a PNG to ``output``.
+
+        ``output`` is a path or a writable binary file object; when it is
+        omitted the PNG is returned as bytes. ``shard`` marks the data as
+        one piece of a split payload (see shards.py). ``scatter_key``
+        spreads it over the image (see scatter.scatter_key). ``workers``
+        threads embed the payload in bands, with the same result.
+        """
+        png = get_png_options(png)
+        layout = ImageSteganography._layout(bits_per_channel, channels)
+        ImageSteganography._check_shard(shard)
+        ImageSteganography._check_scatter(strip_rows, scatter_key)
+        if scatter_key is not None:
+            pixels = ImageSteganography._load_pixels(image)
+            ImageSteganography._embed_scattered(pixels, encrypted_data, scatter_key, layout, shard, workers)
+            return ImageSteganography._save_png(pixels, output, png)
+        if strip_rows:
+            target = io.BytesIO() if output is None else output
+            payload = ImageSteganography._build_payload(encrypted_data, layout, shard)
+            ImageSteganography._encode_strips(
+                image, [io.BytesIO(payload)], len(payload), target, strip_rows, png, layout, shard
+            )
+            return target.getvalue() if output is None else None
+
+        with ImageSteganography._open_image(image) as opened:
+            with span('decode image'):
+                cover = ImageSteganography._normalize(opened)
+                if cover is image:
+                    # A caller's PIL Image is never modified
+                    cover = cover.copy()
+                cover.load()
+            # Metadata such as an ICC profile or tRNS color would be saved too
+            cover.info = {}
+            ImageSteganography._embed_rows(cover, encrypted_data, layout, shard, workers)
+            return ImageSteganography._save_png(cover, output, png)
+
+    @staticmethod
+    def iter_payload(image, strip_rows: int = None, chunk_size: int = None, shard: bool = False,
+                     scatter_key: bytes = None):
+        """Yield the embedded payload in pieces.
+
+        The checksum is verified after the last piece; a mismatch raises
+        ValueError at that point. Shards of a split payload are refused
+        unless ``shard`` is true (shards.decode_shards joins them). With
+        ``scatter_key``, a payload not found at the top is looked for at
+        the keyed positions.
+        """
+        ImageSteganography._check_scatter(strip_rows, scatter_key)
+        if strip_rows:
+            yield from ImageSteganography._iter_strip_payload(image, strip_rows, shard)
+            return
+
+        pixels = ImageSteganography._load_pixels(image)
+
+        height, width = pixels.shape[:2]
+        found = ImageSteganography._find_layout(pixels)
+        if found is None and scatter_key is not None:
+            # Everything below reads the gathered frame as if it were sequential
+            pixels, found = ImageSteganography._gather_frame(pixels, scatter_key)
+        if found is None:
+            raise ValueError("No encoded message found in this image")
+        layout, header_size = found
+        max_bytes = ImageSteganography._max_bytes(width, height, layout, header_size)
+
+        header = ImageSteganography._extract_bits(pixels, header_size, 0, layout)
+        data_length, stored_checksum = ImageSteganography._parse_header(header, max_bytes)
+        ImageSteganography._check_kind(header, shard)
+
+        chunk_size = chunk_size or ImageSteganography.CHUNK_SIZE
+        digest = hashlib.sha256()
+        for start in range(0, data_length, chunk_size):
+            count = min(chunk_size, data_length - start)
+            with span('extract bits'):
+                chunk = ImageSteganography._extract_bits(pixels, count, header_size + start, layout)
+                digest.update(chunk)
+            yield chunk
+        ImageSteganography._verify_digest(digest, stored_checksum)
+
+    @staticmethod
+    def decode_message(image, strip_rows: int = None, shard: bool = False, scatter_key: bytes = None) -> bytes:
+
+        return b''.join(ImageSteganography.iter_payload(image, strip_rows, shard=shard, scatter_key=scatter_key))
+
+
+class _BufferFile(io.RawIOBase):
+    """Read-only, seekable file view of a buffer that does not copy it."""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def readinto(self, target) -> int:
+
+        data = self._view[self._position:self._position + len(target)]
+        target[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+def _as_file(image):
+    """A path or seekable binary file for any supported image source."""
+
+    if isinstance(image, (str, os.PathLike)):
+        return image
+    if isinstance(image, bytes):
+        # BytesIO shares an immutable bytes object instead of copying it
+        return io.BytesIO(image)
+    if isinstance(image, (bytearray, memoryview)):
+        return _BufferFile(image)
+    if hasattr(image, 'read'):
+        if hasattr(image, 'seekable') and image.seekable():
+            return image
+        # Readers must be able to rewind (e.g. after a failed PNG stream)
+        return io.BytesIO(image.read())
+    raise TypeError(f"Unsupported image source: {type(image).__name__}")
+
+
+class _BitReader:
+
+    def __init__(self, sources):
+        self._sources = list(sources)
+        self._bits = np.empty(0, dtype=np.uint8)
+
+    def read(self, count: int) -> np.ndarray:
+
+        while self._bits.size < count and self._sources:
+            data = self._sources[0].read(-(-(count - self._bits.size) // 8))
+            if not data:
+                self._sources.pop(0)
+                continue
+            self._bits = np.concatenate((self._bits, np.unpackbits(np.frombuffer(data, dtype=np.uint8))))
+
+        bits, self._bits = self._bits[:count], self._bits[count:]
+        if bits.size < count:
+            raise ValueError("Payload ended before its declared length")
+        return bits
@@ -0,0 +1,275 @@
+"""
+Password strength estimation.
+
+Estimates how many guesses an attacker needs for a password, in the
+spirit of zxcvbn: the password is covered by the cheapest sequence of
+pieces, where a piece is a dictionary word (possibly capitalised,
+reversed or written in l33t), a repeated character, a run such as
+"abc" or "987", a recent year, or a single brute-forced character.
+
+    estimator = StrengthEstimator()
+    result = estimator.estimate('Tr0ub4dor&3')
+    result.bits, result.crack_time_text, result.warnings
+
+The bundled word list (data/passwords.txt) is read on first use into a
+word -> rank dict shared by all estimators. The cheapest-cover search
+runs left to right and every step only looks at characters already
+seen, so an estimator remembers the table for the last password and
+re-scores an edited one from the first changed character only.
+
+Crack times assume an offline attack on one high-end GPU against the
+KDF that will actually protect the payload, using its real cost
+parameters.
+
+Developed by: Zork
+"""
+import math
+import os
+import threading
+from typing import List, NamedTuple
+
+from .kdf import get_kdf
+
+
+WORDLIST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'passwords.txt')
+MIN_WORD_LENGTH = 3
+MAX_WORD_LENGTH = 20
+
+L33T = str.maketrans({'4': 'a', '@': 'a', '8': 'b', '(': 'c', '3': 'e', '6': 'g', '1': 'i', '!': 'i',
+                      '0': 'o', '$': 's', '5': 's', '7': 't', '+': 't', '2': 'z'})
+RECENT_YEARS = range(1950, 2050)
+
+# Guesses per second for one high-end GPU, per unit of KDF work
+HASH_RATE = 1e10            # SHA-256 compressions
+SCRYPT_RATE = 1e9           # N * r * p
+ARGON2_RATE = 1e8           # KiB of memory * passes
+
+SCORES = (
+    (1e3, "Very weak"),
+    (1e6, "Weak"),
+    (1e8, "Fair"),
+    (1e10, "Strong"),
+)
+
+TIME_UNITS = (
+    (60, "seconds", 1),
+    (3600, "minutes", 60),
+    (86400, "hours", 3600),
+    (86400 * 365, "days", 86400),
+    (86400 * 365 * 100, "years", 86400 * 365),
+)
+
+_dictionary = None
+_dictionary_lock = threading.Lock()
+
+
+def load_dictionary() -> dict:
+    """The bundled word list as {word: rank}, loaded once per process."""
+
+    global _dictionary
+    if _dictionary is None:
+        with _dictionary_lock:
+            if _dictionary is None:
+                words = {}
+                with open(WORDLIST_PATH, encoding='utf-8') as f:
+                    for line in f:
+                        word = line.strip()
+                        if word and not word.startswith('#'):
+                            words.setdefault(word, len(words) + 1)
+                _dictionary = words
+    return _dictionary
+
+
+def guesses_per_second(kdf) -> float:
+    """Offline guessing rate against ``kdf`` (an instance or spec)."""
+
+    kdf = get_kdf(kdf)
+    params = kdf.params
+    if kdf.name == 'pbkdf2':
+        # Two SHA-256 compressions per iteration (inner and outer HMAC)
+        return HASH_RATE / (2 * params['iterations'])
+    if kdf.name == 'scrypt':
+        return SCRYPT_RATE / ((1 << params['log_n']) * params['r'] * params['p'])
+    if kdf.name == 'argon2id':
+        return ARGON2_RATE / (params['memory_cost'] * params['iterations'])
+    return HASH_RATE
+
+
+def format_duration(seconds: float) -> str:
+
+    if seconds < 1:
+        return "instantly"
+    for limit, unit, size in TIME_UNITS:
+        if seconds < limit:
+            return f"{seconds / size:.0f} {unit}"
+    centuries = seconds / (86400 * 365 * 100)
+    if centuries >= 1e4:
+        return "centuries"
+    return f"{centuries:.0f} centuries"
+
+
+class Match(NamedTuple):
+
+    start: int
+    end: int
+    kind: str
+    guesses: float
+
+
+class Strength(NamedTuple):
+
+    password_length: int
+    guesses: float
+    bits: float
+    score: int
+    label: str
+    crack_seconds: float
+    crack_time_text: str
+    kdf: str
+    warnings: List[str]
+
+
+def _char_guesses(char: str) -> int:
+
+    if char.isdigit():
+        return 10
+    if char.islower():
+        return 26
+    if char.isupper():
+        return 26
+    if char.isascii():
+        return 33
+    return 100
+
+
+def _case_factor(token: str) -> int:
+
+    if token.islower() or not any(c.isalpha() for c in token):
+        return 1
+    if token.isupper() or (token[0].isupper() and token[1:].islower()):
+        return 2
+    return 2 ** min(sum(c.isupper() for c in token), 8)
+
+
+def _matches_ending_at(password: str, end: int, words: dict) -> List[Match]:
+    """Every known pattern ending just before ``password[end]``; uses password[:end] only."""
+
+    matches = []
+    lowered = password[:end].lower()
+    for start in range(max(0, end - MAX_WORD_LENGTH), end - MIN_WORD_LENGTH + 1):
+        token = lowered[start:end]
+        case = _case_factor(password[start:end])
+        if token in words:
+            matches.append(Match(start, end, 'word', words[token] * case))
+            continue
+        if token[::-1] in words:
+            matches.append(Match(start, end, 'reversed', words[token[::-1]] * 2 * case))
+            continue
+        unleeted = token.translate(L33T)
+        if unleeted != token and unleeted in words:
+            subs = sum(a != b for a, b in zip(token, unleeted))
+            matches.append(Match(start, end, 'l33t', words[unleeted] * 2 ** subs * case))
+
+    # The longest run of one character, and of consecutive characters, ending here
+    last = password[end - 1]
+    start = end - 1
+    while start > 0 and password[start - 1] == last:
+        start -= 1
+    if end - start >= 3:
+        matches.append(Match(start, end, 'repeat', _char_guesses(last) * (end - start)))
+    if end >= 3:
+        step = ord(password[end - 1]) - ord(password[end - 2])
+        if step in (1, -1):
+            start = end - 2
+            while start > 0 and ord(password[start]) - ord(password[start - 1]) == step:
+                start -= 1
+            if end - start >= 3:
+                descending = 2 if step < 0 else 1
+                matches.append(Match(start, end, 'sequence', _char_guesses(last) * (end - start) * descending))
+    if end >= 4 and password[end - 4:end].isdigit() and int(password[end - 4:end]) in RECENT_YEARS:
+        matches.append(Match(end - 4, end, 'year', len(RECENT_YEARS)))
+    return matches
+
+
+WARNINGS = {
+    'word': "Contains a common password or word",
+    'reversed': "Reversed words are easy to guess",
+    'l33t': "Predictable substitutions like '@' for 'a' don't help much",
+    'repeat': "Repeated characters are easy to guess",
+    'sequence': "Sequences like 'abc' or '123' are easy to guess",
+    'year': "Recent years are easy to guess",
+}
+
+
+class StrengthEstimator:
+
+    def __init__(self, kdf=None):
+        if kdf is None:
+            from .encryptor import MessageEncryptor
+            kdf = MessageEncryptor.DEFAULT_KDF
+        self.kdf = get_kdf(kdf)
+        self._rate = guesses_per_second(self.kdf)
+        self._lock = threading.Lock()
+        self._password = ''
+        # _best[i]: fewest guesses for password[:i]; _back[i]: the piece ending at i
+        self._best = [1.0]
+        self._back = [None]
+
+    def estimate(self, password: str) -> Strength:
+        """Score ``password``, reusing the work done for the shared prefix of the last one."""
+
+        words = load_dictionary()
+        with self._lock:
+            common = 0
+            for a, b in zip(self._password, password):
+                if a != b:
+                    break
+                common += 1
+            best = self._best[:common + 1]
+            back = self._back[:common + 1]
+            for end in range(common + 1, len(password) + 1):
+                choice = best[end - 1] * _char_guesses(password[end - 1]), None
+                for match in _matches_ending_at(password, end, words):
+                    guesses = best[match.start] * match.guesses
+                    if guesses < choice[0]:
+                        choice = guesses, match
+                best.append(choice[0])
+                back.append(choice[1])
+            self._password, self._best, self._back = password, best, back
+
+        pieces = []
+        end = len(password)
+        while end > 0:
+            match = back[end]
+            if match is None:
+                end -= 1
+            else:
+                pieces.append(match)
+                end = match.start
+
+        guesses = max(best[len(password)], 1.0)
+        # Several pieces must also be combined in the right order
+        guesses *= math.factorial(min(len(pieces), 10))
+        score = next((index for index, (limit, _) in enumerate(SCORES) if guesses < limit), len(SCORES))
+        label = SCORES[score][1] if score < len(SCORES) else "Very strong"
+        crack_seconds = guesses / 2 / self._rate if password else 0.0
+
+        warnings = []
+        if 0 < len(password) < 6:
+            warnings.append("Shorter than the 6 characters required")
+        for match in reversed(pieces):
+            warning = WARNINGS[match.kind]
+            if warning not in warnings:
+                warnings.append(warning)
+
+        return Strength(
+            password_length=len(password),
+            guesses=guesses,
+            bits=math.log2(guesses),
+            score=score,
+            label=label,
+            crack_seconds=crack_seconds,
+            crack_time_text=format_duration(crack_seconds),
+            kdf=self.kdf.name,
+            warnings=warnings,
+        )
@@ -0,0 +1,67 @@
+"""
+Preview thumbnails for the PhantomPix window.
+
+load_thumbnail runs on a worker thread and asks QImageReader for a
+downscaled image, so a full-resolution bitmap is never built for the
+preview (JPEG is decoded at reduced DCT scale, other formats are scaled
+inside the reader). Results are QImages, which unlike QPixmaps may be
+created off the GUI thread.
+
+ThumbnailCache keeps recent thumbnails keyed by path and modification
+time, so re-selecting an image or resizing the window skips decoding.
+
+Developed by: Zork
+"""
+import os
+from collections import OrderedDict
+
+from PyQt6.QtCore import QSize, Qt
+from PyQt6.QtGui import QImage, QImageReader
+
+
+# Large enough to stay sharp at any preview size the window allows
+THUMBNAIL_BOUND = QSize(720, 360)
+
+
+def thumbnail_key(path: str):
+
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def load_thumbnail(path: str, bound: QSize = THUMBNAIL_BOUND) -> QImage:
+
+    reader = QImageReader(path)
+    size = reader.size()
+    if size.isValid() and (size.width() > bound.width() or size.height() > bound.height()):
+        reader.setScaledSize(size.scaled(bound, Qt.AspectRatioMode.KeepAspectRatio))
+
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(reader.errorString() or "Invalid image")
+    return image
+
+
+class ThumbnailCache:
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def get(self, key):
+
+        image = self._entries.get(key)
+        if image is not None:
+            self._entries.move_to_end(key)
+        return image
+
+    def put(self, key, image: QImage):
+
+        self._entries[key] = image
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+
+        self._entries.clear()
@@ -0,0 +1,260 @@
+"""
+Per-stage timing and profiling for encode/decode jobs.
+
+    tracer = Tracer('encode', memory=True)
+    with tracer:
+        ImageSteganography.encode_message(...)
+    tracer.save_json('encode.json')
+    tracer.save_chrome_trace('encode.trace.json')   # chrome://tracing, Perfetto
+
+The pipeline marks its stages with ``span(name)`` (key derivation,
+compression, encryption, image decoding, bit embedding, PNG writing...).
+Spans are recorded by the tracer active in the current thread or task and
+cost a single context-variable lookup when no tracer is active.
+
+``memory=True`` records each stage's peak and net allocations through
+tracemalloc; ``profile=True`` also runs cProfile for the whole job. Both
+slow the job down. tracemalloc is process-wide: it counts allocations of
+every thread and has a single peak. It therefore stays on while any
+memory tracer is active, and stage peaks are measured only while one
+job is traced. When memory tracers overlap (e.g. several GUI jobs),
+none of them reports memory figures (``memory_available`` is False).
+
+Developed by: Zork
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+
+_active_tracer = ContextVar('phantompix_tracer', default=None)
+_NO_SPAN = nullcontext()
+
+# Memory tracers share tracemalloc; guarded by _memory_lock
+_memory_lock = threading.Lock()
+_memory_tracers = set()
+_started_tracemalloc = False
+
+
+def span(name: str, **args):
+    """Context manager recording ``name`` on the active tracer, if any."""
+
+    tracer = _active_tracer.get()
+    if tracer is None:
+        return _NO_SPAN
+    return tracer.stage(name, **args)
+
+
+def traced_iter(iterable, name: str):
+    """Yield from ``iterable``, recording the time spent producing each item."""
+
+    iterator = iter(iterable)
+    while True:
+        with span(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+class Tracer:
+
+    def __init__(self, name: str = 'job', memory: bool = False, profile: bool = False):
+        self.name = name
+        self.memory = memory
+        self.profile = profile
+        self.spans = []
+        self.start_time = None
+        self.duration = None
+        self.profiler = None
+        self.thread = None
+        self.memory_available = None
+        self._stack = []
+        self._token = None
+
+    def __enter__(self):
+
+        self._token = _active_tracer.set(self)
+        self.thread = threading.get_ident()
+        if self.memory:
+            self._start_memory()
+        if self.profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+
+        self.duration = time.perf_counter() - self.start_time
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.memory:
+            self._stop_memory()
+        _active_tracer.reset(self._token)
+
+    def _start_memory(self):
+
+        global _started_tracemalloc
+        with _memory_lock:
+            if not _memory_tracers and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _started_tracemalloc = True
+            # Another job's allocations and peak resets would mix with ours
+            self.memory_available = not _memory_tracers
+            for other in _memory_tracers:
+                other.memory_available = False
+            _memory_tracers.add(self)
+
+    def _stop_memory(self):
+
+        global _started_tracemalloc
+        with _memory_lock:
+            _memory_tracers.discard(self)
+            # Only the last tracer out stops tracemalloc, and only if a tracer started it
+            if not _memory_tracers and _started_tracemalloc:
+                tracemalloc.stop()
+                _started_tracemalloc = False
+        if not self.memory_available:
+            for record in self.spans:
+                record.pop('memory_peak', None)
+                record.pop('memory_delta', None)
+
+    @property
+    def _measuring(self) -> bool:
+
+        return bool(self.memory_available) and tracemalloc.is_tracing()
+
+    @contextmanager
+    def stage(self, name: str, **args):
+
+        frame = {'name': name, 'peak': 0, 'start_memory': 0}
+        if self._measuring:
+            current, peak = tracemalloc.get_traced_memory()
+            # Resetting the peak for this stage would hide the parent's
+            # peak so far, so hand it up first.
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['start_memory'] = current
+        self._stack.append(frame)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._stack.pop()
+            record = {
+                'name': name,
+                'start': start - self.start_time,
+                'duration': end - start,
+                'depth': len(self._stack),
+                'thread': threading.get_ident(),
+                # Inside a span of the same name, so already counted there
+                'nested': any(parent['name'] == name for parent in self._stack),
+            }
+            if args:
+                record['args'] = args
+            if self._measuring:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(frame['peak'], peak)
+                if self._stack:
+                    self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+                record['memory_peak'] = peak - frame['start_memory']
+                record['memory_delta'] = current - frame['start_memory']
+            self.spans.append(record)
+
+    def summary(self):
+        """Stages aggregated by name, in order of first appearance."""
+
+        stages = {}
+        for record in sorted(self.spans, key=lambda record: record['start']):
+            entry = stages.setdefault(record['name'], {'count': 0, 'seconds': 0.0, 'depth': record['depth']})
+            entry['count'] += 1
+            if not record['nested']:
+                entry['seconds'] += record['duration']
+            if 'memory_peak' in record:
+                entry['memory_peak'] = max(entry.get('memory_peak', 0), record['memory_peak'])
+        return stages
+
+    def to_dict(self, include_spans: bool = False) -> dict:
+
+        data = {
+            'name': self.name,
+            'seconds': self.duration,
+            'stages': self.summary(),
+        }
+        if self.memory:
+            data['memory_available'] = bool(self.memory_available)
+        if include_spans:
+            data['spans'] = self.spans
+        return data
+
+    def format_table(self) -> str:
+
+        lines = [f"{self.name}: {(self.duration or 0) * 1000:.1f} ms"]
+        for name, entry in self.summary().items():
+            label = '  ' * (entry['depth'] + 1) + name
+            line = f"{label:<36}{entry['seconds'] * 1000:>10.1f} ms  x{entry['count']}"
+            if 'memory_peak' in entry:
+                line += f"  peak {entry['memory_peak'] / 1024:,.0f} KB"
+            lines.append(line)
+        if self.memory and not self.memory_available:
+            lines.append("  (no memory figures: other traced jobs ran at the same time)")
+        return '\n'.join(lines)
+
+    def profile_stats(self, limit: int = 20, sort: str = 'cumulative') -> str:
+
+        if self.profiler is None:
+            return ''
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def chrome_trace(self) -> dict:
+        """The spans as Chrome trace events (complete events, microseconds)."""
+
+        pid = os.getpid()
+        events = [{
+            'name': self.name, 'ph': 'X', 'ts': 0, 'dur': (self.duration or 0) * 1e6,
+            'pid': pid, 'tid': self.thread, 'cat': 'job',
+        }]
+        for record in self.spans:
+            event = {
+                'name': record['name'], 'ph': 'X', 'cat': 'stage',
+                'ts': record['start'] * 1e6, 'dur': record['duration'] * 1e6,
+                'pid': pid, 'tid': record['thread'],
+            }
+            args = dict(record.get('args', {}))
+            for key in ('memory_peak', 'memory_delta'):
+                if key in record:
+                    args[key] = record[key]
+            if args:
+                event['args'] = args
+            events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_json(self, path: str):
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(include_spans=True), f, indent=2)
+
+    def save_chrome_trace(self, path: str):
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def save_profile(self, path: str):
+        """Write the cProfile data (open with pstats, snakeviz, ...)."""
+
+        if self.profiler is not None:
+            self.profiler.dump_stats(path)
@@ -5,13 +5,23 @@ from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QTextEdit, QLineEdit, QLabel, 
                              QFileDialog, QMessageBox, QStatusBar, QGroupBox,
                              QGraphicsDropShadowEffect, QProgressBar, QCheckBox,
-                             QFrame, QSizePolicy)
+                             QComboBox, QFrame, QSizePolicy)
 from PyQt6.QtCore import (Qt, QPropertyAnimation, QEasingCurve, QPoint, QSize, 
-                         pyqtProperty, QTimer, QParallelAnimationGroup, QSequentialAnimationGroup)
-from PyQt6.QtGui import QPixmap, QFont, QColor, QPalette, QIcon, QCursor
+                         pyqtProperty, QTimer, QParallelAnimationGroup, QSequentialAnimationGroup,
+                         QThreadPool)
+from PyQt6.QtGui import QPixmap, QFont, QColor, QPalette, QIcon, QCursor, QKeySequence, QShortcut
+import hashlib
 import os
+from collections import OrderedDict
 from .encryptor import MessageEncryptor
+from .job_queue import JobQueuePanel
+from .sessions import SessionCache
+from .scatter import scatter_key
 from .steganography import ImageSteganography
+from .strength import StrengthEstimator
+from .thumbnails import ThumbnailCache, load_thumbnail, thumbnail_key
+from .tracing import Tracer
+from .workers import PipelineWorker
 
 
 class AnimatedButton(QPushButton):
@@ -66,10 +76,28 @@ class PhantomPix(QMainWindow):
         super().__init__()
         self.selected_image_path = None
         self.show_password = False
+        self.thread_pool = QThreadPool(self)
+        self.active_jobs = []
+        self.quick_check_worker = None
+        self.preview_worker = None
+        self.image_capacity = None
+        # Payload size estimates by (message digest, compress, KDF); see update_capacity_meter
+        self.size_estimates = OrderedDict()
+        self.size_generation = 0
+        self.thumbnail_cache = ThumbnailCache()
+        # Re-encoding into the same cover skips decoding it again
+        self.encoder_sessions = SessionCache()
+        # Scores against the KDF new payloads are encrypted with
+        self.strength_estimator = StrengthEstimator(MessageEncryptor.DEFAULT_KDF)
+        self.strength_generation = 0
+        self.preview_image = None
+        self.last_trace = None
         self.setup_dark_theme()
         self.init_ui()
         self.setup_animations()
         self.show_welcome_animation()
+        # Dropping images anywhere on the window queues them for batch encoding
+        self.setAcceptDrops(True)
     
     def setup_dark_theme(self):
         
@@ -218,6 +246,13 @@ class PhantomPix(QMainWindow):
         image_group_layout.addWidget(image_container)
         
         
+        self.quick_check_label = QLabel("")
+        self.quick_check_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.quick_check_label.setStyleSheet("color: #888; font-size: 10px; font-weight: bold;")
+        self.quick_check_label.setVisible(False)
+        image_group_layout.addWidget(self.quick_check_label)
+        
+        
         self.select_btn = AnimatedButton("📁 BROWSE IMAGE")
         self.select_btn.clicked.connect(self.select_image)
         self.select_btn.setFixedHeight(38)
@@ -272,6 +307,59 @@ class PhantomPix(QMainWindow):
         """)
         message_layout.addWidget(self.message_text)
         
+        
+        self.capacity_bar = QProgressBar()
+        self.capacity_bar.setFixedHeight(14)
+        self.capacity_bar.setRange(0, 100)
+        self.capacity_bar.setValue(0)
+        self.capacity_bar.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.capacity_bar.setFormat("📦 Select an image to see its capacity")
+        self.set_capacity_color("#667eea")
+        message_layout.addWidget(self.capacity_bar)
+        
+        self.capacity_timer = QTimer(self)
+        self.capacity_timer.setSingleShot(True)
+        self.capacity_timer.setInterval(250)
+        self.capacity_timer.timeout.connect(self.update_capacity_meter)
+        self.message_text.textChanged.connect(self.capacity_timer.start)
+        
+        density_layout = QHBoxLayout()
+        density_layout.setSpacing(8)
+        density_label = QLabel("🧬 Bits per channel")
+        density_label.setStyleSheet("color: #a0a0a0; font-size: 10px;")
+        density_layout.addWidget(density_label)
+        
+        self.bits_combo = QComboBox()
+        for bits in range(1, ImageSteganography.MAX_BITS_PER_CHANNEL + 1):
+            self.bits_combo.addItem(f"{bits} LSB" + (" (least visible)" if bits == 1 else ""), bits)
+        self.bits_combo.setToolTip("More bits per channel hold more data but are easier to detect")
+        self.bits_combo.setStyleSheet("""
+            QComboBox {
+                background: rgba(0, 0, 0, 0.4);
+                border: 1px solid rgba(102, 126, 234, 0.3);
+                border-radius: 6px;
+                padding: 2px 8px;
+                color: #ffffff;
+                font-size: 10px;
+            }
+        """)
+        self.bits_combo.currentIndexChanged.connect(self.refresh_capacity)
+        density_layout.addWidget(self.bits_combo)
+        
+        self.alpha_check = QCheckBox("Use alpha channel")
+        self.alpha_check.setToolTip("Also hide data in transparency (RGBA images only)")
+        self.alpha_check.setStyleSheet("color: #a0a0a0; font-size: 10px;")
+        self.alpha_check.setEnabled(False)
+        self.alpha_check.stateChanged.connect(self.refresh_capacity)
+        density_layout.addWidget(self.alpha_check)
+        
+        self.scatter_check = QCheckBox("Scatter")
+        self.scatter_check.setToolTip("Spread the data over the whole image at positions picked by the password")
+        self.scatter_check.setStyleSheet("color: #a0a0a0; font-size: 10px;")
+        density_layout.addWidget(self.scatter_check)
+        density_layout.addStretch()
+        message_layout.addLayout(density_layout)
+        
         message_group.setLayout(message_layout)
         main_layout.addWidget(message_group)
         
@@ -290,6 +378,10 @@ class PhantomPix(QMainWindow):
         self.password_input.setPlaceholderText("🔐 Enter password (min 6 chars)...")
         self.password_input.setFixedHeight(36)
         self.password_input.textChanged.connect(self.update_password_strength)
+        self.strength_timer = QTimer(self)
+        self.strength_timer.setSingleShot(True)
+        self.strength_timer.setInterval(150)
+        self.strength_timer.timeout.connect(self.estimate_password_strength)
         self.password_input.setStyleSheet("""
             QLineEdit {
                 background: rgba(0, 0, 0, 0.4);
@@ -409,9 +501,21 @@ class PhantomPix(QMainWindow):
         options_layout.addWidget(self.strength_label)
         
         options_layout.addStretch()
+        
+        self.queue_check = QCheckBox("📚 Batch Queue")
+        self.queue_check.setToolTip("Encode many images with this message and password")
+        self.queue_check.setStyleSheet(self.show_password_check.styleSheet())
+        self.queue_check.toggled.connect(self.toggle_queue_panel)
+        options_layout.addWidget(self.queue_check)
         main_layout.addLayout(options_layout)
         
         
+        self.queue_panel = JobQueuePanel(self.batch_settings)
+        self.queue_panel.queue_finished.connect(self._on_queue_finished)
+        self.queue_panel.setVisible(False)
+        main_layout.addWidget(self.queue_panel)
+        
+        
         self.progress_bar = QProgressBar()
         self.progress_bar.setFixedHeight(4)
         self.progress_bar.setTextVisible(False)
@@ -428,7 +532,93 @@ class PhantomPix(QMainWindow):
             }
         """)
         self.progress_bar.setVisible(False)
-        main_layout.addWidget(self.progress_bar)
+        
+        progress_layout = QHBoxLayout()
+        progress_layout.setSpacing(8)
+        progress_layout.addWidget(self.progress_bar, 1)
+        
+        self.cancel_btn = QPushButton("✖ CANCEL")
+        self.cancel_btn.clicked.connect(self.cancel_jobs)
+        self.cancel_btn.setFixedHeight(22)
+        self.cancel_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.cancel_btn.setStyleSheet("""
+            QPushButton {
+                background: rgba(252, 70, 107, 0.25);
+                color: #ff8fa3;
+                border: 1px solid rgba(252, 70, 107, 0.5);
+                border-radius: 6px;
+                padding: 0px 10px;
+                font-size: 10px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background: rgba(252, 70, 107, 0.45);
+                color: white;
+            }
+        """)
+        self.cancel_btn.setVisible(False)
+        progress_layout.addWidget(self.cancel_btn)
+        main_layout.addLayout(progress_layout)
+        
+        
+        self.debug_group = QGroupBox("Debug • Stage Timings")
+        debug_layout = QVBoxLayout()
+        debug_layout.setContentsMargins(8, 20, 8, 8)
+        debug_layout.setSpacing(6)
+        
+        self.debug_text = QTextEdit()
+        self.debug_text.setReadOnly(True)
+        self.debug_text.setFixedHeight(120)
+        self.debug_text.setPlaceholderText("Run an encode or decode to see where the time goes...")
+        self.debug_text.setStyleSheet("""
+            QTextEdit {
+                background: rgba(0, 0, 0, 0.5);
+                border: 1px solid rgba(0, 212, 255, 0.3);
+                border-radius: 8px;
+                color: #a0ffd0;
+                font-family: Consolas, monospace;
+                font-size: 10px;
+            }
+        """)
+        debug_layout.addWidget(self.debug_text)
+        
+        debug_buttons = QHBoxLayout()
+        self.profile_check = QCheckBox("cProfile")
+        self.profile_check.setStyleSheet("color: #a0a0a0; font-size: 10px;")
+        debug_buttons.addWidget(self.profile_check)
+        debug_buttons.addStretch()
+        
+        self.export_json_btn = QPushButton("💾 JSON")
+        self.export_json_btn.clicked.connect(lambda: self.export_trace('json'))
+        self.export_trace_btn = QPushButton("💾 CHROME TRACE")
+        self.export_trace_btn.clicked.connect(lambda: self.export_trace('chrome'))
+        for button in (self.export_json_btn, self.export_trace_btn):
+            button.setFixedHeight(22)
+            button.setEnabled(False)
+            button.setCursor(Qt.CursorShape.PointingHandCursor)
+            button.setStyleSheet("""
+                QPushButton {
+                    background: rgba(102, 126, 234, 0.25);
+                    color: #c0c8ff;
+                    border: 1px solid rgba(102, 126, 234, 0.5);
+                    border-radius: 6px;
+                    padding: 0px 10px;
+                    font-size: 10px;
+                    font-weight: bold;
+                }
+                QPushButton:disabled {
+                    color: #666;
+                }
+            """)
+            debug_buttons.addWidget(button)
+        debug_layout.addLayout(debug_buttons)
+        
+        self.debug_group.setLayout(debug_layout)
+        self.debug_group.setVisible(False)
+        main_layout.addWidget(self.debug_group)
+        
+        self.debug_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        self.debug_shortcut.activated.connect(self.toggle_debug_panel)
         
         
         footer = QLabel("💡 PNG format recommended • AES-256 encryption • Zero-knowledge security")
@@ -499,46 +689,282 @@ class PhantomPix(QMainWindow):
     
     def update_password_strength(self, password):
         
+        # Results of estimates started before this keystroke are dropped
+        self.strength_generation += 1
         if not password:
+            self.strength_timer.stop()
             self.strength_label.setText("🔒 Strength: None")
+            self.strength_label.setToolTip("")
             self.strength_label.setStyleSheet("color: #888; font-size: 10px; font-weight: bold;")
             return
+        self.strength_timer.start()
+    
+    def estimate_password_strength(self):
+        
+        password = self.password_input.text()
+        generation = self.strength_generation
+        worker = PipelineWorker([("", lambda _: self.strength_estimator.estimate(password))])
+        worker.signals.finished.connect(lambda result: self._on_strength_estimated(generation, result))
+        self.thread_pool.start(worker)
+    
+    def _on_strength_estimated(self, generation, result):
+        
+        if generation != self.strength_generation:
+            return
+        if result.score <= 1:
+            icon, color = "🔴", "#ff4444"
+        elif result.score == 2:
+            icon, color = "🟡", "#ffaa00"
+        else:
+            icon, color = "🟢", "#00ff88"
+        if result.crack_time_text == "instantly":
+            crack_time = "cracked instantly"
+        else:
+            crack_time = f"~{result.crack_time_text} to crack"
+        self.strength_label.setText(f"{icon} Strength: {result.label} • {result.bits:.0f} bits • {crack_time}")
+        self.strength_label.setToolTip("\n".join(
+            result.warnings + [f"Offline attack on one GPU against {self.strength_estimator.kdf!r}"]
+        ))
+        self.strength_label.setStyleSheet(f"color: {color}; font-size: 10px; font-weight: bold;")
+    
+    def set_capacity_color(self, color):
+        
+        self.capacity_bar.setStyleSheet(f"""
+            QProgressBar {{
+                background: rgba(0, 0, 0, 0.3);
+                border: 1px solid rgba(102, 126, 234, 0.3);
+                border-radius: 6px;
+                color: #d0d0d0;
+                font-size: 9px;
+                font-weight: bold;
+            }}
+            QProgressBar::chunk {{
+                background: {color};
+                border-radius: 5px;
+            }}
+        """)
+    
+    def embedding_layout(self):
+        
+        channels = 4 if self.alpha_check.isEnabled() and self.alpha_check.isChecked() else 3
+        return self.bits_combo.currentData(), channels
+    
+    def refresh_capacity(self):
+        
+        self.image_capacity = None
+        if self.selected_image_path:
+            bits_per_channel, channels = self.embedding_layout()
+            try:
+                self.image_capacity = ImageSteganography.capacity(
+                    self.selected_image_path, bits_per_channel, channels
+                )
+            except Exception:
+                self.image_capacity = None
+        self.update_capacity_meter()
+    
+    def update_capacity_meter(self):
+        
+        # Estimating picks a codec by compressing a sample of the message,
+        # which takes a while for large ones, so it runs on the thread pool
+        self.size_generation += 1
+        message = self.message_text.toPlainText().strip()
+        if not message:
+            self.show_capacity(0)
+            return
+        
+        compress, kdf = True, MessageEncryptor.DEFAULT_KDF
+        key = (hashlib.sha256(message.encode('utf-8')).digest(), compress, kdf)
+        if key in self.size_estimates:
+            self.size_estimates.move_to_end(key)
+            self.show_capacity(self.size_estimates[key])
+            return
+        
+        generation = self.size_generation
+        worker = PipelineWorker([("", lambda _: MessageEncryptor.estimate_size(message, compress, kdf))])
+        worker.signals.finished.connect(lambda used: self._on_size_estimated(generation, key, used))
+        self.thread_pool.start(worker)
+    
+    def _on_size_estimated(self, generation, key, used):
+        
+        self.size_estimates[key] = used
+        while len(self.size_estimates) > 16:
+            self.size_estimates.popitem(last=False)
+        if generation == self.size_generation:
+            self.show_capacity(used)
+    
+    def show_capacity(self, used):
+        
+        if self.image_capacity is None:
+            self.capacity_bar.setValue(0)
+            self.capacity_bar.setFormat(f"📦 ~{used:,} bytes • select an image to see its capacity")
+            self.set_capacity_color("#667eea")
+            return
         
-        strength = 0
-        if len(password) >= 6:
-            strength += 1
-        if len(password) >= 10:
-            strength += 1
-        if any(c.isupper() for c in password):
-            strength += 1
-        if any(c.isdigit() for c in password):
-            strength += 1
-        if any(c in "!@#$%^&*()_+-=[]{}|;:,.<>?" for c in password):
-            strength += 1
-        
-        if strength <= 1:
-            self.strength_label.setText("🔴 Strength: Weak")
-            self.strength_label.setStyleSheet("color: #ff4444; font-size: 10px; font-weight: bold;")
-        elif strength <= 3:
-            self.strength_label.setText("🟡 Strength: Medium")
-            self.strength_label.setStyleSheet("color: #ffaa00; font-size: 10px; font-weight: bold;")
+        available = self.image_capacity
+        percent = used * 100 / available if available else 100.0
+        self.capacity_bar.setValue(min(int(percent), 100))
+        self.capacity_bar.setFormat(f"📦 ~{used:,} / {available:,} bytes ({percent:.1f}%)")
+        if used > available:
+            self.capacity_bar.setFormat(f"⚠️ ~{used:,} / {available:,} bytes • message too large for this image")
+            self.set_capacity_color("#ff4444")
+        elif percent > 80:
+            self.set_capacity_color("#ffaa00")
         else:
-            self.strength_label.setText("🟢 Strength: Strong")
-            self.strength_label.setStyleSheet("color: #00ff88; font-size: 10px; font-weight: bold;")
+            self.set_capacity_color("#00ff88")
     
     def show_progress(self, message):
         
         self.progress_bar.setVisible(True)
-        self.progress_bar.setRange(0, 0)  # Indeterminate
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.cancel_btn.setVisible(True)
+        self.cancel_btn.setEnabled(True)
         self.status_bar.showMessage(message)
-        self.encode_btn.set_processing(True)
-        self.decode_btn.set_processing(True)
+    
+    def update_progress(self, value, message):
+        
+        self.progress_bar.setValue(value)
+        if message:
+            pending = len(self.active_jobs)
+            suffix = f" ({pending} jobs running)" if pending > 1 else ""
+            self.status_bar.showMessage(f"{message}{suffix}")
     
     def hide_progress(self):
         
+        if self.active_jobs:
+            return
         self.progress_bar.setVisible(False)
-        self.encode_btn.set_processing(False)
-        self.decode_btn.set_processing(False)
+        self.cancel_btn.setVisible(False)
+    
+    def start_job(self, stages, on_finished, on_failed, name="job"):
+        
+        tracer = None
+        if not self.debug_group.isHidden():
+            tracer = Tracer(name, memory=True, profile=self.profile_check.isChecked())
+        worker = PipelineWorker(stages, tracer)
+        worker.signals.progress.connect(self.update_progress)
+        worker.signals.finished.connect(lambda result: self._job_done(worker, on_finished, result))
+        worker.signals.failed.connect(lambda error: self._job_done(worker, on_failed, error))
+        worker.signals.cancelled.connect(lambda: self._job_cancelled(worker))
+        self.active_jobs.append(worker)
+        self.thread_pool.start(worker)
+        return worker
+    
+    def _job_done(self, worker, callback, value):
+        
+        if worker in self.active_jobs:
+            self.active_jobs.remove(worker)
+        self.hide_progress()
+        if worker.tracer is not None:
+            self.show_trace(worker.tracer)
+        callback(value)
+    
+    def toggle_debug_panel(self):
+        
+        visible = self.debug_group.isHidden()
+        self.debug_group.setVisible(visible)
+        self.status_bar.showMessage("🐞 Debug panel on • next jobs are traced" if visible else "🐞 Debug panel off")
+    
+    def show_trace(self, tracer):
+        
+        self.last_trace = tracer
+        text = tracer.format_table()
+        stats = tracer.profile_stats(limit=15)
+        if stats:
+            text += "\n\n" + stats.strip()
+        self.debug_text.setPlainText(text)
+        self.export_json_btn.setEnabled(True)
+        self.export_trace_btn.setEnabled(True)
+    
+    def export_trace(self, kind):
+        
+        if self.last_trace is None:
+            return
+        if kind == 'chrome':
+            path, _ = QFileDialog.getSaveFileName(
+                self, "Export Chrome Trace", f"{self.last_trace.name}.trace.json", "Trace (*.json)"
+            )
+        else:
+            path, _ = QFileDialog.getSaveFileName(
+                self, "Export Stage Timings", f"{self.last_trace.name}.json", "JSON (*.json)"
+            )
+        if not path:
+            return
+        try:
+            if kind == 'chrome':
+                self.last_trace.save_chrome_trace(path)
+            else:
+                self.last_trace.save_json(path)
+            self.status_bar.showMessage(f"💾 Trace saved: {os.path.basename(path)}")
+        except OSError as e:
+            self.show_styled_warning("Export Failed", str(e))
+    
+    def _job_cancelled(self, worker):
+        
+        if worker in self.active_jobs:
+            self.active_jobs.remove(worker)
+        self.hide_progress()
+        self.status_bar.showMessage("⛔ Operation cancelled")
+    
+    def cancel_jobs(self):
+        
+        for worker in self.active_jobs:
+            worker.cancel()
+        self.cancel_btn.setEnabled(False)
+        self.status_bar.showMessage("⏳ Cancelling...")
+    
+    def toggle_queue_panel(self, visible):
+        
+        self.queue_panel.setVisible(visible)
+        if not visible:
+            self.resize(self.width(), self.minimumSizeHint().height())
+    
+    def dragEnterEvent(self, event):
+        
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+    
+    def dropEvent(self, event):
+        
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        added = self.queue_panel.add_paths(paths)
+        self.queue_check.setChecked(True)
+        self.status_bar.showMessage(f"📚 Queued {added} image(s)" if added else "⚠️ No new images to queue")
+        event.acceptProposedAction()
+    
+    def batch_settings(self):
+        
+        message = self.message_text.toPlainText().strip()
+        if not message:
+            self.show_styled_warning("No Message", "Please enter a secret message to encode.")
+            return None
+        
+        password = self.password_input.text()
+        if not password:
+            self.show_styled_warning("No Password", "Please enter a password to encrypt your message.")
+            return None
+        
+        if len(password) < 6:
+            self.show_styled_warning("Weak Password", "Password should be at least 6 characters long for security.")
+            return None
+        
+        bits_per_channel, channels = self.embedding_layout()
+        return message, password, bits_per_channel, channels, self.scatter_check.isChecked()
+    
+    def _on_queue_finished(self, done, failed):
+        
+        if failed:
+            self.status_bar.showMessage(f"⚠️ Batch finished: {done} encoded, {failed} failed")
+        else:
+            self.status_bar.showMessage(f"✅ Batch finished: {done} encoded")
+    
+    def closeEvent(self, event):
+        
+        for worker in self.active_jobs:
+            worker.cancel()
+        self.queue_panel.shutdown()
+        self.thread_pool.waitForDone()
+        super().closeEvent(event)
     
     def select_image(self):
         
@@ -551,44 +977,121 @@ class PhantomPix(QMainWindow):
         
         if file_path:
             self.selected_image_path = file_path
+            try:
+                ImageSteganography.capacity(file_path, channels=4)
+                has_alpha = True
+            except Exception:
+                has_alpha = False
+            self.alpha_check.setEnabled(has_alpha)
+            self.refresh_capacity()
             self.display_image_preview(file_path)
+            self.run_quick_check(file_path)
             self.status_bar.showMessage(f"✅ Image loaded: {os.path.basename(file_path)}")
     
+    def run_quick_check(self, file_path):
+        
+        self.quick_check_label.setText("🔍 Checking for hidden data...")
+        self.quick_check_label.setStyleSheet("color: #888; font-size: 10px; font-weight: bold;")
+        self.quick_check_label.setVisible(True)
+        
+        worker = PipelineWorker([("", lambda _: ImageSteganography.probe(file_path))])
+        worker.signals.finished.connect(lambda result: self._on_quick_check_finished(file_path, result))
+        worker.signals.failed.connect(lambda error: self._on_quick_check_failed(file_path))
+        self.quick_check_worker = worker
+        self.thread_pool.start(worker)
+    
+    def _on_quick_check_finished(self, file_path, result):
+        
+        if file_path != self.selected_image_path:
+            return
+        if result.has_payload:
+            layout = ""
+            if (result.bits_per_channel, result.channels) != (1, 3):
+                alpha = " + alpha" if result.channels == 4 else ""
+                layout = f" • {result.bits_per_channel} LSB{alpha}"
+            self.quick_check_label.setText(f"🟢 Hidden data detected • {result.data_length:,} bytes{layout}")
+            self.quick_check_label.setStyleSheet("color: #00ff88; font-size: 10px; font-weight: bold;")
+        else:
+            self.quick_check_label.setText("⚪ No hidden data • ready to encode")
+            self.quick_check_label.setStyleSheet("color: #a0a0a0; font-size: 10px; font-weight: bold;")
+    
+    def _on_quick_check_failed(self, file_path):
+        
+        if file_path != self.selected_image_path:
+            return
+        self.quick_check_label.setText("❌ Could not read image")
+        self.quick_check_label.setStyleSheet("color: #ff4444; font-size: 10px; font-weight: bold;")
+    
     def display_image_preview(self, file_path):
         
         try:
-            pixmap = QPixmap(file_path)
-            
-            if pixmap.isNull():
-                self.image_label.setText("❌ Invalid Image")
-                return
-            
-            
-            label_width = self.image_label.width() - 20
-            label_height = self.image_label.height() - 20
-            
-            scaled_pixmap = pixmap.scaled(
-                label_width,
-                label_height,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            
-            
-            self.image_label.setText("")
-            self.image_label.setPixmap(scaled_pixmap)
-            self.image_label.setStyleSheet(self.loaded_image_style)
-            
-           
-            glow = QGraphicsDropShadowEffect()
-            glow.setBlurRadius(18)
-            glow.setColor(QColor(0, 212, 255, 90))
-            glow.setOffset(0, 0)
-            self.image_label.setGraphicsEffect(glow)
-            
-        except Exception as e:
-            self.image_label.setText(f"❌ Error loading image")
-            self.image_label.setStyleSheet(self.empty_image_style)
+            key = thumbnail_key(file_path)
+        except OSError:
+            self._on_preview_failed(file_path)
+            return
+        
+        image = self.thumbnail_cache.get(key)
+        if image is not None:
+            self.show_preview_image(image)
+            return
+        
+        self.preview_image = None
+        self.image_label.setPixmap(QPixmap())
+        self.image_label.setText("⏳ Loading preview...")
+        
+        worker = PipelineWorker([("", lambda _: load_thumbnail(file_path))])
+        worker.signals.finished.connect(lambda image: self._on_preview_loaded(file_path, key, image))
+        worker.signals.failed.connect(lambda error: self._on_preview_failed(file_path))
+        self.preview_worker = worker
+        self.thread_pool.start(worker)
+    
+    def _on_preview_loaded(self, file_path, key, image):
+        
+        self.thumbnail_cache.put(key, image)
+        if file_path == self.selected_image_path:
+            self.show_preview_image(image)
+    
+    def _on_preview_failed(self, file_path):
+        
+        if file_path != self.selected_image_path:
+            return
+        self.preview_image = None
+        self.image_label.setPixmap(QPixmap())
+        self.image_label.setText("❌ Invalid Image")
+        self.image_label.setStyleSheet(self.empty_image_style)
+    
+    def show_preview_image(self, image):
+        
+        self.preview_image = image
+        label_width = self.image_label.width() - 20
+        label_height = self.image_label.height() - 20
+        
+        # The cached thumbnail is small, so this scale is cheap enough to
+        # redo on every resize.
+        scaled_pixmap = QPixmap.fromImage(image).scaled(
+            label_width,
+            label_height,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
+        
+        
+        self.image_label.setText("")
+        self.image_label.setPixmap(scaled_pixmap)
+        self.image_label.setStyleSheet(self.loaded_image_style)
+        
+       
+        glow = QGraphicsDropShadowEffect()
+        glow.setBlurRadius(18)
+        glow.setColor(QColor(0, 212, 255, 90))
+        glow.setOffset(0, 0)
+        self.image_label.setGraphicsEffect(glow)
+    
+    def resizeEvent(self, event):
+        
+        super().resizeEvent(event)
+        if self.preview_image is not None:
+            self.show_preview_image(self.preview_image)
     
     def encode_message(self):
         
@@ -625,8 +1128,7 @@ class PhantomPix(QMainWindow):
             
             self.show_progress("🔄 Encrypting and encoding message...")
             
-            
-            QTimer.singleShot(100, lambda: self._perform_encoding(message, password, output_path))
+            self._perform_encoding(message, password, output_path)
             
         except Exception as e:
             self.hide_progress()
@@ -641,34 +1143,50 @@ class PhantomPix(QMainWindow):
     
     def _perform_encoding(self, message, password, output_path):
         
-        try:
-            
-            encrypted_data = MessageEncryptor.encrypt_message(message, password, compress=True)
-            
-            
-            ImageSteganography.encode_message(self.selected_image_path, encrypted_data, output_path)
-            
-            self.hide_progress()
-            self.status_bar.showMessage("✅ Message encoded successfully!")
-            
-            
-            msg = QMessageBox(self)
-            msg.setWindowTitle("🎉 Success")
-            msg.setText("Message Successfully Encoded!")
-            msg.setInformativeText(f"Your encrypted message is now hidden inside:\n{os.path.basename(output_path)}\n\n🔐 Keep your password safe!")
-            msg.setIcon(QMessageBox.Icon.Information)
-            msg.setStyleSheet(self.get_messagebox_style())
-            msg.exec()
-        except Exception as e:
-            self.hide_progress()
-            self.status_bar.showMessage("❌ Encoding failed")
-            msg = QMessageBox(self)
-            msg.setWindowTitle("❌ Error")
-            msg.setText("Encoding Failed")
-            msg.setInformativeText(f"Failed to encode message:\n{str(e)}")
-            msg.setIcon(QMessageBox.Icon.Critical)
-            msg.setStyleSheet(self.get_messagebox_style())
-            msg.exec()
+        image_path = self.selected_image_path
+        bits_per_channel, channels = self.embedding_layout()
+        scatter = self.scatter_check.isChecked()
+        
+        def embed(encrypted_data):
+            session = self.encoder_sessions.get(image_path)
+            session.embed(encrypted_data, output_path, bits_per_channel=bits_per_channel, channels=channels,
+                          scatter_key=scatter_key(password) if scatter else None)
+            return output_path
+        
+        self.start_job(
+            [
+                ("🔐 Encrypting message...",
+                 lambda _: MessageEncryptor.encrypt_message(message, password, compress=True)),
+                ("🖼️ Embedding into image...", embed),
+            ],
+            self._on_encoding_finished,
+            self._on_encoding_failed,
+            name="encode",
+        )
+    
+    def _on_encoding_finished(self, output_path):
+        
+        self.status_bar.showMessage("✅ Message encoded successfully!")
+        
+        
+        msg = QMessageBox(self)
+        msg.setWindowTitle("🎉 Success")
+        msg.setText("Message Successfully Encoded!")
+        msg.setInformativeText(f"Your encrypted message is now hidden inside:\n{os.path.basename(output_path)}\n\n🔐 Keep your password safe!")
+        msg.setIcon(QMessageBox.Icon.Information)
+        msg.setStyleSheet(self.get_messagebox_style())
+        msg.exec()
+    
+    def _on_encoding_failed(self, error):
+        
+        self.status_bar.showMessage("❌ Encoding failed")
+        msg = QMessageBox(self)
+        msg.setWindowTitle("❌ Error")
+        msg.setText("Encoding Failed")
+        msg.setInformativeText(f"Failed to encode message:\n{error}")
+        msg.setIcon(QMessageBox.Icon.Critical)
+        msg.setStyleSheet(self.get_messagebox_style())
+        msg.exec()
     
     def decode_message(self):
         
@@ -685,8 +1203,7 @@ class PhantomPix(QMainWindow):
         try:
             self.show_progress("🔄 Decoding and decrypting message...")
             
-            
-            QTimer.singleShot(100, lambda: self._perform_decoding(password))
+            self._perform_decoding(password)
             
         except Exception as e:
             self.hide_progress()
@@ -707,43 +1224,57 @@ class PhantomPix(QMainWindow):
     
     def _perform_decoding(self, password):
         
-        try:
-            
-            encrypted_data = ImageSteganography.decode_message(self.selected_image_path)
-            
-           
-            decrypted_message = MessageEncryptor.decrypt_message(encrypted_data, password, compressed=True)
-            
-            
-            self.message_text.setPlainText(decrypted_message)
-            
-            self.hide_progress()
-            self.status_bar.showMessage("✅ Message decoded successfully!")
-            
-            
-            msg = QMessageBox(self)
-            msg.setWindowTitle("🎉 Success")
-            msg.setText("Message Successfully Decoded!")
-            msg.setInformativeText("Your secret message has been revealed and displayed in the text area.")
-            msg.setIcon(QMessageBox.Icon.Information)
-            msg.setStyleSheet(self.get_messagebox_style())
-            msg.exec()
-        except Exception as e:
-            self.hide_progress()
-            self.status_bar.showMessage("❌ Decoding failed")
-            msg = QMessageBox(self)
-            msg.setWindowTitle("🔒 Decoding Failed")
-            msg.setText("Failed to Decode Message")
-            msg.setInformativeText(
-                f"{str(e)}\n\n"
-                "Possible reasons:\n"
-                "• Wrong password\n"
-                "• Image doesn't contain encoded data\n"
-                "• Image has been modified or corrupted"
-            )
-            msg.setIcon(QMessageBox.Icon.Critical)
-            msg.setStyleSheet(self.get_messagebox_style())
-            msg.exec()
+        image_path = self.selected_image_path
+        
+        def check(_):
+            # Scattered data has no header at the top; look for it with the password's key
+            if ImageSteganography.probe(image_path).has_payload:
+                return None
+            return scatter_key(password)
+        
+        self.start_job(
+            [
+                ("🔍 Checking for hidden data...", check),
+                ("🖼️ Extracting hidden data...",
+                 lambda key: ImageSteganography.decode_message(image_path, scatter_key=key)),
+                ("🔓 Decrypting message...",
+                 lambda encrypted_data: MessageEncryptor.decrypt_message(encrypted_data, password, compressed=True)),
+            ],
+            self._on_decoding_finished,
+            self._on_decoding_failed,
+            name="decode",
+        )
+    
+    def _on_decoding_finished(self, decrypted_message):
+        
+        self.message_text.setPlainText(decrypted_message)
+        self.status_bar.showMessage("✅ Message decoded successfully!")
+        
+        
+        msg = QMessageBox(self)
+        msg.setWindowTitle("🎉 Success")
+        msg.setText("Message Successfully Decoded!")
+        msg.setInformativeText("Your secret message has been revealed and displayed in the text area.")
+        msg.setIcon(QMessageBox.Icon.Information)
+        msg.setStyleSheet(self.get_messagebox_style())
+        msg.exec()
+    
+    def _on_decoding_failed(self, error):
+        
+        self.status_bar.showMessage("❌ Decoding failed")
+        msg = QMessageBox(self)
+        msg.setWindowTitle("🔒 Decoding Failed")
+        msg.setText("Failed to Decode Message")
+        msg.setInformativeText(
+            f"{error}\n\n"
+            "Possible reasons:\n"
+            "• Wrong password\n"
+            "• Image doesn't contain encoded data\n"
+            "• Image has been modified or corrupted"
+        )
+        msg.setIcon(QMessageBox.Icon.Critical)
+        msg.setStyleSheet(self.get_messagebox_style())
+        msg.exec()
     
     def show_styled_warning(self, title, message):
         
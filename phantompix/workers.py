@@ -0,0 +1,71 @@
+"""
+Background jobs for the PhantomPix window.
+
+A job is a list of ``(label, stage)`` pairs run in order on a QThreadPool
+thread. Every stage receives the previous stage's result. Progress,
+results and errors are reported through Qt signals, which Qt delivers
+on the GUI thread. An optional Tracer (see tracing.py) records every
+stage, and the spans inside it, on the worker thread.
+
+Developed by: Zork
+"""
+import threading
+from contextlib import nullcontext
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class WorkerSignals(QObject):
+
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class PipelineWorker(QRunnable):
+
+    def __init__(self, stages, tracer=None):
+        super().__init__()
+        self.stages = stages
+        self.tracer = tracer
+        self.signals = WorkerSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+
+        return self._cancel_event.is_set()
+
+    def run(self):
+
+        result = None
+        total = len(self.stages)
+        tracer = self.tracer if self.tracer is not None else nullcontext()
+        try:
+            with tracer:
+                for index, (label, stage) in enumerate(self.stages):
+                    # Stages are not interrupted mid-way; cancellation takes
+                    # effect at the next stage boundary.
+                    if self._cancel_event.is_set():
+                        raise JobCancelled()
+                    self.signals.progress.emit(int(index * 100 / total), label)
+                    if self.tracer is not None:
+                        with self.tracer.stage(label or f"stage {index + 1}"):
+                            result = stage(result)
+                    else:
+                        result = stage(result)
+
+            self.signals.progress.emit(100, "")
+            self.signals.finished.emit(result)
+        except JobCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))